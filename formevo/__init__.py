@@ -6,5 +6,6 @@ from . import wizard
 from . import hooks
 
 def configure_theme_automatically(env):
-    """Configure automatiquement le thème après installation"""
-    hooks.setup_theme_config(env)
\ No newline at end of file
+    """Configure automatiquement le thème et initialise les agrégats de progression après installation"""
+    hooks.setup_theme_config(env)
+    env['yonn.course.progress'].sudo()._refresh_progress()
\ No newline at end of file
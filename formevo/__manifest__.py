@@ -22,6 +22,7 @@
         'data/user_groups.xml',
         'data/theme_config.xml',
         'security/ir.model.access.csv',
+        'data/course_progress_cron.xml',
 
         'wizard/user_group_wizard_view.xml',
         'wizard/course_assign_wizard_view.xml',
@@ -20,6 +20,9 @@ class YonnElearningController(WebsiteSlides):
     notre logique de tracking et nos nouvelles pages (dashboards).
     """
 
+    # Un heartbeat ne peut pas déclarer plus de temps que cet intervalle
+    _HEARTBEAT_MAX_SECONDS = 300
+
     # =====================================================
     #  1. TRACKING DU TEMPS (MÉTHODE CÔTÉ SERVEUR)
     # =====================================================
@@ -43,15 +46,10 @@ class YonnElearningController(WebsiteSlides):
 
             # On ignore les sessions trop courtes (< 5s) ou trop longues (> 1h)
             if 5 < time_spent < 3600:
-                slide_partner = request.env['slide.slide.partner'].search([
-                    ('slide_id', '=', last_slide_id),
-                    ('partner_id', '=', user.partner_id.id)
-                ], limit=1)
-
-                if slide_partner:
-                    slide_partner.sudo().add_time_spent(int(time_spent))
-                    _logger.info(
-                        f"Yonn Tracking: {int(time_spent)}s ajoutées au slide {last_slide_id} pour {user.name}")
+                # Simple INSERT dans le tampon : le cron replie les événements par lots
+                request.env['yonn.time.event'].sudo()._record(last_slide_id, user.partner_id.id, time_spent)
+                _logger.debug(
+                    f"Yonn Tracking: {int(time_spent)}s enregistrées pour le slide {last_slide_id} ({user.name})")
 
         except Exception as e:
             _logger.warning(f"Yonn Tracking: Impossible de tracker le temps pour le slide {last_slide_id}. Erreur: {e}")
@@ -76,6 +74,29 @@ class YonnElearningController(WebsiteSlides):
 
         return response
 
+    @http.route('/yonn/tracking/heartbeat', type='json', auth='user', website=True)
+    def tracking_heartbeat(self, slide_id=None, seconds=0, **kwargs):
+        """
+        Heartbeat JS : le navigateur signale le temps passé sans rendu de page.
+        Le temps compté est borné par celui écoulé depuis le dernier signal,
+        puis le point de départ du tracking serveur est avancé pour ne rien compter deux fois.
+        """
+        partner = request.env.user.partner_id
+        if not slide_id or not partner:
+            return {'status': 'error', 'message': 'missing_slide_id'}
+
+        slide_id = int(slide_id)
+        now_ts = datetime.now().timestamp()
+        start_time_ts = request.session.get('tracking_start_time')
+        if request.session.get('tracking_slide_id') != slide_id or not start_time_ts:
+            return {'status': 'ignored'}
+
+        elapsed = min(float(seconds or 0), now_ts - start_time_ts, self._HEARTBEAT_MAX_SECONDS)
+        if elapsed > 0:
+            request.env['yonn.time.event'].sudo()._record(slide_id, partner.id, elapsed)
+            request.session['tracking_start_time'] = now_ts
+        return {'status': 'success', 'recorded': int(elapsed)}
+
     def _can_access_dashboard(self, user, course):
         """Vérifie si l'utilisateur peut accéder au dashboard du cours."""
         if user.has_group('formevo.group_yonn_elearning_director'):
@@ -1,4 +1,5 @@
 from . import course_progress
 from . import res_users_patch
 from . import student_class
-from . import slide_models_inherit
\ No newline at end of file
+from . import slide_models_inherit
+from . import time_event
@@ -1,8 +1,7 @@
 # /home/ubuntu/upload/course_progress.py
 
-import collections
 from odoo import models, fields, api
-from odoo.osv import expression
+from odoo.tools import sql
 
 
 class CourseProgress(models.Model):
@@ -10,44 +9,54 @@ class CourseProgress(models.Model):
     _description = 'Rapport de Progression agrégée par Apprenant/Cours'
     _rec_name = 'display_name'
 
-    # --- CHAMPS (Aucun changement ici) ---
-    partner_id = fields.Many2one('res.partner', string='Apprenant', readonly=True)
-    course_id = fields.Many2one('slide.channel', string='Cours', readonly=True)
+    # --- CHAMPS ---
+    # Les agrégats sont stockés et maintenus de façon incrémentale depuis
+    # slide.slide.partner (voir _refresh_progress) : la liste, le tri et le
+    # regroupement ne coûtent plus qu'une lecture indexée. read_group n'est plus
+    # surchargé : pivot et graphe sont servis par un unique GROUP BY SQL
+    # (moyenne du %, somme du temps, max de la dernière activité).
+    partner_id = fields.Many2one('res.partner', string='Apprenant', readonly=True, index=True)
+    course_id = fields.Many2one('slide.channel', string='Cours', readonly=True, index=True)
     user_id = fields.Many2one('res.users', string='Responsable du Cours', related='course_id.user_id', store=True)
     display_name = fields.Char(string='Nom', compute='_compute_display_name')
-    total_slides = fields.Integer(string='Total Contenus', compute='_compute_progress_stats')
-    completed_slides = fields.Integer(string='Contenus Terminés', compute='_compute_progress_stats')
-    completion_percentage = fields.Float(string='Complétion (%)', compute='_compute_progress_stats',
-                                         search='_search_completion_percentage', group_operator='avg')
-    total_time_spent = fields.Integer(string='Temps Total (secondes)', compute='_compute_progress_stats')
+    total_slides = fields.Integer(string='Total Contenus', readonly=True, default=0)
+    completed_slides = fields.Integer(string='Contenus Terminés', readonly=True, default=0)
+    completion_percentage = fields.Float(string='Complétion (%)', readonly=True, default=0.0,
+                                         group_operator='avg', index=True)
+    total_time_spent = fields.Integer(string='Temps Total (secondes)', readonly=True, default=0,
+                                      group_operator='sum')
     formatted_time_spent = fields.Char(string='Temps Passé', compute='_compute_formatted_time')
-    last_activity = fields.Datetime(string='Dernière Activité', compute='_compute_progress_stats',
-                                    search='_search_last_activity')
-
-    # --- MÉTHODES COMPUTE et SEARCH (Aucun changement ici) ---
+    last_activity = fields.Datetime(string='Dernière Activité', readonly=True, group_operator='max',
+                                    index=True)
+
+    def init(self):
+        # Unicité (apprenant, cours) requise par l'upsert de _refresh_progress.
+        # Les doublons éventuellement créés par l'ancien read_group sont purgés avant.
+        self.env.cr.execute("""
+            DELETE FROM yonn_course_progress p
+             USING yonn_course_progress d
+             WHERE p.partner_id = d.partner_id
+               AND p.course_id = d.course_id
+               AND p.id > d.id
+        """)
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS yonn_course_progress_partner_course_uniq
+                ON yonn_course_progress (partner_id, course_id)
+        """)
+        # Filtres "apprenants d'un cours sous X %" : parcours d'index borné au résultat
+        sql.create_index(self.env.cr, 'yonn_course_progress_course_completion_idx',
+                         self._table, ['course_id', 'completion_percentage'])
+        # À l'installation, les colonnes x_* de slide_slide_partner peuvent ne pas
+        # encore exister : le remplissage est alors fait par le post_init_hook.
+        if sql.column_exists(self.env.cr, 'slide_slide_partner', 'x_time_spent'):
+            self._refresh_progress()
+
+    # --- MÉTHODES COMPUTE ---
     @api.depends('partner_id.name', 'course_id.name')
     def _compute_display_name(self):
         for record in self:
             record.display_name = f"{record.partner_id.name or 'N/A'} - {record.course_id.name or 'N/A'}"
 
-    def _compute_progress_stats(self):
-        for record in self:
-            if not record.partner_id or not record.course_id:
-                record.total_slides = record.completed_slides = record.total_time_spent = 0
-                record.completion_percentage = 0.0
-                record.last_activity = False
-                continue
-            sp = self.env['slide.slide.partner'].search(
-                [('partner_id', '=', record.partner_id.id), ('channel_id', '=', record.course_id.id)])
-            slides = record.course_id.slide_ids.filtered(lambda s: not s.is_category)
-            record.total_slides = len(slides)
-            record.completed_slides = len(sp.filtered('completed'))
-            record.total_time_spent = sum(sp.mapped('x_time_spent'))
-            record.completion_percentage = (
-                                                       record.completed_slides / record.total_slides) * 100.0 if record.total_slides else 0.0
-            dates = [d for d in sp.mapped('x_last_activity') if d]
-            record.last_activity = max(dates) if dates else False
-
     @api.depends('total_time_spent')
     def _compute_formatted_time(self):
         for record in self:
@@ -56,79 +65,109 @@ class CourseProgress(models.Model):
             hr, mn = divmod(mins, 60)
             record.formatted_time_spent = f"{int(hr):02d}:{int(mn):02d}:{int(sec):02d}"
 
-    def _search_completion_percentage(self, operator, value):
-        # ... (cette méthode ne change pas)
-        all_sp = self.env['slide.slide.partner'].search([])
-        stats = collections.defaultdict(lambda: {'completed': 0, 'total': 0})
-        for p in all_sp:
-            if p.channel_id and p.partner_id and p.channel_id.total_slides > 0:
-                key = (p.channel_id.id, p.partner_id.id)
-                stats[key]['total'] += 1
-                if p.completed: stats[key]['completed'] += 1
-        valid = []
-        for (course_id, _), s in stats.items():
-            perc = (s['completed'] / s['total']) * 100 if s['total'] else 0
-            if {'=': perc == value, '>': perc > value, '<': perc < value, '>=': perc >= value, '<=': perc <= value}.get(
-                    operator, False):
-                valid.append(course_id)
-        return [('course_id', 'in', list(set(valid)))]
-
-    def _search_last_activity(self, operator, value):
-        # ... (cette méthode ne change pas)
-        sp = self.env['slide.slide.partner'].search([('x_last_activity', operator, value)])
-        return [('course_id', 'in', sp.mapped('channel_id').ids)]
-
-    # --- READ_GROUP FINAL ET COMPLET ---
-        # Dans /home/ubuntu/upload/course_progress.py
-
+    # --- MAINTENANCE INCRÉMENTALE DES AGRÉGATS ---
     @api.model
-    def read_group(self, domain, fields, groupby, offset=0, limit=None, orderby=False, lazy=True):
+    def _refresh_progress(self, pairs=None):
         """
-        Surcharge de read_group, version hybride et stable.
-        On laisse super() faire le gros du travail sur les champs stockés,
-        puis on enrichit le résultat avec nos champs calculés.
+        Recalcule en une requête les agrégats des couples (partner_id, channel_id)
+        donnés, ou de tous les couples si ``pairs`` vaut None.
+        Crée les lignes manquantes et supprime celles qui n'ont plus de slide.slide.partner.
         """
-        # Étape 1: Création des enregistrements en mémoire (logique inchangée et fonctionnelle)
-        teacher_domain = [('user_id', '=', self.env.uid)]
-        courses = self.env['slide.channel'].search(teacher_domain)
-        slide_partners = self.env['slide.slide.partner'].search([('channel_id', 'in', courses.ids)])
-        partner_course_pairs = {(sp.partner_id, sp.channel_id) for sp in slide_partners if
-                                sp.partner_id and sp.channel_id}
-        if not partner_course_pairs: return []
-
-        existing_records = self.search([('partner_id', 'in', [p.id for p, c in partner_course_pairs]),
-                                        ('course_id', 'in', [c.id for p, c in partner_course_pairs])])
-        existing_pairs = {(rec.partner_id, rec.course_id) for rec in existing_records}
-        records_to_create = [{'partner_id': p.id, 'course_id': c.id} for p, c in partner_course_pairs if
-                             (p, c) not in existing_pairs]
-        if records_to_create: self.env[self._name].create(records_to_create)
+        if pairs is not None:
+            pairs = tuple({(p, c) for p, c in pairs if p and c})
+            if not pairs:
+                return
+        self.env['slide.slide.partner'].flush_model(
+            ['partner_id', 'channel_id', 'completed', 'x_time_spent', 'x_last_activity'])
+        self.env['slide.slide'].flush_model(['channel_id', 'is_category', 'active'])
+        self.env['slide.channel'].flush_model(['user_id'])
+
+        pair_clause = "AND (sp.partner_id, sp.channel_id) IN %(pairs)s" if pairs else ""
+        self.env.cr.execute(f"""
+            INSERT INTO yonn_course_progress (
+                partner_id, course_id, user_id, total_slides, completed_slides,
+                completion_percentage, total_time_spent, last_activity,
+                create_uid, create_date, write_uid, write_date)
+            SELECT sp.partner_id, sp.channel_id, sc.user_id,
+                   COALESCE(tot.nb, 0),
+                   COUNT(*) FILTER (WHERE sp.completed),
+                   CASE WHEN COALESCE(tot.nb, 0) > 0
+                        THEN COUNT(*) FILTER (WHERE sp.completed) * 100.0 / tot.nb
+                        ELSE 0.0 END,
+                   COALESCE(SUM(sp.x_time_spent), 0),
+                   MAX(sp.x_last_activity),
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM slide_slide_partner sp
+              JOIN slide_channel sc ON sc.id = sp.channel_id
+              LEFT JOIN (
+                    SELECT channel_id, COUNT(*) AS nb
+                      FROM slide_slide
+                     WHERE is_category IS NOT TRUE AND active
+                     GROUP BY channel_id
+              ) tot ON tot.channel_id = sp.channel_id
+             WHERE sp.partner_id IS NOT NULL {pair_clause}
+             GROUP BY sp.partner_id, sp.channel_id, sc.user_id, tot.nb
+            ON CONFLICT (partner_id, course_id) DO UPDATE SET
+                user_id = EXCLUDED.user_id,
+                total_slides = EXCLUDED.total_slides,
+                completed_slides = EXCLUDED.completed_slides,
+                completion_percentage = EXCLUDED.completion_percentage,
+                total_time_spent = EXCLUDED.total_time_spent,
+                last_activity = EXCLUDED.last_activity,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+        """, {'pairs': pairs, 'uid': self.env.uid})
+
+        pair_clause = "AND (p.partner_id, p.course_id) IN %(pairs)s" if pairs else ""
+        self.env.cr.execute(f"""
+            DELETE FROM yonn_course_progress p
+             WHERE NOT EXISTS (
+                    SELECT 1 FROM slide_slide_partner sp
+                     WHERE sp.partner_id = p.partner_id AND sp.channel_id = p.course_id)
+               {pair_clause}
+        """, {'pairs': pairs})
+        self.invalidate_model()
 
-        # Étape 2: On identifie les champs que super() peut gérer et ceux que nous devons calculer
-        stockable_fields = {f.split(':')[0] for f in fields if
-                            self._fields[f.split(':')[0]].store or f.split(':')[0] in ('id', 'display_name')}
-        computed_fields = [f for f in fields if f.split(':')[0] not in stockable_fields]
-
-        # Étape 3: On appelle super() UNIQUEMENT avec les champs qu'il peut gérer
-        res = super(CourseProgress, self).read_group(domain, list(stockable_fields), groupby, offset=offset,
-                                                     limit=limit, orderby=orderby, lazy=lazy)
-
-        # Étape 4: On enrichit le résultat avec nos champs calculés
-        if computed_fields:
-            for group in res:
-                # On trouve les enregistrements correspondant à ce groupe
-                records_in_group = self.search(group['__domain'])
-
-                # On calcule les agrégats pour les champs non stockés
-                for field_name_full in computed_fields:
-                    field_name = field_name_full.split(':')[0]
-                    field_obj = self._fields[field_name]
+    @api.model
+    def _refresh_course_totals(self, channel_ids):
+        """Met à jour le nombre de contenus (et donc le %) des cours dont la structure a changé."""
+        channel_ids = tuple(set(channel_ids))
+        if not channel_ids:
+            return
+        self.env['slide.slide'].flush_model(['channel_id', 'is_category', 'active'])
+        self.env.cr.execute("""
+            UPDATE yonn_course_progress p
+               SET total_slides = COALESCE(tot.nb, 0),
+                   completion_percentage = CASE WHEN COALESCE(tot.nb, 0) > 0
+                                                THEN p.completed_slides * 100.0 / tot.nb
+                                                ELSE 0.0 END
+              FROM slide_channel sc
+              LEFT JOIN (
+                    SELECT channel_id, COUNT(*) AS nb
+                      FROM slide_slide
+                     WHERE is_category IS NOT TRUE AND active AND channel_id IN %(channels)s
+                     GROUP BY channel_id
+              ) tot ON tot.channel_id = sc.id
+             WHERE sc.id = p.course_id
+               AND p.course_id IN %(channels)s
+        """, {'channels': channel_ids})
+        self.invalidate_model(['total_slides', 'completion_percentage'])
 
-                    if field_obj.group_operator == 'avg':
-                        total = sum(records_in_group.mapped(field_name))
-                        group[field_name_full] = total / len(records_in_group) if records_in_group else 0
-                    elif field_obj.type in ('integer', 'float'):
-                        group[field_name_full] = sum(records_in_group.mapped(field_name))
-                    else:
-                        group[field_name_full] = records_in_group[0][field_name] if records_in_group else False
+    @api.model
+    def _add_time_spent(self, partner_id, channel_id, seconds, last_activity):
+        """Incrément direct du temps passé : une seule UPDATE, sans relire les slides."""
+        self.env.cr.execute("""
+            UPDATE yonn_course_progress
+               SET total_time_spent = total_time_spent + %s,
+                   last_activity = GREATEST(last_activity, %s)
+             WHERE partner_id = %s AND course_id = %s
+        """, (seconds, last_activity, partner_id, channel_id))
+        if not self.env.cr.rowcount:
+            self._refresh_progress([(partner_id, channel_id)])
+        else:
+            self.invalidate_model(['total_time_spent', 'last_activity'])
 
-        return res
+    @api.model
+    def _cron_refresh_progress(self):
+        """Filet de sécurité : réaligne toutes les lignes sur slide.slide.partner (écritures SQL externes)."""
+        self._refresh_progress()
@@ -1,5 +1,6 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
+from odoo.tools import sql
 
 class SlideChannelInherit(models.Model):
     _inherit = 'slide.channel'
@@ -37,6 +38,25 @@ class SlideChannelInherit(models.Model):
 class SlideSlideInherit(models.Model):
     _inherit = 'slide.slide'
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        slides = super().create(vals_list)
+        self.env['yonn.course.progress'].sudo()._refresh_course_totals(slides.channel_id.ids)
+        return slides
+
+    def write(self, vals):
+        impacted = self.channel_id.ids if vals.keys() & {'channel_id', 'is_category', 'active'} else []
+        res = super().write(vals)
+        if impacted:
+            self.env['yonn.course.progress'].sudo()._refresh_course_totals(impacted + self.channel_id.ids)
+        return res
+
+    def unlink(self):
+        channel_ids = self.channel_id.ids
+        res = super().unlink()
+        self.env['yonn.course.progress'].sudo()._refresh_course_totals(channel_ids)
+        return res
+
     name = fields.Char(string='Title', translate=True)
 
     x_time_limit = fields.Integer(
@@ -96,6 +116,7 @@ class SlidePartnerInherit(models.Model):
     x_last_activity = fields.Datetime(
         string='Dernière activité',
         default=fields.Datetime.now,
+        index=True,
         help="Date/heure de la dernière interaction avec ce slide"
     )
 
@@ -113,13 +134,48 @@ class SlidePartnerInherit(models.Model):
     ], string="Méthode de validation")
 
 
+    def init(self):
+        # Couvre l'agrégation par (cours, apprenant) de yonn.course.progress : le
+        # comptage des contenus terminés se fait sans accès à la table.
+        sql.create_index(self.env.cr, 'slide_slide_partner_channel_partner_completed_idx',
+                         self._table, ['channel_id', 'partner_id', 'completed'])
+
+    # Champs dont dépendent les agrégats stockés de yonn.course.progress
+    _PROGRESS_FIELDS = {'partner_id', 'channel_id', 'slide_id', 'completed', 'x_time_spent', 'x_last_activity'}
+
+    def _get_progress_pairs(self):
+        return {(sp.partner_id.id, sp.channel_id.id) for sp in self}
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['yonn.course.progress'].sudo()._refresh_progress(records._get_progress_pairs())
+        return records
+
+    def write(self, vals):
+        if self.env.context.get('yonn_skip_progress_refresh') or not (vals.keys() & self._PROGRESS_FIELDS):
+            return super().write(vals)
+        pairs = self._get_progress_pairs()
+        res = super().write(vals)
+        self.env['yonn.course.progress'].sudo()._refresh_progress(pairs | self._get_progress_pairs())
+        return res
+
+    def unlink(self):
+        pairs = self._get_progress_pairs()
+        res = super().unlink()
+        self.env['yonn.course.progress'].sudo()._refresh_progress(pairs)
+        return res
+
     def add_time_spent(self, seconds_to_add):
         """Ajoute du temps passé et met à jour la dernière activité."""
         self.ensure_one()
-        self.write({
+        now = fields.Datetime.now()
+        self.with_context(yonn_skip_progress_refresh=True).write({
             'x_time_spent': self.x_time_spent + seconds_to_add,
-            'x_last_activity': fields.Datetime.now()
+            'x_last_activity': now
         })
+        self.env['yonn.course.progress'].sudo()._add_time_spent(
+            self.partner_id.id, self.channel_id.id, seconds_to_add, now)
 
 
     def toggle_completion(self):
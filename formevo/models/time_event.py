@@ -0,0 +1,86 @@
+import logging
+import threading
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+
+class TimeEvent(models.Model):
+    """
+    Tampon append-only du temps passé sur les slides.
+    Chaque hit (changement de page, heartbeat JS) insère une ligne ; le cron
+    _cron_fold_events replie ensuite les événements dans slide.slide.partner
+    par lots, ce qui évite les verrous de ligne pendant la navigation.
+    """
+    _name = 'yonn.time.event'
+    _description = 'Événement de temps passé (tampon)'
+    _order = 'id'
+    _log_access = False
+
+    slide_id = fields.Many2one('slide.slide', string='Contenu', required=True, ondelete='cascade')
+    partner_id = fields.Many2one('res.partner', string='Apprenant', required=True, ondelete='cascade')
+    seconds = fields.Integer(string='Secondes', required=True)
+    event_date = fields.Datetime(string='Date', required=True)
+
+    @api.model
+    def _record(self, slide_id, partner_id, seconds):
+        """Enregistre un événement avec un unique INSERT, sans passer par l'ORM."""
+        self.env.cr.execute("""
+            INSERT INTO yonn_time_event (slide_id, partner_id, seconds, event_date)
+            VALUES (%s, %s, %s, NOW() AT TIME ZONE 'UTC')
+        """, (slide_id, partner_id, int(seconds)))
+
+    @api.model
+    def _fold_batch(self, batch_size):
+        """
+        Consomme jusqu'à ``batch_size`` événements et les applique en une seule
+        UPDATE sur slide_slide_partner. Retourne (nb événements, couples impactés).
+        """
+        self.env['slide.slide.partner'].flush_model(['x_time_spent', 'x_last_activity'])
+        self.env.cr.execute("""
+            WITH ev AS (
+                DELETE FROM yonn_time_event
+                 WHERE id IN (SELECT id FROM yonn_time_event
+                               ORDER BY id
+                               LIMIT %s
+                               FOR UPDATE SKIP LOCKED)
+             RETURNING slide_id, partner_id, seconds, event_date
+            ), agg AS (
+                SELECT slide_id, partner_id, SUM(seconds) AS seconds,
+                       MAX(event_date) AS last_activity, COUNT(*) AS nb
+                  FROM ev
+                 GROUP BY slide_id, partner_id
+            ), upd AS (
+                UPDATE slide_slide_partner sp
+                   SET x_time_spent = COALESCE(sp.x_time_spent, 0) + agg.seconds,
+                       x_last_activity = GREATEST(sp.x_last_activity, agg.last_activity)
+                  FROM agg
+                 WHERE sp.slide_id = agg.slide_id AND sp.partner_id = agg.partner_id
+             RETURNING sp.partner_id, sp.channel_id
+            )
+            SELECT (SELECT COALESCE(SUM(nb), 0) FROM agg),
+                   ARRAY(SELECT DISTINCT ARRAY[partner_id, channel_id] FROM upd)
+        """, (batch_size,))
+        count, pairs = self.env.cr.fetchone()
+        self.env['slide.slide.partner'].invalidate_model(['x_time_spent', 'x_last_activity'])
+        return int(count), [tuple(pair) for pair in pairs or []]
+
+    @api.model
+    def _cron_fold_events(self, batch_size=5000):
+        """Replie le tampon par lots, avec un commit par lot pour ne pas garder de verrous longs."""
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        total = 0
+        while True:
+            count, pairs = self._fold_batch(batch_size)
+            if not count:
+                break
+            self.env['yonn.course.progress'].sudo()._refresh_progress(pairs)
+            total += count
+            if auto_commit:
+                self.env.cr.commit()
+            if count < batch_size:
+                break
+        if total:
+            _logger.info("Yonn Tracking: %s événements de temps repliés", total)
+        return total
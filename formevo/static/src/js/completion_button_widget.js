@@ -44,6 +44,54 @@ async function getCompletionStatus(slideId) {
     return await callJsonRoute("/yonn/tracking/get_completion_status", slideId);
 }
 
+// Heartbeat : le temps est signalé au serveur sans rendu de page
+const HEARTBEAT_INTERVAL_MS = 60000;
+
+function sendHeartbeat(slideId, seconds) {
+    return fetch("/yonn/tracking/heartbeat", {
+        method: "POST",
+        keepalive: true,
+        headers: {
+            "Content-Type": "application/json",
+            "X-Requested-With": "XMLHttpRequest",
+        },
+        body: JSON.stringify({
+            jsonrpc: "2.0",
+            method: "call",
+            params: { slide_id: slideId, seconds: seconds },
+        }),
+    }).catch((e) => console.warn("[FORMEVO] heartbeat failed", e));
+}
+
+function startHeartbeat() {
+    const slideId = getSlideIdFromUrl();
+    if (!slideId) return;
+
+    let lastBeat = Date.now();
+    const beat = () => {
+        const now = Date.now();
+        const seconds = Math.round((now - lastBeat) / 1000);
+        lastBeat = now;
+        if (seconds > 0) sendHeartbeat(slideId, seconds);
+    };
+
+    setInterval(() => {
+        if (document.visibilityState === "visible") {
+            beat();
+        } else {
+            lastBeat = Date.now();
+        }
+    }, HEARTBEAT_INTERVAL_MS);
+
+    document.addEventListener("visibilitychange", () => {
+        if (document.visibilityState === "hidden") {
+            beat();
+        } else {
+            lastBeat = Date.now();
+        }
+    });
+}
+
 function applyButtonState(button, completed) {
     if (completed) {
         button.textContent = "✓ Terminé";
@@ -131,6 +179,7 @@ function injectButton() {
 
 function boot() {
     injectButton();
+    startHeartbeat();
 
     // Si rendu dynamique: observer le DOM
     const observer = new MutationObserver(() => {
@@ -2,8 +2,14 @@
 from odoo import http
 from odoo.http import request, content_disposition
 from datetime import datetime, timedelta
+from werkzeug.http import http_date, is_resource_modified
 import json
 
+# Durée de fraîcheur de la page publique côté navigateur / CDN, puis fenêtre
+# pendant laquelle une copie périmée reste servie le temps de la revalider
+PUBLIC_RESULTS_MAX_AGE = 3600
+PUBLIC_RESULTS_STALE_WHILE_REVALIDATE = 86400
+
 
 class EvaluationResultsWebsiteController(http.Controller):
 
@@ -43,79 +49,43 @@ class EvaluationResultsWebsiteController(http.Controller):
         """
         Page publique des résultats Qualiopi
         Accessible à tous pour transparence
-        """
-        # Période par défaut : 12 derniers mois
-        date_end = datetime.now().date()
-        date_start = date_end - timedelta(days=365)
-
-        # Créer dashboard temporaire pour calculs
-        dashboard = request.env['lms_evaluation_results.results_dashboard'].sudo().create({
-            'period': 'year',
-            'date_start': date_start,
-            'date_end': date_end,
-        })
 
-        # Récupérer les témoignages récents
-        testimonials = []
-        cold_assessments = request.env['lms_evaluation_results.cold_assessment'].sudo().search([
-            ('state', '=', 'completed'),
-            ('feedback', '!=', False),
-            ('satisfaction_rate', '>=', 80),
-        ], limit=5, order='response_date desc')
-
-        for assessment in cold_assessments:
-            if assessment.feedback:
-                testimonials.append({
-                    'feedback': assessment.feedback,
-                    'partner_name': assessment.partner_id.name,
-                    'formation_name': assessment.channel_id.name,
-                    'score': assessment.satisfaction_rate,
-                })
-
-        # Calculer taux réponse J+30 et J+90
-        cold_30 = request.env['lms_evaluation_results.cold_assessment'].sudo().search_count([
-            ('assessment_type', '=', '30_days'),
-            ('state', '=', 'completed'),
-            ('create_date', '>=', date_start),
-        ])
-        cold_30_total = request.env['lms_evaluation_results.cold_assessment'].sudo().search_count([
-            ('assessment_type', '=', '30_days'),
-            ('state', 'in', ['sent', 'completed', 'expired']),
-            ('create_date', '>=', date_start),
-        ])
-
-        cold_90 = request.env['lms_evaluation_results.cold_assessment'].sudo().search_count([
-            ('assessment_type', '=', '90_days'),
-            ('state', '=', 'completed'),
-            ('create_date', '>=', date_start),
-        ])
-        cold_90_total = request.env['lms_evaluation_results.cold_assessment'].sudo().search_count([
-            ('assessment_type', '=', '90_days'),
-            ('state', 'in', ['sent', 'completed', 'expired']),
-            ('create_date', '>=', date_start),
-        ])
-
-        return request.render('lms_evaluation_results.evaluation_results_public_page', {
-            # Indicateurs
-            'completion_rate': dashboard.completion_rate,
-            'satisfaction_rate': dashboard.satisfaction_rate,
-            'success_rate': dashboard.success_rate,
-            'dropout_rate': dashboard.dropout_rate,
-            'total_participants': dashboard.total_participants,
-            'total_completions': dashboard.total_completions,
-
-            # Évaluations à froid
-            'cold_30_response_rate': (cold_30 / cold_30_total * 100) if cold_30_total else 0,
-            'cold_90_response_rate': (cold_90 / cold_90_total * 100) if cold_90_total else 0,
-            'professional_impact_rate': dashboard.professional_impact_rate,
-
-            # Métadonnées
-            'period_label': '12 derniers mois',
-            'last_update_date': datetime.now().strftime('%d/%m/%Y'),
-
-            # Témoignages
-            'testimonials': testimonials,
-        })
+        Les indicateurs proviennent de l'instantané quotidien construit par le cron :
+        une lecture, aucune écriture, et réponse 304 si le client est à jour.
+        """
+        Snapshot = request.env['lms_evaluation_results.results_snapshot'].sudo()
+        template = 'lms_evaluation_results.evaluation_results_public_page'
+
+        snapshot = Snapshot._get_latest()
+        if not snapshot:
+            # Aucun instantané encore construit (installation récente) : calcul à la volée
+            values = Snapshot._prepare_render_values(Snapshot._compute_snapshot_values())
+            return request.render(template, values)
+
+        snapshot._trigger_refresh_if_stale()
+
+        is_public = request.env.user._is_public()
+        etag = snapshot._get_etag(
+            request.lang.code if request.lang else '',
+            request.website.id if getattr(request, 'website', None) else '',
+            'public' if is_public else request.env.uid,
+        )
+        if is_public:
+            cache_control = (f'public, max-age={PUBLIC_RESULTS_MAX_AGE}, '
+                             f'stale-while-revalidate={PUBLIC_RESULTS_STALE_WHILE_REVALIDATE}')
+        else:
+            cache_control = 'private, no-cache'
+        headers = [
+            ('ETag', f'"{etag}"'),
+            ('Last-Modified', http_date(snapshot.write_date)),
+            ('Cache-Control', cache_control),
+        ]
+
+        if not is_resource_modified(request.httprequest.environ, etag=etag,
+                                    last_modified=snapshot.write_date):
+            return request.make_response(b'', headers=headers, status=304)
+
+        return request.render(template, snapshot._get_render_values(), headers=headers)
 
     @http.route('/lms/results/api/summary', type='json', auth='user')
     def get_results_summary(self, **kwargs):
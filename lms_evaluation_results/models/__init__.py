@@ -1,2 +1,4 @@
+from . import time_series
 from . import cold_assessment
-from . import results_dashboard
\ No newline at end of file
+from . import results_dashboard
+from . import results_snapshot
\ No newline at end of file
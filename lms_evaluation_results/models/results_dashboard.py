@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api, _
+from odoo.tools import SQL
 from datetime import datetime, timedelta
 import json
 
@@ -10,7 +11,7 @@ class ResultsDashboard(models.TransientModel):
     """
     _name = 'lms_evaluation_results.results_dashboard'
     _description = 'Tableau de bord des résultats'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'lms_evaluation_results.time_series_mixin']
 
     # ========== FILTRES ==========
     period = fields.Selection([
@@ -43,6 +44,18 @@ class ResultsDashboard(models.TransientModel):
         domain="[('is_company', '=', False)]"
     )
 
+    trend_granularity = fields.Selection([
+        ('week', 'Semaine'),
+        ('month', 'Mois'),
+        ('quarter', 'Trimestre'),
+    ], string='Granularité des tendances', default='month', required=True)
+
+    trend_periods = fields.Integer(
+        string='Nombre de périodes',
+        default=6,
+        help="Nombre de périodes affichées dans les graphiques de tendance"
+    )
+
     # ========== INDICATEURS GLOBAUX ==========
     total_participants = fields.Integer(
         string='Total participants',
@@ -144,84 +157,42 @@ class ResultsDashboard(models.TransientModel):
         compute='_compute_performers'
     )
 
+    _sql_constraints = [
+        ('trend_periods_positive', 'CHECK(trend_periods > 0)',
+         'Le nombre de périodes des tendances doit être positif.'),
+    ]
+
     # ========== MÉTHODES COMPUTE ==========
     @api.depends('period', 'date_start', 'date_end', 'channel_ids', 'trainer_id')
     def _compute_global_indicators(self):
         """Calcule les indicateurs globaux"""
         for dashboard in self:
-            domain = dashboard._get_base_domain()
-
             # Intégration avec formevo
-            if 'yonn.course.progress' in self.env:
-                progress_recs = self.env['yonn.course.progress'].search(domain)
-
-                dashboard.total_participants = len(set(progress_recs.mapped('partner_id').ids))
-                dashboard.total_completions = len(progress_recs.filtered(
-                    lambda r: r.completion_percentage >= 100.0
-                ))
-
-                if progress_recs:
-                    dashboard.completion_rate = (
-                        dashboard.total_completions / len(progress_recs)
-                    ) * 100.0
-                else:
-                    dashboard.completion_rate = 0.0
-
-                success = len(progress_recs.filtered(
-                    lambda r: r.completion_percentage >= 50.0
-                ))
-                dashboard.success_rate = (
-                    (success / len(progress_recs)) * 100.0
-                ) if progress_recs else 0.0
-
-                active = progress_recs.filtered(lambda r: r.last_activity)
-                if active:
-                    dropout = len(active.filtered(
-                        lambda r: r.completion_percentage < 20.0
-                    ))
-                    dashboard.dropout_rate = (dropout / len(active)) * 100.0
-                else:
-                    dashboard.dropout_rate = 0.0
-
-            else:
-                dashboard.total_participants = 0
-                dashboard.total_completions = 0
-                dashboard.completion_rate = 0.0
-                dashboard.success_rate = 0.0
-                dashboard.dropout_rate = 0.0
-
-            # Satisfaction
-            satisfaction_scores = []
-
-            cold_domain = dashboard._get_base_domain()
-            cold_domain.append(('state', '=', 'completed'))
-            cold_assessments = self.env['lms_evaluation_results.cold_assessment'].search(
-                cold_domain
-            )
-
-            if cold_assessments:
-                avg_cold = sum(cold_assessments.mapped('satisfaction_rate')) / len(cold_assessments)
-                satisfaction_scores.append(avg_cold)
-
+            totals = dashboard._get_progress_stats()['totals']
+            count = totals['count']
+
+            dashboard.total_participants = totals['partners']
+            dashboard.total_completions = totals['completed']
+            dashboard.completion_rate = (totals['completed'] / count) * 100.0 if count else 0.0
+            dashboard.success_rate = (totals['success'] / count) * 100.0 if count else 0.0
+            dashboard.dropout_rate = (
+                (totals['dropout'] / totals['active']) * 100.0
+            ) if totals['active'] else 0.0
+
+            # Satisfaction (moyenne des évaluations à froid complétées)
+            assessments = dashboard._get_assessment_stats()
             dashboard.satisfaction_rate = (
-                sum(satisfaction_scores) / len(satisfaction_scores)
-            ) if satisfaction_scores else 0.0
+                assessments['satisfaction_sum'] / assessments['completed']
+            ) if assessments['completed'] else 0.0
 
     @api.depends('period', 'date_start', 'date_end', 'channel_ids', 'trainer_id')
     def _compute_assessment_indicators(self):
         """Calcule les indicateurs liés aux évaluations"""
         for dashboard in self:
-            domain = dashboard._get_base_domain()
-
-            cold_assessments = self.env['lms_evaluation_results.cold_assessment'].search(domain)
+            assessments = dashboard._get_assessment_stats()
 
-            dashboard.cold_assessments_sent = len(cold_assessments.filtered(
-                lambda a: a.state in ['sent', 'in_progress', 'completed', 'expired']
-            ))
-
-            dashboard.cold_assessments_completed = len(cold_assessments.filtered(
-                lambda a: a.state == 'completed'
-            ))
+            dashboard.cold_assessments_sent = assessments['sent']
+            dashboard.cold_assessments_completed = assessments['completed']
 
             if dashboard.cold_assessments_sent > 0:
                 dashboard.cold_assessment_rate = (
@@ -232,14 +203,15 @@ class ResultsDashboard(models.TransientModel):
 
             dashboard.hot_assessment_rate = 0.0
 
-            completed = cold_assessments.filtered(lambda a: a.state == 'completed')
-            if completed:
-                applied = len(completed.filtered(lambda a: a.applied_skills))
-                dashboard.professional_impact_rate = (applied / len(completed)) * 100.0
+            if assessments['completed']:
+                dashboard.professional_impact_rate = (
+                    assessments['applied'] / assessments['completed']
+                ) * 100.0
             else:
                 dashboard.professional_impact_rate = 0.0
 
-    @api.depends('period', 'date_start', 'date_end', 'channel_ids', 'trainer_id')
+    @api.depends('period', 'date_start', 'date_end', 'channel_ids', 'trainer_id',
+                 'trend_granularity', 'trend_periods')
     def _compute_charts(self):
         """Génère les données des graphiques en JSON"""
         for dashboard in self:
@@ -275,7 +247,7 @@ class ResultsDashboard(models.TransientModel):
             dashboard.top_trainers = json.dumps(trainer_data)
 
     # ========== MÉTHODES PRIVÉES ==========
-    def _get_base_domain(self):
+    def _get_base_domain(self, channel_field='course_id'):
         """Construit le domaine de recherche de base"""
         self.ensure_one()
 
@@ -287,13 +259,13 @@ class ResultsDashboard(models.TransientModel):
             domain.append(('create_date', '<=', date_end))
 
         if self.channel_ids:
-            domain.append(('course_id', 'in', self.channel_ids.ids))
+            domain.append((channel_field, 'in', self.channel_ids.ids))
 
         if self.trainer_id:
             channels = self.env['slide.channel'].search([
                 ('user_id.partner_id', '=', self.trainer_id.id)
             ])
-            domain.append(('course_id', 'in', channels.ids))
+            domain.append((channel_field, 'in', channels.ids))
 
         return domain
 
@@ -321,106 +293,140 @@ class ResultsDashboard(models.TransientModel):
         return None, None
 
     def _get_completion_trend(self):
-        """Retourne la tendance de complétion sur 6 mois"""
+        """Retourne la tendance de complétion (moyenne par période)"""
         self.ensure_one()
 
         if 'yonn.course.progress' not in self.env:
             return []
 
-        data = []
-        today = fields.Date.today()
-
-        for i in range(5, -1, -1):
-            start = today - timedelta(days=(i + 1) * 30)
-            end = today - timedelta(days=i * 30)
-
-            domain = self._get_base_domain()
-            domain.append(('last_activity', '>=', start))
-            domain.append(('last_activity', '<', end))
-
-            recs = self.env['yonn.course.progress'].search(domain)
-
-            if recs:
-                avg = sum(recs.mapped('completion_percentage')) / len(recs)
-            else:
-                avg = 0.0
-
-            data.append({
-                'label': start.strftime('%m/%Y'),
-                'value': round(avg, 2)
-            })
-
-        return data
+        return self._read_time_series(
+            'yonn.course.progress', self._get_base_domain(), 'last_activity',
+            measure='completion_percentage', aggregator='avg',
+            granularity=self.trend_granularity or 'month', periods=self.trend_periods or 6,
+        )
 
     def _get_satisfaction_trend(self):
-        """Retourne la tendance de satisfaction sur 6 mois"""
+        """Retourne la tendance de satisfaction (moyenne par période)"""
         self.ensure_one()
 
-        data = []
-        today = fields.Date.today()
+        domain = self._get_base_domain(channel_field='channel_id')
+        domain.append(('state', '=', 'completed'))
+
+        return self._read_time_series(
+            'lms_evaluation_results.cold_assessment', domain, 'scheduled_date',
+            measure='satisfaction_rate', aggregator='avg',
+            granularity=self.trend_granularity or 'month', periods=self.trend_periods or 6,
+        )
+
+    def _get_progress_stats(self):
+        """
+        Agrégats de yonn.course.progress pour les filtres du tableau de bord, en une requête :
+        un GROUP BY par formation plus la ligne de total (GROUPING SETS).
+        Partagés par tous les calculs du même filtre pendant la transaction.
+
+        Retourne ``{'totals': {...}, 'channels': {channel_id: {...}}}`` avec pour chaque
+        groupe : count, partners, completed (>= 100 %), success (>= 50 %), active
+        (dernière activité connue), dropout (actifs sous 20 %), avg_completion.
+        """
+        self.ensure_one()
 
-        for i in range(5, -1, -1):
-            start = today - timedelta(days=(i + 1) * 30)
-            end = today - timedelta(days=i * 30)
+        empty = dict.fromkeys(['count', 'partners', 'completed', 'success', 'active', 'dropout'], 0)
+        empty['avg_completion'] = 0.0
+        if 'yonn.course.progress' not in self.env:
+            return {'totals': empty, 'channels': {}}
 
-            domain = self._get_base_domain()
-            domain.append(('scheduled_date', '>=', start))
-            domain.append(('scheduled_date', '<', end))
-            domain.append(('state', '=', 'completed'))
+        domain = self._get_base_domain()
+        cache_key = ('lms_evaluation_results.progress_stats', self.env.uid, repr(domain))
+        if cache_key in self.env.cr.cache:
+            return self.env.cr.cache[cache_key]
+
+        Progress = self.env['yonn.course.progress']
+        Progress.flush_model()
+        self.env.cr.execute(SQL("""
+            SELECT p.course_id,
+                   GROUPING(p.course_id) = 1,
+                   COUNT(*),
+                   COUNT(DISTINCT p.partner_id),
+                   COUNT(*) FILTER (WHERE p.completion_percentage >= 100),
+                   COUNT(*) FILTER (WHERE p.completion_percentage >= 50),
+                   COUNT(*) FILTER (WHERE p.last_activity IS NOT NULL),
+                   COUNT(*) FILTER (WHERE p.last_activity IS NOT NULL
+                                      AND p.completion_percentage < 20),
+                   COALESCE(AVG(p.completion_percentage), 0)
+              FROM yonn_course_progress p
+             WHERE p.id IN (%s)
+          GROUP BY GROUPING SETS ((p.course_id), ())
+        """, Progress._search(domain).subselect()))
+
+        stats = {'totals': empty, 'channels': {}}
+        keys = ['count', 'partners', 'completed', 'success', 'active', 'dropout', 'avg_completion']
+        for row in self.env.cr.fetchall():
+            channel_id, is_total, values = row[0], row[1], dict(zip(keys, row[2:]))
+            if is_total:
+                stats['totals'] = values
+            elif channel_id:
+                stats['channels'][channel_id] = values
+
+        self.env.cr.cache[cache_key] = stats
+        return stats
+
+    def _get_assessment_stats(self):
+        """
+        Compteurs des évaluations à froid pour les filtres du tableau de bord
+        (un seul regroupement par statut et compétences appliquées)
+        """
+        self.ensure_one()
 
-            assessments = self.env['lms_evaluation_results.cold_assessment'].search(domain)
+        domain = self._get_base_domain(channel_field='channel_id')
+        cache_key = ('lms_evaluation_results.assessment_stats', self.env.uid, repr(domain))
+        if cache_key in self.env.cr.cache:
+            return self.env.cr.cache[cache_key]
+
+        stats = {'sent': 0, 'completed': 0, 'applied': 0, 'satisfaction_sum': 0.0}
+        for state, applied_skills, count, satisfaction_sum in self.env[
+            'lms_evaluation_results.cold_assessment'
+        ]._read_group(domain, ['state', 'applied_skills'], ['__count', 'satisfaction_rate:sum']):
+            if state in ('sent', 'in_progress', 'completed', 'expired'):
+                stats['sent'] += count
+            if state == 'completed':
+                stats['completed'] += count
+                stats['satisfaction_sum'] += satisfaction_sum or 0.0
+                if applied_skills:
+                    stats['applied'] += count
+
+        self.env.cr.cache[cache_key] = stats
+        return stats
+
+    def _get_channel_success_rates(self):
+        """Taux de réussite (complétion 100 %) de chaque formation, du meilleur au moins bon"""
+        self.ensure_one()
 
-            if assessments:
-                avg = sum(assessments.mapped('satisfaction_rate')) / len(assessments)
-            else:
-                avg = 0.0
+        channel_stats = self._get_progress_stats()['channels']
+        channels = self.env['slide.channel'].browse(channel_stats)
 
+        data = []
+        for channel in channels:
+            values = channel_stats[channel.id]
             data.append({
-                'label': start.strftime('%m/%Y'),
-                'value': round(avg, 2)
+                'channel_id': channel.id,
+                'label': channel.name,
+                'value': round((values['completed'] / values['count']) * 100.0, 2)
             })
 
+        data.sort(key=lambda x: x['value'], reverse=True)
         return data
 
     def _get_success_by_channel(self):
         """Retourne le taux de réussite par formation"""
-        self.ensure_one()
-
-        if 'yonn.course.progress' not in self.env:
-            return []
-
-        data = []
-        domain = self._get_base_domain()
-
-        progress_recs = self.env['yonn.course.progress'].search(domain)
-        channels = set(progress_recs.mapped('course_id'))
-
-        for channel in channels:
-            channel_recs = progress_recs.filtered(lambda r: r.course_id == channel)
-
-            if channel_recs:
-                success = len(channel_recs.filtered(
-                    lambda r: r.completion_percentage >= 100.0
-                ))
-                rate = (success / len(channel_recs)) * 100.0
-
-                data.append({
-                    'channel_id': channel.id,
-                    'label': channel.name,
-                    'value': round(rate, 2)
-                })
-
-        data.sort(key=lambda x: x['value'], reverse=True)
-        return data[:10]
+        return self._get_channel_success_rates()[:10]
 
     def _get_top_channels(self, limit=5):
         """Retourne les meilleures formations"""
-        data = self._get_success_by_channel()
-        return data[:limit]
+        return self._get_channel_success_rates()[:limit]
 
     def _get_bottom_channels(self, limit=5):
         """Retourne les formations à améliorer"""
-        data = self._get_success_by_channel()
+        data = self._get_channel_success_rates()
         data.sort(key=lambda x: x['value'])
         return data[:limit]
 
@@ -428,14 +434,8 @@ class ResultsDashboard(models.TransientModel):
         """Retourne les meilleurs formateurs"""
         self.ensure_one()
 
-        if 'yonn.course.progress' not in self.env:
-            return []
-
-        data = []
-        domain = self._get_base_domain()
-
-        progress_recs = self.env['yonn.course.progress'].search(domain)
-        channels = set(progress_recs.mapped('course_id'))
+        channel_stats = self._get_progress_stats()['channels']
+        channels = self.env['slide.channel'].browse(channel_stats)
 
         trainer_map = {}
         for channel in channels:
@@ -443,20 +443,16 @@ class ResultsDashboard(models.TransientModel):
                 continue
 
             trainer = channel.user_id.partner_id
-            channel_recs = progress_recs.filtered(lambda r: r.course_id == channel)
-
-            if channel_recs:
-                avg = sum(channel_recs.mapped('completion_percentage')) / len(channel_recs)
+            if trainer.id not in trainer_map:
+                trainer_map[trainer.id] = {
+                    'id': trainer.id,
+                    'name': trainer.name,
+                    'values': []
+                }
 
-                if trainer.id not in trainer_map:
-                    trainer_map[trainer.id] = {
-                        'id': trainer.id,
-                        'name': trainer.name,
-                        'values': []
-                    }
-
-                trainer_map[trainer.id]['values'].append(avg)
+            trainer_map[trainer.id]['values'].append(channel_stats[channel.id]['avg_completion'])
 
+        data = []
         for trainer_data in trainer_map.values():
             avg = sum(trainer_data['values']) / len(trainer_data['values'])
             data.append({
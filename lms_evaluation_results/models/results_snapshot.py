@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, _
+from datetime import timedelta
+import hashlib
+import json
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Délai minimal entre deux relances du cron déclenchées par la page publique (secondes)
+REFRESH_TRIGGER_INTERVAL = 3600
+_last_refresh_trigger = 0.0
+
+
+class ResultsSnapshot(models.Model):
+    """
+    Instantané quotidien des résultats publiés sur /formations/resultats
+    Construit par un cron : la page publique se contente d'une lecture
+    """
+    _name = 'lms_evaluation_results.results_snapshot'
+    _description = 'Instantané des résultats publics'
+    _order = 'snapshot_date desc, id desc'
+
+    snapshot_date = fields.Date(
+        string="Date de l'instantané",
+        required=True,
+        index=True,
+        default=fields.Date.today
+    )
+
+    period_label = fields.Char(
+        string='Période',
+        default='12 derniers mois'
+    )
+
+    date_start = fields.Date(string='Date début')
+    date_end = fields.Date(string='Date fin')
+
+    # ========== INDICATEURS ==========
+    total_participants = fields.Integer(string='Total participants')
+    total_completions = fields.Integer(string='Total formations terminées')
+    completion_rate = fields.Float(string='Taux de complétion (%)', digits=(5, 2))
+    satisfaction_rate = fields.Float(string='Taux de satisfaction (%)', digits=(5, 2))
+    success_rate = fields.Float(string='Taux de réussite (%)', digits=(5, 2))
+    dropout_rate = fields.Float(string="Taux d'abandon (%)", digits=(5, 2))
+
+    # ========== ÉVALUATIONS À FROID ==========
+    cold_30_response_rate = fields.Float(string='Taux réponse J+30 (%)', digits=(5, 2))
+    cold_90_response_rate = fields.Float(string='Taux réponse J+90 (%)', digits=(5, 2))
+    professional_impact_rate = fields.Float(string='Taux impact professionnel (%)', digits=(5, 2))
+
+    testimonials = fields.Text(
+        string='Témoignages (JSON)',
+        help="Témoignages récents affichés sur la page publique"
+    )
+
+    _sql_constraints = [
+        ('snapshot_date_uniq', 'unique(snapshot_date)',
+         "Un seul instantané des résultats par jour."),
+    ]
+
+    # ========== CONSTRUCTION ==========
+    @api.model
+    def _compute_snapshot_values(self):
+        """Calcule les valeurs de la page publique sur les 12 derniers mois"""
+        date_end = fields.Date.today()
+        date_start = date_end - timedelta(days=365)
+
+        dashboard = self.env['lms_evaluation_results.results_dashboard'].create({
+            'period': 'year',
+            'date_start': date_start,
+            'date_end': date_end,
+        })
+
+        Assessment = self.env['lms_evaluation_results.cold_assessment']
+
+        # Témoignages récents
+        testimonials = []
+        for assessment in Assessment.search([
+            ('state', '=', 'completed'),
+            ('feedback', '!=', False),
+            ('satisfaction_rate', '>=', 80),
+        ], limit=5, order='response_date desc'):
+            testimonials.append({
+                'feedback': assessment.feedback,
+                'partner_name': assessment.partner_id.name,
+                'formation_name': assessment.channel_id.name,
+                'score': assessment.satisfaction_rate,
+            })
+
+        # Taux de réponse J+30 et J+90 : un seul regroupement
+        counts = {
+            (assessment_type, state): count
+            for assessment_type, state, count in Assessment._read_group(
+                [('assessment_type', 'in', ['30_days', '90_days']),
+                 ('state', 'in', ['sent', 'completed', 'expired']),
+                 ('create_date', '>=', date_start)],
+                ['assessment_type', 'state'], ['__count'],
+            )
+        }
+
+        def response_rate(assessment_type):
+            total = sum(counts.get((assessment_type, state), 0)
+                        for state in ('sent', 'completed', 'expired'))
+            completed = counts.get((assessment_type, 'completed'), 0)
+            return (completed / total * 100) if total else 0
+
+        return {
+            'period_label': '12 derniers mois',
+            'date_start': date_start,
+            'date_end': date_end,
+            'total_participants': dashboard.total_participants,
+            'total_completions': dashboard.total_completions,
+            'completion_rate': dashboard.completion_rate,
+            'satisfaction_rate': dashboard.satisfaction_rate,
+            'success_rate': dashboard.success_rate,
+            'dropout_rate': dashboard.dropout_rate,
+            'cold_30_response_rate': response_rate('30_days'),
+            'cold_90_response_rate': response_rate('90_days'),
+            'professional_impact_rate': dashboard.professional_impact_rate,
+            'testimonials': json.dumps(testimonials),
+        }
+
+    @api.model
+    def _cron_build_snapshot(self):
+        """Construit (ou reconstruit) l'instantané du jour"""
+        _logger.info("CRON: Instantané des résultats publics - DÉBUT")
+
+        values = self._compute_snapshot_values()
+        today = fields.Date.today()
+        snapshot = self.search([('snapshot_date', '=', today)], limit=1)
+        if snapshot:
+            snapshot.write(values)
+        else:
+            snapshot = self.create(dict(values, snapshot_date=today))
+
+        _logger.info(f"CRON: Instantané des résultats du {today} enregistré (id {snapshot.id})")
+        return snapshot
+
+    # ========== LECTURE (PAGE PUBLIQUE) ==========
+    @api.model
+    def _get_latest(self):
+        return self.search([], limit=1)
+
+    @api.model
+    def _prepare_render_values(self, values, last_update=None):
+        """Valeurs du template public à partir des valeurs d'un instantané"""
+        render_values = dict(values)
+        render_values['testimonials'] = json.loads(values.get('testimonials') or '[]')
+        render_values['last_update_date'] = (last_update or fields.Date.today()).strftime('%d/%m/%Y')
+        return render_values
+
+    def _get_render_values(self):
+        self.ensure_one()
+        values = self.read([
+            'period_label', 'total_participants', 'total_completions',
+            'completion_rate', 'satisfaction_rate', 'success_rate', 'dropout_rate',
+            'cold_30_response_rate', 'cold_90_response_rate', 'professional_impact_rate',
+            'testimonials',
+        ])[0]
+        return self._prepare_render_values(values, last_update=self.write_date)
+
+    def _get_etag(self, *variants):
+        """ETag de l'instantané ; ``variants`` distingue les rendus (langue, site...)"""
+        self.ensure_one()
+        raw = '|'.join(str(part) for part in (self.id, self.write_date) + variants)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _trigger_refresh_if_stale(self):
+        """
+        Instantané d'un jour précédent : il reste servi, et le cron de construction
+        est relancé en arrière-plan (au plus une fois par heure et par processus)
+        """
+        global _last_refresh_trigger
+        self.ensure_one()
+        if self.snapshot_date >= fields.Date.today():
+            return
+        now = time.monotonic()
+        if now - _last_refresh_trigger < REFRESH_TRIGGER_INTERVAL:
+            return
+        _last_refresh_trigger = now
+        cron = self.env.ref('lms_evaluation_results.cron_build_results_snapshot', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
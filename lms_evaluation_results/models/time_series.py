@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, _
+from odoo.tools.misc import get_lang
+from datetime import datetime, timedelta
+from dateutil.relativedelta import relativedelta
+import pytz
+
+# Pas entre deux périodes et format du libellé, par granularité
+TIME_SERIES_GRANULARITIES = {
+    'day': (relativedelta(days=1), '%d/%m/%Y'),
+    'week': (relativedelta(weeks=1), '%d/%m/%Y'),
+    'month': (relativedelta(months=1), '%m/%Y'),
+    'quarter': (relativedelta(months=3), None),
+    'year': (relativedelta(years=1), '%Y'),
+}
+
+
+class TimeSeriesMixin(models.AbstractModel):
+    """
+    Séries temporelles pour les graphiques de tendance des tableaux de bord
+
+    Toutes les périodes sont calculées en une requête : regroupement SQL sur
+    date_trunc(granularité) via _read_group, puis complétion des périodes vides.
+    Utilisable pour tout modèle et tout champ date/datetime, sur 6 comme sur 36 périodes.
+    """
+    _name = 'lms_evaluation_results.time_series_mixin'
+    _description = 'Séries temporelles des tableaux de bord'
+
+    @api.model
+    def _get_period_start(self, day, granularity):
+        """Début de la période (au sens de _read_group) contenant ``day``"""
+        if granularity == 'week':
+            # _read_group décale les semaines selon le premier jour de la langue
+            week_start = int(get_lang(self.env).week_start)
+            return day - timedelta(days=(day.isoweekday() - week_start) % 7)
+        if granularity == 'month':
+            return day.replace(day=1)
+        if granularity == 'quarter':
+            return day.replace(month=3 * ((day.month - 1) // 3) + 1, day=1)
+        if granularity == 'year':
+            return day.replace(month=1, day=1)
+        return day
+
+    @api.model
+    def _day_start_utc(self, day):
+        """Minuit de ``day`` dans le fuseau du contexte (celui du regroupement), en UTC naïf"""
+        start = datetime.combine(day, datetime.min.time())
+        tz = self.env.context.get('tz')
+        if tz in pytz.all_timezones_set:
+            start = pytz.timezone(tz).localize(start).astimezone(pytz.utc).replace(tzinfo=None)
+        return start
+
+    @api.model
+    def _format_period_label(self, start, granularity):
+        label_format = TIME_SERIES_GRANULARITIES[granularity][1]
+        if label_format is None:
+            return f"T{(start.month - 1) // 3 + 1} {start.year}"
+        return start.strftime(label_format)
+
+    @api.model
+    def _read_time_series(self, model_name, domain, date_field, measure='__count',
+                          aggregator='avg', granularity='month', periods=6, end_date=None):
+        """
+        Agrège ``measure`` de ``model_name`` par période de ``date_field``.
+
+        :param domain: filtre appliqué en plus des bornes de la série
+        :param measure: champ à agréger, ou '__count' pour compter les enregistrements
+        :param aggregator: avg, sum, min, max... (ignoré pour '__count')
+        :param granularity: day, week, month, quarter ou year
+        :param periods: nombre de périodes, la dernière contenant ``end_date``
+        :return: ``[{'label': ..., 'value': ...}]`` du plus ancien au plus récent,
+                 0 pour les périodes sans données
+        """
+        step = TIME_SERIES_GRANULARITIES[granularity][0]
+        periods = max(1, periods)
+        end_date = end_date or fields.Date.context_today(self)
+        last_start = self._get_period_start(end_date, granularity)
+        starts = [last_start - step * i for i in range(periods - 1, -1, -1)]
+
+        Model = self.env[model_name]
+        date_from, date_to = starts[0], last_start + step
+        if Model._fields[date_field].type == 'datetime':
+            date_from = self._day_start_utc(date_from)
+            date_to = self._day_start_utc(date_to)
+
+        aggregate = '__count' if measure == '__count' else f'{measure}:{aggregator}'
+        values = {}
+        for period, value in Model._read_group(
+            list(domain) + [(date_field, '>=', date_from), (date_field, '<', date_to)],
+            [f'{date_field}:{granularity}'],
+            [aggregate],
+        ):
+            if not period:
+                continue
+            if isinstance(period, datetime):
+                period = period.date()
+            values[period] = value or 0
+
+        return [{
+            'label': self._format_period_label(start, granularity),
+            'value': round(values.get(start, 0), 2),
+        } for start in starts]
@@ -0,0 +1,51 @@
+# custom_addons/lms_presence/controllers/main.py
+# -*- coding: utf-8 -*-
+from odoo import http, _
+from odoo.exceptions import AccessError
+from odoo.http import request
+
+
+class PresenceController(http.Controller):
+
+    @http.route('/lms_presence/session/<int:session_id>/validate', type='json', auth='user')
+    def validate_session(self, session_id, validations=None, validation_type=None, **kwargs):
+        """
+        Validation d'une salle entière en un aller-retour (tablette enseignant)
+        ``validations`` : {type: [ids de lignes]} avec type parmi
+        BATCH_VALIDATION_TYPES ; ``validation_type`` s'applique aux lignes de
+        la session non listées (ex. tous présents sauf les absents indiqués).
+        """
+        if not request.env.user.has_group('lms_presence.group_teacher'):
+            raise AccessError(_("Seuls les enseignants peuvent valider les présences."))
+
+        session = request.env['lms_presence.attendance_session'].browse(session_id).exists()
+        if not session:
+            return {'success': False, 'error': _('Session introuvable')}
+
+        validations = dict(validations or {})
+        if validation_type:
+            validations.setdefault(validation_type, [])
+
+        requested_ids = set()
+        for ids in validations.values():
+            if requested_ids.intersection(ids):
+                return {'success': False, 'error': _("Une ligne ne peut recevoir qu'un seul type de validation")}
+            requested_ids.update(ids)
+
+        # Lignes de la session uniquement, en une lecture
+        lines = request.env['lms_presence.attendance_line'].search([('session_id', '=', session.id)])
+        lines_by_type = {
+            vtype: lines.filtered(lambda l, ids=set(ids): l.id in ids)
+            for vtype, ids in validations.items()
+        }
+        if validation_type:
+            lines_by_type[validation_type] |= lines.filtered(lambda l: l.id not in requested_ids)
+
+        done = request.env['lms_presence.attendance_line']._batch_validate(lines_by_type)
+        return {
+            'success': True,
+            'validated': dict(done),
+            'session': session.read([
+                'total_attendees', 'present_count', 'absent_count', 'late_count', 'attendance_rate',
+            ])[0],
+        }
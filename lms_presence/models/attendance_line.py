@@ -2,11 +2,15 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
+from collections import Counter, defaultdict
 from datetime import datetime, timedelta
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Types de validation en lot (assistant et saisie tablette enseignant)
+BATCH_VALIDATION_TYPES = ('present', 'absent', 'validate')
+
 
 class FormationAttendanceLine(models.Model):
     _name = 'lms_presence.attendance_line'
@@ -224,6 +228,13 @@ class FormationAttendanceLine(models.Model):
         string='Nom fichier justificatif'
     )
 
+    # ========== RELANCES ==========
+    inactivity_reminder_date = fields.Datetime(
+        string='Dernière relance inactivité',
+        readonly=True,
+        copy=False
+    )
+
     # ========== NOTES ==========
     notes = fields.Text(string='Notes')
 
@@ -274,15 +285,19 @@ class FormationAttendanceLine(models.Model):
     # ========== ACTIONS ==========
     def action_validate_teacher(self):
         """Validation par l'enseignant"""
-        for line in self:
-            line.validated_by_teacher = True
-            line.validation_date_teacher = fields.Datetime.now()
-
-            # Confirmer la présence si pas encore fait
-            if line.state == 'draft' and line.validated_by_participant:
-                line.state = 'present'
-
-    def action_mark_absent(self):
+        self._validate_teacher(fields.Datetime.now())
+
+    def _validate_teacher(self, validation_date):
+        """Validation enseignant groupée : une écriture par statut cible"""
+        vals = {'validated_by_teacher': True, 'validation_date_teacher': validation_date}
+        # Confirmer la présence si pas encore fait
+        to_confirm = self.filtered(lambda l: l.state == 'draft' and l.validated_by_participant)
+        if to_confirm:
+            to_confirm.write(dict(vals, state='present'))
+        if self - to_confirm:
+            (self - to_confirm).write(vals)
+
+    def action_mark_absent(self, validation_date=None):
         """Marquer comme absent"""
         self.write({
             'state': 'absent',
@@ -290,15 +305,15 @@ class FormationAttendanceLine(models.Model):
             'check_out': False,
             'validated_by_participant': False,
             'validated_by_teacher': True,
-            'validation_date_teacher': fields.Datetime.now(),
+            'validation_date_teacher': validation_date or fields.Datetime.now(),
         })
 
-    def action_mark_present(self):
+    def action_mark_present(self, validation_date=None):
         """Marquer comme présent"""
         self.write({
             'state': 'present',
             'validated_by_teacher': True,
-            'validation_date_teacher': fields.Datetime.now(),
+            'validation_date_teacher': validation_date or fields.Datetime.now(),
         })
 
     def action_mark_late(self):
@@ -307,6 +322,57 @@ class FormationAttendanceLine(models.Model):
             self.check_in = fields.Datetime.now()
         self.state = 'late'
 
+    @api.model
+    def _batch_validate(self, validations):
+        """
+        Validation en lot : ``validations`` associe un type de validation
+        (BATCH_VALIDATION_TYPES) aux lignes concernées. Une écriture par statut
+        cible, un horodatage unique, pas de suivi chatter par ligne : le
+        journal reçoit une seule entrée récapitulative par session.
+        Retourne le nombre de lignes traitées par type.
+        """
+        unknown = set(validations) - set(BATCH_VALIDATION_TYPES)
+        if unknown:
+            raise UserError(_("Type de validation inconnu : %s") % ', '.join(sorted(unknown)))
+        all_lines = self.browse()
+        for lines in validations.values():
+            if lines & all_lines:
+                raise UserError(_("Une ligne ne peut recevoir qu'un seul type de validation."))
+            all_lines |= lines
+
+        now = fields.Datetime.now()
+        done = Counter()
+        per_session = defaultdict(Counter)
+        for validation_type, lines in validations.items():
+            if not lines:
+                continue
+            lines = lines.with_context(tracking_disable=True)
+            if validation_type == 'present':
+                lines.action_mark_present(now)
+            elif validation_type == 'absent':
+                lines.action_mark_absent(now)
+            else:
+                lines._validate_teacher(now)
+            done[validation_type] += len(lines)
+            for line in lines:
+                per_session[line.session_id.id][validation_type] += 1
+
+        labels = {
+            'present': _('%d présent(s)'),
+            'absent': _('%d absent(s)'),
+            'validate': _('%d validation(s) enseignant'),
+        }
+        self.env['lms_presence.attendance_session']._bulk_log_actions([{
+            'session_id': session_id,
+            'action_type': 'write',
+            'log_category': 'attendance',
+            'description': _('Validation en lot : %s') % ', '.join(
+                labels[validation_type] % counts[validation_type]
+                for validation_type in BATCH_VALIDATION_TYPES if counts[validation_type]
+            ),
+        } for session_id, counts in per_session.items()])
+        return done
+
     def _create_teacher_activity(self):
         """Crée une activité pour l'enseignant"""
         self.ensure_one()
@@ -325,13 +391,14 @@ class FormationAttendanceLine(models.Model):
 
     # ========== NOTIFICATIONS ==========
     def _notify_handicap_to_teacher(self):
-        """Notifie l'enseignant si le participant a un handicap"""
-        self.ensure_one()
+        """Notifie l'enseignant pour les participants en situation de handicap (rendu et envoi groupés)"""
+        lines = self.filtered(lambda l: l.has_disability and l.session_state == 'confirmed')
+        if not lines:
+            return
 
-        if self.has_disability and self.session_state == 'confirmed':
-            template = self.env.ref('lms_presence.mail_template_handicap_notification')
-            if template:
-                template.send_mail(self.id, force_send=False)
+        template = self.env.ref('lms_presence.mail_template_handicap_notification', raise_if_not_found=False)
+        if template:
+            template.send_mail_batch(lines.ids, force_send=False)
 
     @api.model
     def create(self, vals):
@@ -383,11 +450,7 @@ class FormationAttendanceLine(models.Model):
         # Création des lignes
         lines = super(FormationAttendanceLine, self).create(vals_list)
 
-        # Post-traitement en batch
-        lines_with_disability = lines.filtered(lambda l: l.has_disability)
-        if lines_with_disability:
-            # Notifications en batch si possible
-            for line in lines_with_disability:
-                line._notify_handicap_to_teacher()
+        # Notifications handicap : un seul envoi groupé pour toutes les lignes
+        lines._notify_handicap_to_teacher()
 
         return lines
\ No newline at end of file
@@ -2,11 +2,21 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
+from odoo.osv import expression
+from odoo.tools import split_every
+from collections import Counter
 from datetime import datetime, timedelta
 import logging
+import threading
+import time
 
 _logger = logging.getLogger(__name__)
 
+# Crons présence : sessions traitées par lots (un commit par lot) et durée
+# maximale d'une exécution avant reprise planifiée
+CRON_SESSION_BATCH = 50
+CRON_TIME_BUDGET = 600
+
 
 class FormationAttendanceSession(models.Model):
     _name = 'lms_presence.attendance_session'
@@ -160,7 +170,8 @@ class FormationAttendanceSession(models.Model):
         string='Taux de présence (%)',
         compute='_compute_counts',
         store=True,
-        digits=(5, 2)
+        digits=(5, 2),
+        group_operator='avg'
     )
 
     # ========== NOTES ==========
@@ -172,6 +183,12 @@ class FormationAttendanceSession(models.Model):
         string='Documents associés'
     )
 
+    # ========== TÊTE DU JOURNAL ==========
+    # Dernière entrée de la chaîne du journal (voir session_log._prepare_chain),
+    # écrite en SQL uniquement
+    log_head_sequence = fields.Integer(string='Dernier n° du journal', readonly=True, copy=False)
+    log_head_hash = fields.Char(string='Dernière empreinte du journal', readonly=True, copy=False)
+
     # ========== MÉTHODES COMPUTE ==========
     @api.depends('date_start', 'date_end')
     def _compute_duration(self):
@@ -184,17 +201,38 @@ class FormationAttendanceSession(models.Model):
 
     @api.depends('attendance_line_ids', 'attendance_line_ids.state')
     def _compute_counts(self):
-        for session in self:
-            lines = session.attendance_line_ids
-            session.total_attendees = len(lines)
-            session.present_count = len(lines.filtered(lambda l: l.state == 'present'))
-            session.absent_count = len(lines.filtered(lambda l: l.state == 'absent'))
-            session.late_count = len(lines.filtered(lambda l: l.state == 'late'))
-
-            if session.total_attendees > 0:
-                session.attendance_rate = (session.present_count / session.total_attendees) * 100
-            else:
-                session.attendance_rate = 0.0
+        """
+        Compteurs stockés, recalculés uniquement pour les sessions dont une
+        ligne a été ajoutée, supprimée ou a changé de statut : un seul
+        regroupement SQL (session, statut) pour toutes ces sessions, sans
+        charger les lignes
+        """
+        # Sessions en cours d'édition (onchange) : lignes pas encore en base
+        new_sessions = self.filtered(lambda s: not s.id)
+        for session in new_sessions:
+            states = Counter(session.attendance_line_ids.mapped('state'))
+            session._set_counts(states, len(session.attendance_line_ids))
+
+        sessions = self - new_sessions
+        counts = {}
+        if sessions:
+            groups = self.env['lms_presence.attendance_line']._read_group(
+                [('session_id', 'in', sessions.ids)],
+                ['session_id', 'state'],
+                ['__count'],
+            )
+            for session, state, count in groups:
+                counts.setdefault(session.id, Counter())[state] = count
+        for session in sessions:
+            states = counts.get(session.id, Counter())
+            session._set_counts(states, sum(states.values()))
+
+    def _set_counts(self, states, total):
+        self.total_attendees = total
+        self.present_count = states['present']
+        self.absent_count = states['absent']
+        self.late_count = states['late']
+        self.attendance_rate = (states['present'] / total) * 100 if total else 0.0
 
     # ========== CONTRAINTES ==========
     @api.constrains('date_start', 'date_end')
@@ -260,23 +298,66 @@ class FormationAttendanceSession(models.Model):
     # ========== MÉTHODES MÉTIER ==========
     def _generate_attendance_lines(self):
         """Génère les lignes de présence pour les participants inscrits"""
+        return self._sync_attendance_lines(remove_stale=True)
+
+    def _sync_attendance_lines(self, remove_stale=False):
+        """
+        Synchronise en une passe les feuilles de présence de plusieurs sessions :
+        différence participants inscrits / lignes existantes, lignes manquantes
+        créées par un seul create(vals_list). Les lignes existantes (pointages,
+        validations) sont conservées ; avec ``remove_stale``, seules les lignes
+        vierges des participants désinscrits sont supprimées.
+        Retourne les lignes créées.
+        """
         AttendanceLine = self.env['lms_presence.attendance_line']
+        if not self:
+            return AttendanceLine
+
+        # Participants ayant déjà une ligne, par session, en une requête
+        existing = {
+            session.id: participants
+            for session, participants in AttendanceLine._read_group(
+                [('session_id', 'in', self.ids)], ['session_id'], ['participant_id:recordset'],
+            )
+        }
 
+        vals_list = []
+        stale_participants = {}
         for session in self:
-            # Supprimer les anciennes lignes
-            session.attendance_line_ids.unlink()
-
-            # Créer les nouvelles lignes
-            for attendee in session.attendee_ids:
-                AttendanceLine.create({
-                    'session_id': session.id,
-                    'participant_id': attendee.id,
-                })
+            participants = existing.get(session.id, self.env['res.partner'])
+            vals_list += [
+                {'session_id': session.id, 'participant_id': attendee.id}
+                for attendee in session.attendee_ids - participants
+            ]
+            if remove_stale and participants - session.attendee_ids:
+                stale_participants[session.id] = (participants - session.attendee_ids).ids
+
+        if stale_participants:
+            stale_domain = expression.OR([
+                [('session_id', '=', session_id), ('participant_id', 'in', participant_ids)]
+                for session_id, participant_ids in stale_participants.items()
+            ])
+            AttendanceLine.search(expression.AND([stale_domain, [
+                ('state', '=', 'draft'),
+                ('check_in', '=', False),
+                ('validated_by_participant', '=', False),
+                ('validated_by_teacher', '=', False),
+            ]])).unlink()
+
+        # Pas de message de création ni d'abonné par ligne : la session trace la synchronisation
+        lines = AttendanceLine.with_context(
+            mail_create_nolog=True,
+            mail_create_nosubscribe=True,
+        ).create(vals_list)
+
+        if lines:
+            _logger.info("📋 %d ligne(s) de présence créées pour %d session(s)", len(lines), len(lines.session_id))
+        return lines
 
     def _log_action(self, action_type, description):
         """Journalisation des actions pour traçabilité Qualiopi"""
         self.ensure_one()
-        self.env['lms_presence.session_log'].create({
+        self.env['lms_presence.session_log'].sudo().create({
             'session_id': self.id,
             'action_type': action_type,
             'description': description,
@@ -377,21 +458,20 @@ class FormationAttendanceSession(models.Model):
         sessions = self.search([
             ('state', 'in', ['draft', 'confirmed']),
             ('date_start', '>=', fields.Datetime.now()),
+            ('auto_generate_attendance', '=', True),
         ])
 
-        for session in sessions:
-            if session.auto_generate_attendance:
-                # Vérifier si de nouveaux participants ont été ajoutés
-                existing_participants = session.attendance_line_ids.mapped('participant_id')
-                new_participants = session.attendee_ids - existing_participants
-
-                for participant in new_participants:
-                    self.env['lms_presence.attendance_line'].create({
-                        'session_id': session.id,
-                        'participant_id': participant.id,
-                    })
-
-        _logger.info("Cron synchronisation participants exécuté")
+        # Nouveaux participants de toutes les sessions à venir en un seul create
+        lines = sessions._sync_attendance_lines()
+
+        added = Counter(line.session_id.id for line in lines)
+        for session in self.browse(added):
+            session._log_action(
+                'regenerate',
+                _('Synchronisation participants: %d ligne(s) ajoutée(s)') % added[session.id]
+            )
+
+        _logger.info("Cron synchronisation participants exécuté (%d lignes créées)", len(lines))
         return True
 
     @api.model
@@ -405,57 +485,120 @@ class FormationAttendanceSession(models.Model):
             ('date_end', '>=', two_hours_ago),
         ])
 
-        for session in sessions:
-            for line in session.attendance_line_ids:
-                # Si pas de check-in et non déjà marqué comme absent
-                if not line.check_in and line.state == 'draft':
-                    line.write({
-                        'state': 'absent',
-                        'validated_by_teacher': True,
-                        'validation_date_teacher': fields.Datetime.now(),
-                    })
-
-                    # ✅ LOG QUALIOPI
-                    session._log_action(
-                        'absence_detection',
-                        _('Absence automatique détectée: %s') % line.participant_name
-                    )
-
-        _logger.info("Cron détection absences exécuté")
+        # Lignes sans check-in et non encore qualifiées, par lots de sessions :
+        # une écriture et une insertion de journaux par lot, commit entre deux
+        # lots (les lignes traitées sortent du domaine : reprise sans doublon)
+        absences = self._run_line_batches(
+            sessions,
+            [('check_in', '=', False), ('state', '=', 'draft')],
+            self._process_absence_batch,
+            'lms_presence.cron_detect_absences',
+        )
+
+        _logger.info("Cron détection absences exécuté (%d absences)", absences)
         return True
 
+    def _process_absence_batch(self, lines):
+        now = fields.Datetime.now()
+        lines.with_context(tracking_disable=True).write({
+            'state': 'absent',
+            'validated_by_teacher': True,
+            'validation_date_teacher': now,
+        })
+
+        # ✅ LOG QUALIOPI
+        self._bulk_log_actions([{
+            'session_id': line.session_id.id,
+            'participant_id': line.participant_id.id,
+            'action_type': 'absence_detection',
+            'log_category': 'attendance',
+            'description': _('Absence automatique détectée: %s') % line.participant_name,
+        } for line in lines])
+
     # ✅ NOUVEAU: Cron relances inactivité (US-C4)
     @api.model
     def _cron_inactivity_reminders(self):
         """Relance les participants inactifs"""
-        three_days_ago = fields.Datetime.now() - timedelta(days=3)
+        template = self.env.ref('lms_presence.mail_template_inactivity_reminder', raise_if_not_found=False)
+        if not template:
+            _logger.warning("Template de relance inactivité non trouvé")
+            return True
 
+        now = fields.Datetime.now()
         sessions = self.search([
             ('state', '=', 'in_progress'),
-            ('date_start', '<=', three_days_ago),
+            ('date_start', '<=', now - timedelta(days=3)),
         ])
 
-        for session in sessions:
-            inactive_lines = session.attendance_line_ids.filtered(
-                lambda l: l.state == 'draft' and not l.check_in
-            )
+        # Une relance par jour au plus : les lignes relancées sortent du domaine
+        # (reprise après interruption sans double envoi)
+        reminded = self._run_line_batches(
+            sessions,
+            [
+                ('state', '=', 'draft'),
+                ('check_in', '=', False),
+                ('participant_email', '!=', False),
+                '|', ('inactivity_reminder_date', '=', False),
+                ('inactivity_reminder_date', '<', now - timedelta(hours=20)),
+            ],
+            lambda lines: self._process_inactivity_batch(lines, template),
+            'lms_presence.cron_inactivity_reminders',
+        )
+
+        _logger.info("Cron relance inactivité exécuté (%d relances)", reminded)
+        return True
 
-            for line in inactive_lines:
-                template = self.env.ref(
-                    'lms_presence.mail_template_inactivity_reminder',
-                    raise_if_not_found=False
-                )
-                if template and line.participant_id.email:
-                    template.send_mail(line.id, force_send=False)
+    def _process_inactivity_batch(self, lines, template):
+        template.send_mail_batch(lines.ids, force_send=False)
+        lines.with_context(tracking_disable=True).write({'inactivity_reminder_date': fields.Datetime.now()})
 
-                    # LOG QUALIOPI - Preuve d'envoi
-                    session._log_action(
-                        'notification',
-                        _('Relance inactivité envoyée à %s') % line.participant_name
-                    )
+        # LOG QUALIOPI - Preuve d'envoi
+        self._bulk_log_actions([{
+            'session_id': line.session_id.id,
+            'participant_id': line.participant_id.id,
+            'action_type': 'notification',
+            'log_category': 'inactivity',
+            'description': _('Relance inactivité envoyée à %s') % line.participant_name,
+        } for line in lines])
 
-        _logger.info("Cron relance inactivité exécuté")
-        return True
+    @api.model
+    def _run_line_batches(self, sessions, line_domain, process, cron_xmlid):
+        """
+        Applique ``process`` aux lignes de présence des sessions, par lots de
+        CRON_SESSION_BATCH sessions, avec un commit par lot. Au-delà de
+        CRON_TIME_BUDGET secondes, le cron est relancé pour traiter la suite.
+        Retourne le nombre de lignes traitées.
+        """
+        AttendanceLine = self.env['lms_presence.attendance_line']
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        started = time.monotonic()
+        total = 0
+
+        for batch_ids in split_every(CRON_SESSION_BATCH, sessions.ids):
+            lines = AttendanceLine.search(expression.AND([[('session_id', 'in', batch_ids)], line_domain]))
+            if lines:
+                process(lines)
+                total += len(lines)
+            if auto_commit:
+                self.env.cr.commit()
+            self.env.invalidate_all()
+
+            if time.monotonic() - started > CRON_TIME_BUDGET:
+                cron = self.env.ref(cron_xmlid, raise_if_not_found=False)
+                if cron:
+                    cron._trigger()
+                _logger.info("⏸️ %s interrompu après %d lignes, reprise planifiée", cron_xmlid, total)
+                break
+
+        return total
+
+    @api.model
+    def _bulk_log_actions(self, vals_list):
+        """Journalisation Qualiopi en une insertion dans le journal en ajout seul"""
+        if vals_list:
+            self.env['lms_presence.session_log'].sudo().create(
+                [dict(vals, user_id=self.env.user.id) for vals in vals_list]
+            )
 
     @api.model_create_multi
     def create(self, vals_list):
@@ -1,11 +1,33 @@
 # models/session_log.py
-from odoo import models, fields, api
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.tools import SQL, create_index
+from datetime import datetime
+import base64
+import hashlib
+import json
+import tempfile
+
+# Champs couverts par l'empreinte d'une entrée (ordre figé : fait partie du format)
+HASHED_FIELDS = (
+    'session_id', 'sequence', 'create_date', 'action_type', 'log_category',
+    'description', 'user_id', 'participant_id', 'email_message_id',
+)
+LEGACY_SEAL_BATCH = 1000
+
 
 class FormationSessionLog(models.Model):
+    """
+    Journal Qualiopi des sessions, en ajout seul
+    Chaque entrée porte l'empreinte SHA-256 de son contenu et de l'entrée
+    précédente de la même session : toute modification ou suppression d'une
+    entrée rompt la chaîne (voir _verify_chain). Pas de mail.thread : une
+    entrée est une simple ligne, insérée par lots.
+    """
     _name = 'lms_presence.session_log'
     _description = 'Journal des sessions de formation'
-    _order = 'create_date desc'
-    _inherit = ['mail.thread', 'mail.activity.mixin']  # <-- AJOUTEZ CETTE LIGNE
+    _order = 'create_date desc, id desc'
+    _log_access = False
 
     session_id = fields.Many2one(
         'lms_presence.attendance_session',
@@ -25,9 +47,9 @@ class FormationSessionLog(models.Model):
         ('trainer_change', 'Changement formateur'),
         ('location_change', 'Changement lieu'),
         ('schedule_change', 'Modification planning'),
-    ], string='Type d\'action', required=True, tracking=True)  # <-- tracking=True pour suivre les changements
+    ], string='Type d\'action', required=True)
 
-    description = fields.Text(string='Description', tracking=True)
+    description = fields.Text(string='Description')
 
     user_id = fields.Many2one(
         'res.users',
@@ -42,7 +64,7 @@ class FormationSessionLog(models.Model):
         readonly=True
     )
 
-    participant_id = fields.Many2one('res.partner', string='Participant concerné')
+    participant_id = fields.Many2one('res.partner', string='Participant concerné', index='btree_not_null')
     email_message_id = fields.Char(string='ID Message email', help='Identifiant du message envoyé')
 
     log_category = fields.Selection([
@@ -51,4 +73,227 @@ class FormationSessionLog(models.Model):
         ('notification', 'Notification'),
         ('inactivity', 'Inactivité'),
         ('system', 'Système'),
-    ], string='Catégorie', default='session')
\ No newline at end of file
+    ], string='Catégorie', default='session')
+
+    # ========== CHAÎNE D'EMPREINTES ==========
+    sequence = fields.Integer(string='N° dans la session', readonly=True)
+    prev_hash = fields.Char(string='Empreinte précédente', readonly=True)
+    entry_hash = fields.Char(string='Empreinte', readonly=True)
+
+    _sql_constraints = [
+        ('session_sequence_unique', 'UNIQUE(session_id, sequence)',
+         'Une seule entrée par position dans la chaîne d\'une session.'),
+    ]
+
+    def init(self):
+        # Journal en ajout seul, trié par date d'insertion : un index BRIN
+        # (quelques pages par plage de temps) suffit aux filtres par période
+        create_index(self.env.cr, 'lms_presence_session_log_create_date_brin',
+                     self._table, ['create_date'], method='brin')
+        create_index(self.env.cr, 'lms_presence_session_log_action_date_idx',
+                     self._table, ['action_type', 'create_date'])
+        self._seal_legacy_entries()
+
+    # ========== AJOUT SEUL ==========
+    @api.model_create_multi
+    def create(self, vals_list):
+        return super().create(self._prepare_chain(vals_list))
+
+    def write(self, vals):
+        raise UserError(_("Le journal des sessions est en ajout seul : une entrée ne peut pas être modifiée."))
+
+    def unlink(self):
+        raise UserError(_("Le journal des sessions est en ajout seul : une entrée ne peut pas être supprimée."))
+
+    @api.model
+    def _prepare_chain(self, vals_list):
+        """Complète les valeurs (défauts, n° d'ordre, empreintes) avant une insertion groupée"""
+        if not vals_list:
+            return vals_list
+        now = fields.Datetime.now()
+        defaults = self.default_get(['user_id', 'log_category'])
+        # Horodatage imposé : la date d'ajout ne peut pas être fournie (antidatage)
+        vals_list = [{**defaults, **vals, 'create_date': now} for vals in vals_list]
+
+        session_ids = sorted({vals['session_id'] for vals in vals_list})
+        heads = self._lock_chain_heads(session_ids)
+
+        for vals in vals_list:
+            sequence, prev_hash = heads.get(vals['session_id'], (0, None))
+            vals.update(sequence=sequence + 1, prev_hash=prev_hash)
+            vals['entry_hash'] = self._compute_entry_hash(prev_hash, vals)
+            heads[vals['session_id']] = (vals['sequence'], vals['entry_hash'])
+
+        self.env.cr.execute("""
+            UPDATE lms_presence_attendance_session s
+               SET log_head_sequence = h.sequence, log_head_hash = h.entry_hash
+              FROM unnest(%s::int[], %s::int[], %s::varchar[]) AS h(id, sequence, entry_hash)
+             WHERE s.id = h.id
+        """, (session_ids, [heads[sid][0] for sid in session_ids], [heads[sid][1] for sid in session_ids]))
+        self.env['lms_presence.attendance_session'].invalidate_model(['log_head_sequence', 'log_head_hash'])
+        return vals_list
+
+    @api.model
+    def _lock_chain_heads(self, session_ids):
+        """
+        Verrouille la tête de chaîne des sessions (ligne de la session) et la
+        retourne : {session_id: (sequence, entry_hash)}.
+        Un ajout concurrent attend le verrou ; si l'autre transaction a validé
+        entre-temps, PostgreSQL lève une erreur de sérialisation (lecture
+        répétable), que le serveur rejoue avec la nouvelle tête.
+        """
+        cr = self.env.cr
+        cr.execute("""
+            SELECT id, log_head_sequence, log_head_hash
+              FROM lms_presence_attendance_session
+             WHERE id = ANY(%s)
+          ORDER BY id
+               FOR NO KEY UPDATE
+        """, (session_ids,))
+        heads = {sid: (sequence, entry_hash) for sid, sequence, entry_hash in cr.fetchall() if sequence}
+
+        # Sessions dont la tête n'est pas encore reportée : lue dans le journal
+        missing = [sid for sid in session_ids if sid not in heads]
+        if missing:
+            self.flush_model()
+            cr.execute("""
+                SELECT DISTINCT ON (session_id) session_id, sequence, entry_hash
+                  FROM lms_presence_session_log
+                 WHERE session_id = ANY(%s) AND sequence IS NOT NULL
+              ORDER BY session_id, sequence DESC
+            """, (missing,))
+            heads.update((sid, (sequence, entry_hash)) for sid, sequence, entry_hash in cr.fetchall())
+        return heads
+
+    @api.model
+    def _compute_entry_hash(self, prev_hash, values):
+        payload = [prev_hash or '']
+        for fname in HASHED_FIELDS:
+            value = values.get(fname)
+            if isinstance(value, datetime):
+                value = fields.Datetime.to_string(value)
+            elif isinstance(value, models.BaseModel):
+                value = value.id
+            payload.append(value or None)
+        return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode()).hexdigest()
+
+    def _seal_legacy_entries(self):
+        """Chaîne les entrées antérieures au journal en ajout seul (mise à jour du module)"""
+        cr = self.env.cr
+        cr.execute("SELECT 1 FROM lms_presence_session_log WHERE sequence IS NULL LIMIT 1")
+        if not cr.fetchone():
+            return
+
+        cr.execute(f"""
+            SELECT id, prev_hash, entry_hash, {', '.join(HASHED_FIELDS)}
+              FROM lms_presence_session_log
+             ORDER BY session_id, sequence NULLS LAST, create_date, id
+        """)
+        updates = []
+        session_id, sequence, prev_hash = None, 0, None
+        for row in cr.dictfetchall():
+            if row['session_id'] != session_id:
+                session_id, sequence, prev_hash = row['session_id'], 0, None
+            sequence += 1
+            if row['sequence'] is None:
+                row.update(sequence=sequence, prev_hash=prev_hash)
+                row['entry_hash'] = self._compute_entry_hash(prev_hash, row)
+                updates.append((row['id'], sequence, prev_hash, row['entry_hash']))
+            prev_hash = row['entry_hash']
+
+        for start in range(0, len(updates), LEGACY_SEAL_BATCH):
+            batch = updates[start:start + LEGACY_SEAL_BATCH]
+            cr.execute("""
+                UPDATE lms_presence_session_log l
+                   SET sequence = v.sequence, prev_hash = v.prev_hash, entry_hash = v.entry_hash
+                  FROM unnest(%s::int[], %s::int[], %s::varchar[], %s::varchar[])
+                       AS v(id, sequence, prev_hash, entry_hash)
+                 WHERE l.id = v.id
+            """, tuple(map(list, zip(*batch))))
+
+    # ========== VÉRIFICATION & EXPORT ==========
+    @api.model
+    def _verify_chain(self, session_ids):
+        """Recalcule la chaîne des sessions données ; retourne les ids des entrées rompues"""
+        self.flush_model()
+        self.env.cr.execute(f"""
+            SELECT id, prev_hash, entry_hash, {', '.join(HASHED_FIELDS)}
+              FROM lms_presence_session_log
+             WHERE session_id = ANY(%s)
+          ORDER BY session_id, sequence
+        """, (list(session_ids),))
+
+        broken = []
+        session_id, sequence, prev_hash = None, 0, None
+        for row in self.env.cr.dictfetchall():
+            if row['session_id'] != session_id:
+                session_id, sequence, prev_hash = row['session_id'], 0, None
+            sequence += 1
+            if (row['sequence'] != sequence or row['prev_hash'] != prev_hash
+                    or row['entry_hash'] != self._compute_entry_hash(row['prev_hash'], row)):
+                broken.append(row['id'])
+            prev_hash = row['entry_hash']
+        return broken
+
+    def action_verify_chain(self):
+        """Vérifie l'intégrité du journal des sessions sélectionnées"""
+        sessions = self.session_id
+        broken = self._verify_chain(sessions.ids)
+        if broken:
+            message = _("%d entrée(s) altérée(s) ou manquante(s) (ids: %s)") % (
+                len(broken), ', '.join(map(str, broken[:20])))
+        else:
+            message = _("Journal intègre pour %d session(s)") % len(sessions)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Vérification du journal'),
+                'message': message,
+                'type': 'danger' if broken else 'success',
+                'sticky': bool(broken),
+            },
+        }
+
+    def action_export_journal(self):
+        """Export CSV des entrées sélectionnées pour les auditeurs"""
+        attachment = self._export_journal([('id', 'in', self.ids)])
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/web/content/{attachment.id}?download=true',
+            'target': 'self',
+        }
+
+    @api.model
+    def _export_journal(self, domain):
+        """
+        Export CSV filtré (droits d'accès appliqués par _search), produit par
+        COPY côté PostgreSQL, empreintes incluses pour contrôle par l'auditeur
+        """
+        self.flush_model()
+        query = SQL("""
+            SELECT l.create_date, l.session_id, s.name AS session, l.sequence,
+                   l.action_type, l.log_category, l.description,
+                   u.login AS user_login, l.participant_id, p.name AS participant,
+                   l.email_message_id, l.prev_hash, l.entry_hash
+              FROM lms_presence_session_log l
+              LEFT JOIN lms_presence_attendance_session s ON s.id = l.session_id
+              LEFT JOIN res_users u ON u.id = l.user_id
+              LEFT JOIN res_partner p ON p.id = l.participant_id
+             WHERE l.id IN (%s)
+          ORDER BY l.session_id, l.sequence
+        """, self._search(domain).subselect())
+
+        cr = self.env.cr
+        with tempfile.TemporaryFile() as tmp:
+            copy_query = cr.mogrify(query.code, query.params).decode()
+            cr.copy_expert(f"COPY ({copy_query}) TO STDOUT WITH (FORMAT csv, HEADER true)", tmp)
+            tmp.seek(0)
+            content = tmp.read()
+
+        return self.env['ir.attachment'].create({
+            'name': f'Journal_sessions_{fields.Date.today()}.csv',
+            'datas': base64.b64encode(content),
+            'mimetype': 'text/csv',
+            'description': _('Export audit du journal des sessions (SHA-256 : %s)') % hashlib.sha256(content).hexdigest(),
+        })
@@ -29,15 +29,9 @@ class BatchValidationWizard(models.TransientModel):
     ], string='Action', required=True, default='validate')
 
     def action_validate(self):
-        """Exécute la validation en lot"""
+        """Exécute la validation en lot (écritures groupées, un journal par session)"""
         self.ensure_one()
-
-        for line in self.line_ids:
-            if self.validation_type == 'present':
-                line.action_mark_present()
-            elif self.validation_type == 'absent':
-                line.action_mark_absent()
-            elif self.validation_type == 'validate':
-                line.action_validate_teacher()
-
+        self.env['lms_presence.attendance_line']._batch_validate({
+            self.validation_type: self.line_ids,
+        })
         return {'type': 'ir.actions.act_window_close'}
\ No newline at end of file
@@ -50,6 +50,7 @@
         'views/public_kpi_version_views.xml',
         'views/public_kpi_category_views.xml',  # ✅ AJOUT
         'views/public_kpi_menu_views.xml',
+        'wizards/kpi_audit_export_wizard_views.xml',
 
         # Templates website
         'views/website_kpis_template.xml',
@@ -6,11 +6,51 @@ Version finale corrigée pour Odoo 17
 """
 from odoo.http import request
 from odoo import http, fields, _
+from collections import OrderedDict
+from werkzeug.http import is_resource_modified
+import hashlib
 import json
 import logging
+import threading
+import time
 
 _logger = logging.getLogger(__name__)
 
+# Cache (par processus) des réponses publiques rendues. Les clés incluent la
+# génération du cache KPI, incrémentée à chaque publication, archivage ou
+# modification d'un indicateur publié : les entrées périmées ne sont plus lues
+# et sortent du LRU.
+RESPONSE_CACHE_SIZE = 256
+RESPONSE_CACHE_TTL = 3600
+# Fraîcheur côté navigateur / CDN du widget (secondes)
+PUBLIC_MAX_AGE = 300
+# L'URL encodée d'un snapshot ne change pas : QR Code mis en cache un jour
+QR_CODE_MAX_AGE = 86400
+
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+
+def _cache_get(key):
+    with _response_cache_lock:
+        entry = _response_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del _response_cache[key]
+            return None
+        _response_cache.move_to_end(key)
+        return value
+
+
+def _cache_set(key, value):
+    with _response_cache_lock:
+        _response_cache[key] = (time.monotonic() + RESPONSE_CACHE_TTL, value)
+        _response_cache.move_to_end(key)
+        while len(_response_cache) > RESPONSE_CACHE_SIZE:
+            _response_cache.popitem(last=False)
+
 
 class PublicKPIWebsiteController(http.Controller):
     """Controller pour l'affichage public des KPI Qualiopi"""
@@ -21,19 +61,16 @@ class PublicKPIWebsiteController(http.Controller):
         Affiche le dernier snapshot publié
         Route publique accessible à tous
         """
-        snapshot = request.env['public.kpi.snapshot'].sudo().search([
-            ('state', '=', 'published')
-        ], order='publication_date desc', limit=1)
-
+        snapshot = self._get_latest_snapshot()
         if snapshot:
-            _logger.info("📊 KPI publics consultés: snapshot #%s (%s)", snapshot.id, snapshot.name)
+            snapshot.action_increment_view_count()
 
-        return request.render('lms_public_kpi.kpi_public_snapshot_page', {
+        return self._render_cached_page('lms_public_kpi.kpi_public_snapshot_page', {
             'snapshot': snapshot if snapshot else False,
             'main_object': snapshot if snapshot else False,
             'page_name': 'Indicateurs de Performance - Certification Qualiopi',
             'is_latest': True,
-        })
+        }, 'latest')
 
     @http.route('/kpis/snapshot/<int:snapshot_id>', type='http', auth='public', website=True)
     def get_kpi_snapshot(self, snapshot_id, **kwargs):
@@ -51,20 +88,86 @@ class PublicKPIWebsiteController(http.Controller):
             _logger.warning("⚠️ Tentative d'accès snapshot non publié #%s", snapshot_id)
             return request.not_found()
 
-        _logger.info("📊 Snapshot #%s consulté: %s", snapshot.id, snapshot.name)
+        snapshot.action_increment_view_count()
 
-        return request.render('lms_public_kpi.kpi_public_snapshot_page', {
+        return self._render_cached_page('lms_public_kpi.kpi_public_snapshot_page', {
             'snapshot': snapshot,
             'main_object': snapshot,
             'page_name': f'Indicateurs - {snapshot.name}',
             'is_latest': False,
-        })
+        }, 'snapshot', snapshot_id)
+
+    # ==========================================
+    # CACHE DES RÉPONSES PUBLIQUES
+    # ==========================================
+
+    def _public_cache_key(self, *parts):
+        """Clé de cache : base, génération KPI, langue, site web + route et paramètres"""
+        generation = request.env['public.kpi.snapshot'].sudo()._get_public_cache_generation()
+        website = getattr(request, 'website', None)
+        return (request.db, generation, request.lang.code if request.lang else '',
+                website.id if website else False) + parts
+
+    def _get_latest_snapshot(self):
+        """Dernier snapshot publié ; son id reste en cache jusqu'à la prochaine invalidation"""
+        Snapshot = request.env['public.kpi.snapshot'].sudo()
+        key = self._public_cache_key('latest_snapshot_id')
+        snapshot_id = _cache_get(key)
+        if snapshot_id is None:
+            snapshot_id = Snapshot.search([
+                ('state', '=', 'published')
+            ], order='publication_date desc', limit=1).id
+            _cache_set(key, snapshot_id)
+        return Snapshot.browse(snapshot_id)
+
+    def _render_cached_page(self, template, values, *key_parts):
+        """
+        Page website : pour les visiteurs anonymes, le contenu (div#wrap) est servi
+        par le t-cache QWeb ; seul le layout (jeton CSRF, session) est rendu.
+        L'ETag inclut la session pour ne jamais rejouer le jeton CSRF d'une autre.
+        """
+        if not request.env.user._is_public():
+            return request.render(template, dict(values, kpi_cache_key=None))
+
+        cache_key = self._public_cache_key(*key_parts)
+        etag = hashlib.sha1(repr(cache_key + (
+            request.session.sid, int(time.time() // RESPONSE_CACHE_TTL),
+        )).encode('utf-8')).hexdigest()
+        headers = [('ETag', f'"{etag}"'), ('Cache-Control', 'private, no-cache')]
+
+        if not is_resource_modified(request.httprequest.environ, etag=etag):
+            return request.make_response(b'', headers=headers, status=304)
+
+        return request.render(template, dict(values, kpi_cache_key=repr(cache_key)), headers=headers)
+
+    def _serve_cached_fragment(self, key, render):
+        """
+        Fragment HTML sans layout (widget) : corps rendu mis en cache tel quel,
+        ETag = empreinte du corps, 304 si le client l'a déjà
+        """
+        cached = _cache_get(key)
+        if cached is None:
+            response = render()
+            response.flatten()
+            body = response.data
+            cached = (body, hashlib.sha1(body).hexdigest())
+            _cache_set(key, cached)
+
+        body, etag = cached
+        headers = [
+            ('Content-Type', 'text/html; charset=utf-8'),
+            ('ETag', f'"{etag}"'),
+            ('Cache-Control', f'public, max-age={PUBLIC_MAX_AGE}'),
+        ]
+        if not is_resource_modified(request.httprequest.environ, etag=etag):
+            return request.make_response(b'', headers=headers, status=304)
+        return request.make_response(body, headers=headers)
 
     @http.route('/kpis/snapshot/<int:snapshot_id>/pdf', type='http', auth='public')
     def download_kpi_pdf(self, snapshot_id, **kwargs):
         """
         Téléchargement PDF depuis le site web
-        Version corrigée pour Odoo 17
+        Le PDF est rendu une fois (publication ou premier téléchargement) puis réutilisé
         """
         try:
             # 1. Récupérer le snapshot
@@ -78,44 +181,39 @@ class PublicKPIWebsiteController(http.Controller):
                 _logger.error("❌ Snapshot #%s non publié (état: %s)", snapshot_id, snapshot.state)
                 return request.not_found()
 
-            _logger.info("📊 Génération PDF pour snapshot #%s (%s)", snapshot_id, snapshot.name)
-
-            # 2. ✅ MÉTHODE CORRECTE ODOO 17
-            # Utiliser ir.actions.report avec _render_qweb_pdf()
-            report_sudo = request.env['ir.actions.report'].sudo()
+            # 2. PDF stocké à la publication : servi comme un fichier statique
+            #    (send_file : ETag = sha1 du contenu, Last-Modified, Range, 304)
+            attachment = snapshot._get_public_pdf()
 
-            # Générer le PDF avec la signature correcte
-            pdf_content, content_type = report_sudo._render_qweb_pdf(
-                report_ref='lms_public_kpi.report_kpi_snapshot',  # XML ID du rapport
-                res_ids=[snapshot_id],
-                data=None
-            )
-
-            if not pdf_content:
+            if not attachment or not attachment.file_size:
                 _logger.error("❌ PDF vide généré")
                 return self._render_error_page(
                     "Le rapport PDF est vide. Veuillez vérifier la configuration.",
                     snapshot_id
                 )
 
-            # 3. Préparer le fichier
-            filename = f'Indicateurs_Qualiopi_{snapshot.name.replace(" ", "_")}.pdf'
-
-            _logger.info("✅ PDF généré avec succès: %d bytes", len(pdf_content))
-
-            # 4. Retourner le PDF
-            pdfhttpheaders = [
-                ('Content-Type', 'application/pdf'),
-                ('Content-Length', len(pdf_content)),
-                ('Content-Disposition', f'attachment; filename="{filename}"')
-            ]
-
-            return request.make_response(pdf_content, headers=pdfhttpheaders)
+            stream = request.env['ir.binary']._get_stream_from(attachment.sudo())
+            stream.download_name = f'Indicateurs_Qualiopi_{snapshot.name.replace(" ", "_")}.pdf'
+            return stream.get_response(as_attachment=True)
 
         except Exception as e:
             _logger.error("❌ Erreur génération PDF: %s", str(e), exc_info=True)
             return self._render_error_page(str(e), snapshot_id)
 
+    @http.route('/kpis/snapshot/<int:snapshot_id>/qr.png', type='http', auth='public')
+    def get_kpi_qr_code(self, snapshot_id, **kwargs):
+        """
+        QR Code du snapshot publié
+        Généré au premier appel puis servi depuis la pièce jointe (ETag, 304)
+        """
+        snapshot = request.env['public.kpi.snapshot'].sudo().browse(snapshot_id)
+        if not snapshot.exists() or snapshot.state != 'published' or not snapshot._get_qr_code():
+            return request.not_found()
+
+        stream = request.env['ir.binary']._get_image_stream_from(snapshot, 'qr_code')
+        stream.download_name = f'qr_kpi_{snapshot_id}.png'
+        return stream.get_response(max_age=QR_CODE_MAX_AGE)
+
     def _render_error_page(self, error_message, snapshot_id=None):
         """
         Afficher une page d'erreur HTML élégante
@@ -302,54 +400,12 @@ class PublicKPIWebsiteController(http.Controller):
         Accessible sans authentification
         """
         try:
-            snapshot = request.env['public.kpi.snapshot'].sudo().search([
-                ('state', '=', 'published')
-            ], order='publication_date desc', limit=1)
-
-            if not snapshot:
-                return {
-                    'success': False,
-                    'error': 'No published snapshot found',
-                    'code': 404,
-                    'data': None
-                }
-
-            # Construire liste KPI
-            kpis = []
-            for kpi in snapshot.kpi_version_ids.filtered(lambda k: k.state == 'published').sorted('sequence'):
-                kpis.append({
-                    'id': kpi.id,
-                    'name': kpi.name,
-                    'value': float(kpi.value) if kpi.value else 0,
-                    'unit': kpi.unit or '',
-                    'category': {
-                        'id': kpi.category_id.id,
-                        'name': kpi.category_id.name,
-                        'code': kpi.category_id.code,
-                    },
-                    'description': kpi.description or '',
-                    'evolution_rate': round(float(kpi.evolution_rate), 2) if kpi.evolution_rate else 0,
-                    'evolution_direction': kpi.evolution_direction or 'stable',
-                })
-
-            return {
-                'success': True,
-                'snapshot': {
-                    'id': snapshot.id,
-                    'name': snapshot.name,
-                    'period_type': snapshot.period_type,
-                    'period_start': snapshot.period_start.strftime('%Y-%m-%d') if snapshot.period_start else None,
-                    'period_end': snapshot.period_end.strftime('%Y-%m-%d') if snapshot.period_end else None,
-                    'publication_date': snapshot.publication_date.strftime(
-                        '%Y-%m-%d') if snapshot.publication_date else None,
-                },
-                'kpis': kpis,
-                'count': len(kpis),
-                'metadata': {
-                    'generated_at': fields.Datetime.now().isoformat(),
-                    'source': 'Odoo LMS - Qualiopi',
-                }
-            }
+            key = self._public_cache_key('api_latest')
+            result = _cache_get(key)
+            if result is None:
+                result = self._build_latest_kpis_payload()
+                _cache_set(key, result)
+            return result
 
         except Exception as e:
             _logger.error("❌ Erreur API KPI: %s", str(e), exc_info=True)
@@ -360,6 +416,57 @@ class PublicKPIWebsiteController(http.Controller):
                 'message': str(e) if request.env.user.has_group('base.group_system') else 'Une erreur est survenue'
             }
 
+    def _build_latest_kpis_payload(self):
+        """Réponse de /kpis/api/latest (mise en cache jusqu'à la prochaine invalidation)"""
+        snapshot = self._get_latest_snapshot()
+
+        if not snapshot:
+            return {
+                'success': False,
+                'error': 'No published snapshot found',
+                'code': 404,
+                'data': None
+            }
+
+        # Construire liste KPI
+        kpis = []
+        previous_year = snapshot._get_year_over_year_values()
+        for kpi in snapshot.kpi_version_ids.filtered(lambda k: k.state == 'published').sorted('sequence'):
+            kpis.append({
+                'id': kpi.id,
+                'name': kpi.name,
+                'value': float(kpi.value) if kpi.value else 0,
+                'unit': kpi.unit or '',
+                'category': {
+                    'id': kpi.category_id.id,
+                    'name': kpi.category_id.name,
+                    'code': kpi.category_id.code,
+                },
+                'description': kpi.description or '',
+                'evolution_rate': round(float(kpi.evolution_rate), 2) if kpi.evolution_rate else 0,
+                'evolution_direction': kpi.evolution_direction or 'stable',
+                'previous_year_value': previous_year.get(kpi.id),
+            })
+
+        return {
+            'success': True,
+            'snapshot': {
+                'id': snapshot.id,
+                'name': snapshot.name,
+                'period_type': snapshot.period_type,
+                'period_start': snapshot.period_start.strftime('%Y-%m-%d') if snapshot.period_start else None,
+                'period_end': snapshot.period_end.strftime('%Y-%m-%d') if snapshot.period_end else None,
+                'publication_date': snapshot.publication_date.strftime(
+                    '%Y-%m-%d') if snapshot.publication_date else None,
+            },
+            'kpis': kpis,
+            'count': len(kpis),
+            'metadata': {
+                'generated_at': fields.Datetime.now().isoformat(),
+                'source': 'Odoo LMS - Qualiopi',
+            }
+        }
+
     @http.route('/kpis/widget', type='http', auth='public', website=True, csrf=False)
     def get_kpi_widget(self, limit=6, **kwargs):
         """
@@ -373,9 +480,15 @@ class PublicKPIWebsiteController(http.Controller):
         except:
             limit = 6
 
-        snapshot = request.env['public.kpi.snapshot'].sudo().search([
-            ('state', '=', 'published')
-        ], order='publication_date desc', limit=1)
+        if request.env.user._is_public():
+            return self._serve_cached_fragment(
+                self._public_cache_key('widget', limit),
+                lambda: self._render_kpi_widget(limit),
+            )
+        return self._render_kpi_widget(limit)
+
+    def _render_kpi_widget(self, limit):
+        snapshot = self._get_latest_snapshot()
 
         if not snapshot:
             return request.render('lms_public_kpi.kpi_widget_empty', {
@@ -1,3 +1,5 @@
 from . import public_kpi_snapshot
 from . import public_kpi_version
+from . import public_kpi_view
+from . import public_kpi_series
 from . import public_kpi_category
\ No newline at end of file
@@ -0,0 +1,193 @@
+# custom_addons/lms_public_kpi/models/public_kpi_series.py
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, _
+from odoo.tools import create_index, sql
+from dateutil.relativedelta import relativedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Clé d'un indicateur d'un snapshot à l'autre : nom normalisé (minuscules,
+# espaces réduits). SQL_KPI_KEY en est l'équivalent SQL (reprise des données).
+SQL_KPI_KEY = "lower(regexp_replace(btrim(%s), '\\s+', ' ', 'g'))"
+
+
+def kpi_series_key(name):
+    return ' '.join((name or '').lower().split())
+
+
+class PublicKPIPoint(models.Model):
+    """
+    Série temporelle des indicateurs publiés
+    Une ligne par version d'indicateur publiée, indexée par
+    (code catégorie, indicateur, fin de période) : la valeur précédente de
+    tous les indicateurs d'un snapshot se lit en une requête.
+    """
+    _name = 'public.kpi.point'
+    _description = 'Valeur publiée d\'un indicateur (série temporelle)'
+    _order = 'category_code, kpi_key, period_end'
+    _log_access = False
+
+    kpi_version_id = fields.Many2one(
+        'public.kpi.version',
+        string='Indicateur',
+        required=True,
+        ondelete='cascade'
+    )
+
+    snapshot_id = fields.Many2one(
+        'public.kpi.snapshot',
+        string='Snapshot',
+        required=True,
+        ondelete='cascade',
+        index=True
+    )
+
+    category_code = fields.Char(string='Code catégorie', required=True)
+    kpi_key = fields.Char(string='Clé indicateur', required=True)
+    period_start = fields.Date(string='Début de période', required=True)
+    period_end = fields.Date(string='Fin de période', required=True)
+    publication_date = fields.Date(string='Date de publication')
+    value = fields.Float(string='Valeur', digits=(16, 2))
+
+    _sql_constraints = [
+        ('kpi_version_unique', 'UNIQUE(kpi_version_id)',
+         'Une seule valeur de série par version d\'indicateur.'),
+    ]
+
+    def init(self):
+        create_index(
+            self.env.cr, 'public_kpi_point_series_idx', self._table,
+            ['category_code', 'kpi_key', 'period_end DESC', 'publication_date DESC', 'id DESC'],
+        )
+        # Reprise des indicateurs déjà publiés / archivés (mise à jour du module).
+        # À l'installation, public_kpi_category n'est pas encore créée (modèle
+        # initialisé après celui-ci) et il n'y a rien à reprendre.
+        if not sql.table_exists(self.env.cr, 'public_kpi_category'):
+            return
+        self.env.cr.execute(f"""
+            INSERT INTO public_kpi_point (kpi_version_id, snapshot_id, category_code, kpi_key,
+                                          period_start, period_end, publication_date, value)
+            SELECT v.id, s.id, c.code, {SQL_KPI_KEY % 'v.name'},
+                   s.period_start, s.period_end, s.publication_date, v.value
+              FROM public_kpi_version v
+              JOIN public_kpi_snapshot s ON s.id = v.snapshot_id
+              JOIN public_kpi_category c ON c.id = v.category_id
+             WHERE s.state IN ('published', 'archived')
+            ON CONFLICT (kpi_version_id) DO NOTHING
+        """)
+
+    @api.model
+    def _record_versions(self, versions):
+        """Enregistre (upsert) la valeur des versions données, en une requête"""
+        versions = versions.filtered(lambda v: v.snapshot_id.period_start and v.snapshot_id.period_end)
+        if not versions:
+            return
+        self.flush_model()
+        self.env.cr.execute("""
+            INSERT INTO public_kpi_point (kpi_version_id, snapshot_id, category_code, kpi_key,
+                                          period_start, period_end, publication_date, value)
+            SELECT * FROM unnest(%s::int[], %s::int[], %s::varchar[], %s::varchar[],
+                                 %s::date[], %s::date[], %s::date[], %s::float8[])
+            ON CONFLICT (kpi_version_id) DO UPDATE
+               SET snapshot_id = EXCLUDED.snapshot_id,
+                   category_code = EXCLUDED.category_code,
+                   kpi_key = EXCLUDED.kpi_key,
+                   period_start = EXCLUDED.period_start,
+                   period_end = EXCLUDED.period_end,
+                   publication_date = EXCLUDED.publication_date,
+                   value = EXCLUDED.value
+        """, (
+            versions.ids,
+            [v.snapshot_id.id for v in versions],
+            [v.category_id.code for v in versions],
+            [kpi_series_key(v.name) for v in versions],
+            [v.snapshot_id.period_start for v in versions],
+            [v.snapshot_id.period_end for v in versions],
+            [v.snapshot_id.publication_date or None for v in versions],
+            [v.value for v in versions],
+        ))
+        self.invalidate_model()
+
+    @api.model
+    def _remove_snapshots(self, snapshots):
+        """Les snapshots redeviennent brouillons : leurs valeurs sortent de la série"""
+        self._remove_versions(snapshots.kpi_version_ids)
+
+    @api.model
+    def _remove_versions(self, versions):
+        """
+        Retire les versions de la série, puis re-résout la valeur précédente
+        des versions qui les suivaient (elles pointaient sur la valeur retirée)
+        """
+        if not versions:
+            return
+        followers = self._get_next_versions(versions) - versions
+        self.flush_model()
+        self.env.cr.execute("DELETE FROM public_kpi_point WHERE kpi_version_id = ANY(%s)", (versions.ids,))
+        self.invalidate_model()
+        followers._refresh_previous_values()
+
+    @api.model
+    def _get_previous_points(self, versions, year_over_year=False):
+        """
+        Valeur publiée précédente de chaque version, en une requête : dernier
+        point de la même série dont la période se termine avant le début de
+        celle de la version (``year_over_year`` : au plus tard un an avant sa fin).
+        Retourne {version_id: (valeur, snapshot_id)}
+        """
+        versions = versions.filtered(lambda v: v.snapshot_id.period_start and v.snapshot_id.period_end)
+        if not versions:
+            return {}
+        if year_over_year:
+            cutoffs = [v.snapshot_id.period_end - relativedelta(years=1, days=-1) for v in versions]
+        else:
+            cutoffs = [v.snapshot_id.period_start for v in versions]
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT cur.id, prev.value, prev.snapshot_id
+              FROM unnest(%s::int[], %s::varchar[], %s::varchar[], %s::date[])
+                   AS cur(id, category_code, kpi_key, cutoff)
+              CROSS JOIN LATERAL (
+                    SELECT p.value, p.snapshot_id
+                      FROM public_kpi_point p
+                     WHERE p.category_code = cur.category_code
+                       AND p.kpi_key = cur.kpi_key
+                       AND p.period_end < cur.cutoff
+                     ORDER BY p.period_end DESC, p.publication_date DESC NULLS LAST, p.id DESC
+                     LIMIT 1
+                   ) prev
+        """, (
+            versions.ids,
+            [v.category_id.code for v in versions],
+            [kpi_series_key(v.name) for v in versions],
+            cutoffs,
+        ))
+        return {version_id: (value, snapshot_id) for version_id, value, snapshot_id in self.env.cr.fetchall()}
+
+    @api.model
+    def _get_next_versions(self, versions):
+        """Versions publiées qui suivent directement les versions données dans leur série"""
+        versions = versions.filtered(lambda v: v.snapshot_id.period_end)
+        if not versions:
+            return self.env['public.kpi.version']
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT DISTINCT nxt.kpi_version_id
+              FROM unnest(%s::varchar[], %s::varchar[], %s::date[])
+                   AS cur(category_code, kpi_key, period_end)
+              CROSS JOIN LATERAL (
+                    SELECT p.kpi_version_id
+                      FROM public_kpi_point p
+                     WHERE p.category_code = cur.category_code
+                       AND p.kpi_key = cur.kpi_key
+                       AND p.period_start > cur.period_end
+                     ORDER BY p.period_end, p.publication_date DESC NULLS LAST, p.id DESC
+                     LIMIT 1
+                   ) nxt
+        """, (
+            [v.category_id.code for v in versions],
+            [kpi_series_key(v.name) for v in versions],
+            [v.snapshot_id.period_end for v in versions],
+        ))
+        return self.env['public.kpi.version'].browse(row[0] for row in self.env.cr.fetchall())
@@ -2,13 +2,33 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
+from odoo.tools import split_every
 from datetime import date, datetime, timedelta
 import logging
 import json
 import base64
+import hashlib
+import io
+import itertools
+import os
+import shutil
+import tempfile
+import zipfile
 
 _logger = logging.getLogger(__name__)
 
+# Génération du cache des pages / API KPI publiques (voir controllers/main.py) :
+# une ligne unique, lue par une requête triviale et incrémentée au commit
+PUBLIC_CACHE_GENERATION_TABLE = 'lms_public_kpi_cache_generation'
+# Champs dont la modification ne change pas le rendu public
+PUBLIC_CACHE_IGNORED_FIELDS = {
+    'view_count', 'last_view_date', 'message_main_attachment_id', 'pdf_attachment_id', 'qr_code', 'qr_code_url',
+}
+
+# Export audit : snapshots lus par lots, fichiers copiés par blocs
+AUDIT_EXPORT_BATCH_SIZE = 50
+AUDIT_EXPORT_CHUNK_SIZE = 1024 * 1024
+
 
 class PublicKPISnapshot(models.Model):
     _name = 'public.kpi.snapshot'
@@ -230,6 +250,15 @@ class PublicKPISnapshot(models.Model):
         compute='_compute_attachment_count'
     )
 
+    # PDF public généré à la publication, servi tel quel par /kpis/snapshot/<id>/pdf
+    pdf_attachment_id = fields.Many2one(
+        'ir.attachment',
+        string='PDF publié',
+        readonly=True,
+        copy=False,
+        help="Rendu PDF du snapshot publié (régénéré uniquement si le snapshot change)"
+    )
+
     # ==========================================
     # URL PUBLIQUE
     # ==========================================
@@ -242,12 +271,23 @@ class PublicKPISnapshot(models.Model):
     )
 
     # ✅ AJOUT : QR Code pour accès mobile
+    # Image stockée (pièce jointe), générée une fois par URL publique : à la
+    # publication ou au premier affichage (route /kpis/snapshot/<id>/qr.png)
     qr_code = fields.Binary(
         string='QR Code',
-        compute='_compute_qr_code',
+        attachment=True,
+        readonly=True,
+        copy=False,
         help="QR Code pour accès rapide depuis mobile"
     )
 
+    qr_code_url = fields.Char(
+        string='URL du QR Code',
+        readonly=True,
+        copy=False,
+        help="URL encodée dans le QR Code stocké"
+    )
+
     # ==========================================
     # TRAÇABILITÉ
     # ==========================================
@@ -276,15 +316,18 @@ class PublicKPISnapshot(models.Model):
     )
 
     # ✅ AJOUT : Nombre de consultations
+    # Calculé depuis les compteurs journaliers (public.kpi.view.daily) : une vue
+    # publique n'écrit jamais sur le snapshot
     view_count = fields.Integer(
         string='Nombre de vues',
-        default=0,
+        compute='_compute_view_stats',
         help="Nombre de fois que le snapshot a été consulté"
     )
 
     # ✅ AJOUT : Dernière consultation
     last_view_date = fields.Datetime(
         string='Dernière consultation',
+        compute='_compute_view_stats',
         help="Date et heure de la dernière consultation publique"
     )
 
@@ -375,30 +418,26 @@ class PublicKPISnapshot(models.Model):
         for snapshot in self:
             snapshot.attachment_count = len(snapshot.attachment_ids)
 
-    @api.depends('public_url')
-    def _compute_qr_code(self):
-        """Génère un QR Code pour l'URL publique"""
+    def _compute_view_stats(self):
+        # Compteurs journaliers repliés + événements encore en attente du cron
+        domain = [('snapshot_id', 'in', self.ids)]
+        stats = {
+            snapshot.id: (view_count, last_view_at)
+            for snapshot, view_count, last_view_at in self.env['public.kpi.view.daily'].sudo()._read_group(
+                domain, ['snapshot_id'], ['view_count:sum', 'last_view_at:max'],
+            )
+        }
+        pending = {
+            snapshot.id: (count, viewed_at)
+            for snapshot, count, viewed_at in self.env['public.kpi.view.event'].sudo()._read_group(
+                domain, ['snapshot_id'], ['__count', 'viewed_at:max'],
+            )
+        }
         for snapshot in self:
-            if snapshot.public_url:
-                try:
-                    import qrcode
-                    import io
-                    import base64
-
-                    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-                    qr.add_data(snapshot.public_url)
-                    qr.make(fit=True)
-
-                    img = qr.make_image(fill_color="black", back_color="white")
-                    buffer = io.BytesIO()
-                    img.save(buffer, format='PNG')
-
-                    snapshot.qr_code = base64.b64encode(buffer.getvalue())
-                except ImportError:
-                    _logger.warning("Module qrcode non installé. QR Code non généré.")
-                    snapshot.qr_code = False
-            else:
-                snapshot.qr_code = False
+            view_count, last_view_at = stats.get(snapshot.id, (0, False))
+            pending_count, pending_at = pending.get(snapshot.id, (0, False))
+            snapshot.view_count = view_count + pending_count
+            snapshot.last_view_date = max(filter(None, (last_view_at, pending_at)), default=False)
 
     @api.depends('write_date')
     def _compute_last_modification(self):
@@ -494,6 +533,130 @@ class PublicKPISnapshot(models.Model):
          'Un snapshot avec ce nom existe déjà pour cette période.'),
     ]
 
+    # ==========================================
+    # CACHE DES RÉPONSES PUBLIQUES
+    # ==========================================
+
+    def write(self, vals):
+        published_before = any(snapshot.state == 'published' for snapshot in self)
+        res = super().write(vals)
+        if set(vals) - PUBLIC_CACHE_IGNORED_FIELDS and (
+                published_before or any(snapshot.state == 'published' for snapshot in self)):
+            self._invalidate_public_cache()
+            self._reset_public_pdf()
+        return res
+
+    def unlink(self):
+        if any(snapshot.state == 'published' for snapshot in self):
+            self._invalidate_public_cache()
+        # Indicateurs supprimés en cascade (SQL) : série mise à jour avant
+        self.env['public.kpi.point'].sudo()._remove_snapshots(self)
+        return super().unlink()
+
+    def init(self):
+        self.env.cr.execute(f"""
+            CREATE TABLE IF NOT EXISTS {PUBLIC_CACHE_GENERATION_TABLE} (
+                id integer PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+                generation bigint NOT NULL DEFAULT 0
+            );
+            INSERT INTO {PUBLIC_CACHE_GENERATION_TABLE} (id) VALUES (1) ON CONFLICT DO NOTHING;
+            DELETE FROM ir_config_parameter WHERE key = 'lms_public_kpi.public_cache_generation';
+        """)
+
+    @api.model
+    def _get_public_cache_generation(self):
+        """Génération courante (lecture d'une ligne par clé primaire)"""
+        self.env.cr.execute(f"SELECT generation FROM {PUBLIC_CACHE_GENERATION_TABLE} WHERE id = 1")
+        row = self.env.cr.fetchone()
+        return row[0] if row else 0
+
+    @api.model
+    def _invalidate_public_cache(self):
+        """
+        Invalide les réponses publiques mises en cache, une seule fois par transaction,
+        juste avant le commit. Seule la génération de ce module change (pas
+        d'ir.config_parameter, qui viderait tout l'ormcache de tous les workers) :
+        les autres workers la lisent dès leur requête suivante.
+        """
+        precommit = self.env.cr.precommit
+        if precommit.data.get(PUBLIC_CACHE_GENERATION_TABLE):
+            return
+        precommit.data[PUBLIC_CACHE_GENERATION_TABLE] = True
+        precommit.add(self._bump_public_cache_generation)
+
+    def _get_public_pdf(self):
+        """PDF public du snapshot (attachment), généré au premier besoin puis réutilisé"""
+        self.ensure_one()
+        if not self.pdf_attachment_id:
+            self._generate_public_pdf()
+        return self.pdf_attachment_id
+
+    def _generate_public_pdf(self):
+        """Rend le rapport PDF (wkhtmltopdf) et le conserve en pièce jointe"""
+        for snapshot in self.sudo():
+            pdf_content, _content_type = self.env['ir.actions.report'].sudo()._render_qweb_pdf(
+                'lms_public_kpi.report_kpi_snapshot', res_ids=[snapshot.id]
+            )
+            attachment = self.env['ir.attachment'].sudo().create({
+                'name': f'Indicateurs_Qualiopi_{snapshot.name.replace(" ", "_")}.pdf',
+                'raw': pdf_content,
+                'res_model': snapshot._name,
+                'res_id': snapshot.id,
+                'mimetype': 'application/pdf',
+            })
+            old_attachment = snapshot.pdf_attachment_id
+            snapshot.write({'pdf_attachment_id': attachment.id})
+            old_attachment.unlink()
+            _logger.info("📄 PDF public généré pour snapshot #%s: %d bytes (sha1 %s)",
+                         snapshot.id, len(pdf_content), attachment.checksum)
+
+    def _get_qr_code(self):
+        """QR Code (base64) de l'URL publique, généré seulement si l'URL a changé"""
+        self.ensure_one()
+        if self.qr_code_url != self.public_url:
+            self._generate_qr_codes()
+        return self.qr_code
+
+    def _generate_qr_codes(self):
+        """Génère en lot les QR Codes périmés (URL publique différente de l'URL encodée)"""
+        snapshots = self.sudo().filtered(lambda s: s.qr_code_url != s.public_url)
+        if not snapshots:
+            return
+        try:
+            import qrcode
+        except ImportError:
+            _logger.warning("Module qrcode non installé. QR Code non généré.")
+            return
+
+        for snapshot in snapshots:
+            qr_code = False
+            if snapshot.public_url:
+                qr = qrcode.QRCode(version=1, box_size=10, border=5)
+                qr.add_data(snapshot.public_url)
+                qr.make(fit=True)
+
+                img = qr.make_image(fill_color="black", back_color="white")
+                buffer = io.BytesIO()
+                img.save(buffer, format='PNG')
+                qr_code = base64.b64encode(buffer.getvalue())
+            snapshot.write({'qr_code': qr_code, 'qr_code_url': snapshot.public_url})
+        _logger.info("📱 %d QR Code(s) KPI générés", len(snapshots))
+
+    def action_generate_qr_code(self):
+        """Bouton : générer les QR Codes manquants"""
+        self._generate_qr_codes()
+
+    def _reset_public_pdf(self):
+        """Le snapshot a changé : le PDF stocké est supprimé et sera régénéré"""
+        snapshots = self.sudo().filtered('pdf_attachment_id')
+        if snapshots:
+            attachments = snapshots.pdf_attachment_id
+            snapshots.write({'pdf_attachment_id': False})
+            attachments.unlink()
+
+    def _bump_public_cache_generation(self):
+        self.env.cr.execute(f"UPDATE {PUBLIC_CACHE_GENERATION_TABLE} SET generation = generation + 1 WHERE id = 1")
+
     # ==========================================
     # ACTIONS PRINCIPALES
     # ==========================================
@@ -601,6 +764,9 @@ class PublicKPISnapshot(models.Model):
             # Publier tous les indicateurs
             snapshot.kpi_version_ids.write({'state': 'published'})
 
+            # Série temporelle : valeurs précédentes et évolutions résolues en une requête
+            snapshot.kpi_version_ids._publish_series_points()
+
             # Traçabilité Qualiopi
             snapshot.message_post(
                 body=_(
@@ -630,6 +796,21 @@ class PublicKPISnapshot(models.Model):
                 snapshot.completion_rate
             )
 
+        # QR Codes de tous les snapshots publiés, en un lot (le PDF les inclut)
+        try:
+            with self.env.cr.savepoint():
+                self._generate_qr_codes()
+        except Exception as e:
+            _logger.warning("QR Codes non générés à la publication: %s", e)
+
+        for snapshot in self:
+            # Rendu PDF public (en cas d'échec, il sera généré au premier téléchargement)
+            try:
+                with self.env.cr.savepoint():
+                    snapshot._generate_public_pdf()
+            except Exception as e:
+                _logger.warning("PDF du snapshot #%s non généré à la publication: %s", snapshot.id, e)
+
             # Notification email aux abonnés
             snapshot._send_publication_notification()
 
@@ -686,80 +867,10 @@ class PublicKPISnapshot(models.Model):
         }
 
     def action_export_audit_proof(self):
-        """Générer preuve d'audit JSON conforme Qualiopi"""
+        """Générer preuve d'audit JSON Lines conforme Qualiopi"""
         self.ensure_one()
 
-        data = {
-            'snapshot': {
-                'id': self.id,
-                'name': self.name,
-                'period': {
-                    'type': self.period_type,
-                    'start': str(self.period_start),
-                    'end': str(self.period_end),
-                    'duration_days': self.period_duration,
-                },
-                'publication': {
-                    'date': str(self.publication_date) if self.publication_date else None,
-                    'validator': self.validator_id.name if self.validator_id else None,
-                    'state': self.state,
-                },
-                'url': self.public_url,
-                'metrics': {
-                    'kpi_count': self.kpi_count,
-                    'published_kpi_count': self.published_kpi_count,
-                    'completion_rate': round(self.completion_rate, 2),
-                    'average_value': round(self.average_kpi_value, 2),
-                    'global_evolution': round(self.global_evolution_rate, 2),
-                },
-            },
-            'kpis': [],
-            'metadata': {
-                'exported_at': str(fields.Datetime.now()),
-                'exported_by': self.env.user.name,
-                'source': 'Odoo LMS - Certification Qualiopi',
-                'version': '17.0.1.0.0',
-            }
-        }
-
-        # Ajouter indicateurs
-        for kpi in self.kpi_version_ids.filtered(lambda k: k.state == 'published').sorted('sequence'):
-            data['kpis'].append({
-                'id': kpi.id,
-                'name': kpi.name,
-                'category': {
-                    'name': kpi.category_id.name,
-                    'code': kpi.category_id.code,
-                },
-                'value': round(float(kpi.value), 2) if kpi.value else 0,
-                'unit': kpi.unit or '',
-                'evolution': {
-                    'rate': round(float(kpi.evolution_rate), 2) if kpi.evolution_rate else 0,
-                    'direction': kpi.evolution_direction or 'stable',
-                    'previous_value': round(float(kpi.previous_value), 2) if kpi.previous_value else None,
-                },
-                'description': kpi.description or '',
-                'calculation': {
-                    'method': kpi.calculation_method,
-                    'last_date': str(kpi.last_calculation_date) if kpi.last_calculation_date else None,
-                },
-            })
-
-        # Créer attachment JSON
-        json_data = json.dumps(data, indent=2, ensure_ascii=False)
-
-        attachment = self.env['ir.attachment'].create({
-            'name': f'Audit_KPI_Qualiopi_{self.name.replace(" ", "_")}_{fields.Date.today()}.json',
-            'datas': base64.b64encode(json_data.encode()),
-            'res_model': 'public.kpi.snapshot',
-            'res_id': self.id,
-            'mimetype': 'application/json',
-            'description': _(
-                'Export audit Qualiopi - Indicateurs publics\n'
-                'Période: %s → %s\n'
-                'Date export: %s'
-            ) % (self.period_start, self.period_end, fields.Datetime.now()),
-        })
+        attachment = self._export_audit_archive('jsonl')
 
         # Message traçabilité
         self.message_post(
@@ -778,13 +889,244 @@ class PublicKPISnapshot(models.Model):
             'target': 'self',
         }
 
+    # ==========================================
+    # EXPORT AUDIT (FLUX)
+    # ==========================================
+
+    def _export_audit_archive(self, export_format='jsonl', include_attachments=False):
+        """
+        Export d'audit des snapshots, écrit au fil de l'eau :
+        - jsonl : une ligne JSON par snapshot / indicateur / pièce jointe, puis
+          une ligne manifest (sha256 des lignes précédentes)
+        - zip : audit.jsonl, fichiers des pièces jointes et MANIFEST.sha256
+        Le fichier est construit sur disque puis déplacé dans le filestore :
+        la mémoire reste bornée quel que soit le nombre de snapshots.
+        """
+        exported_at = fields.Datetime.now()
+        header = {
+            'type': 'export',
+            'exported_at': str(exported_at),
+            'exported_by': self.env.user.name,
+            'source': 'Odoo LMS - Certification Qualiopi',
+            'version': '17.0.1.0.0',
+            'snapshot_ids': self.ids,
+        }
+
+        with tempfile.TemporaryFile() as tmp:
+            if export_format == 'zip':
+                manifest = self._write_audit_zip(tmp, header, include_attachments)
+                mimetype = 'application/zip'
+            else:
+                manifest, _file_checksum = self._write_audit_jsonl(tmp, header, include_attachments)
+                mimetype = 'application/x-ndjson'
+
+            if len(self) == 1:
+                name = f'Audit_KPI_Qualiopi_{self.name.replace(" ", "_")}_{fields.Date.today()}.{export_format}'
+            else:
+                name = f'Audit_KPI_Qualiopi_{len(self)}_snapshots_{fields.Date.today()}.{export_format}'
+
+            attachment = self._store_audit_file(tmp, {
+                'name': name,
+                'res_model': 'public.kpi.snapshot',
+                'res_id': self.id if len(self) == 1 else False,
+                'mimetype': mimetype,
+                'description': _(
+                    'Export audit Qualiopi - Indicateurs publics\n'
+                    'Snapshots: %s\n'
+                    'Date export: %s\n'
+                    'Manifest sha256: %s'
+                ) % (len(self), exported_at, manifest['checksum']),
+            })
+
+        _logger.info("📄 Export audit %s: %d snapshot(s), %d lignes, %d bytes",
+                     export_format, len(self), manifest['lines'], attachment.file_size)
+        return attachment
+
+    def _iter_audit_records(self, include_attachments=False):
+        """Enregistrements de l'export, lus par lots de snapshots (cache vidé entre deux lots)"""
+        for batch_ids in split_every(AUDIT_EXPORT_BATCH_SIZE, self.ids):
+            for snapshot in self.browse(batch_ids):
+                yield snapshot._prepare_audit_snapshot_record()
+
+                for kpi in snapshot.kpi_version_ids.sorted('sequence'):
+                    yield snapshot._prepare_audit_kpi_record(kpi)
+
+                if include_attachments:
+                    for owner, attachment in snapshot._get_audit_attachments():
+                        yield {
+                            'type': 'attachment',
+                            'id': attachment.id,
+                            'snapshot_id': snapshot.id,
+                            'kpi_id': owner.id if owner._name == 'public.kpi.version' else None,
+                            'name': attachment.name,
+                            'mimetype': attachment.mimetype,
+                            'size': attachment.file_size,
+                            'sha1': attachment.checksum,
+                            'path': f'attachments/{attachment.id}_{attachment.name}',
+                        }
+            self.env.invalidate_all()
+
+    def _prepare_audit_snapshot_record(self):
+        return {
+            'type': 'snapshot',
+            'id': self.id,
+            'name': self.name,
+            'state': self.state,
+            'period': {
+                'type': self.period_type,
+                'start': str(self.period_start),
+                'end': str(self.period_end),
+                'duration_days': self.period_duration,
+            },
+            'publication': {
+                'date': str(self.publication_date) if self.publication_date else None,
+                'validator': self.validator_id.name if self.validator_id else None,
+                'archive_date': str(self.archive_date) if self.archive_date else None,
+            },
+            'url': self.public_url,
+            'previous_snapshot_id': self.previous_snapshot_id.id or None,
+            'metrics': {
+                'kpi_count': self.kpi_count,
+                'published_kpi_count': self.published_kpi_count,
+                'completion_rate': round(self.completion_rate, 2),
+                'average_value': round(self.average_kpi_value, 2),
+                'global_evolution': round(self.global_evolution_rate, 2),
+            },
+        }
+
+    def _prepare_audit_kpi_record(self, kpi):
+        return {
+            'type': 'kpi',
+            'id': kpi.id,
+            'snapshot_id': self.id,
+            'name': kpi.name,
+            'state': kpi.state,
+            'category': {
+                'name': kpi.category_id.name,
+                'code': kpi.category_id.code,
+            },
+            'value': round(float(kpi.value), 2) if kpi.value else 0,
+            'unit': kpi.unit or '',
+            'evolution': {
+                'rate': round(float(kpi.evolution_rate), 2) if kpi.evolution_rate else 0,
+                'direction': kpi.evolution_direction or 'stable',
+                'previous_value': round(float(kpi.previous_value), 2) if kpi.previous_value else None,
+            },
+            'description': kpi.description or '',
+            'calculation': {
+                'method': kpi.calculation_method,
+                'last_date': str(kpi.last_calculation_date) if kpi.last_calculation_date else None,
+            },
+            'evidence_notes': kpi.evidence_notes or '',
+        }
+
+    def _get_audit_attachments(self):
+        """Pièces jointes binaires du snapshot et de ses indicateurs : [(propriétaire, pièce jointe)]"""
+        self.ensure_one()
+        result = [(self, attachment) for attachment in self.attachment_ids | self.pdf_attachment_id]
+        for kpi in self.kpi_version_ids.sorted('sequence'):
+            result += [(kpi, attachment) for attachment in kpi.evidence_attachment_ids]
+        return [(owner, attachment) for owner, attachment in result if attachment.type == 'binary']
+
+    def _write_audit_jsonl(self, fileobj, header, include_attachments, attachment_paths=None):
+        """
+        Écrit les lignes JSON puis le manifest ; retourne (manifest, sha256 du fichier).
+        ``attachment_paths`` (dict) reçoit id -> chemin des pièces jointes à copier.
+        """
+        digest = hashlib.sha256()
+        lines = 0
+        for record in itertools.chain([header], self._iter_audit_records(include_attachments)):
+            if attachment_paths is not None and record['type'] == 'attachment':
+                attachment_paths.setdefault(record['id'], record['path'])
+            line = (json.dumps(record, ensure_ascii=False, default=str) + '\n').encode()
+            fileobj.write(line)
+            digest.update(line)
+            lines += 1
+
+        manifest = {'type': 'manifest', 'algorithm': 'sha256', 'lines': lines, 'checksum': digest.hexdigest()}
+        manifest_line = (json.dumps(manifest) + '\n').encode()
+        fileobj.write(manifest_line)
+        digest.update(manifest_line)
+        return manifest, digest.hexdigest()
+
+    def _write_audit_zip(self, fileobj, header, include_attachments):
+        """Archive ZIP : audit.jsonl, pièces jointes copiées par blocs, MANIFEST.sha256"""
+        Attachment = self.env['ir.attachment']
+        checksums = []
+        attachment_paths = {}
+
+        with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED) as archive:
+            # Un seul membre ouvert à la fois : les fichiers sont copiés après le JSONL
+            with archive.open('audit.jsonl', 'w', force_zip64=True) as entry:
+                manifest, file_checksum = self._write_audit_jsonl(entry, header, include_attachments, attachment_paths)
+            checksums.append((file_checksum, 'audit.jsonl'))
+
+            for batch_ids in split_every(AUDIT_EXPORT_BATCH_SIZE, list(attachment_paths)):
+                for attachment in Attachment.browse(batch_ids):
+                    path = attachment_paths[attachment.id]
+                    digest = hashlib.sha256()
+                    with archive.open(path, 'w', force_zip64=True) as entry:
+                        for chunk in self._iter_attachment_chunks(attachment):
+                            entry.write(chunk)
+                            digest.update(chunk)
+                    checksums.append((digest.hexdigest(), path))
+                self.env.invalidate_all()
+
+            # Format sha256sum : vérifiable avec « sha256sum -c MANIFEST.sha256 »
+            archive.writestr('MANIFEST.sha256', ''.join(f'{checksum}  {path}\n' for checksum, path in checksums))
+
+        return manifest
+
+    @api.model
+    def _iter_attachment_chunks(self, attachment):
+        """Contenu d'une pièce jointe par blocs, lu directement dans le filestore"""
+        if attachment.store_fname:
+            with open(attachment._full_path(attachment.store_fname), 'rb') as f:
+                while chunk := f.read(AUDIT_EXPORT_CHUNK_SIZE):
+                    yield chunk
+        elif attachment.raw:
+            yield attachment.raw
+
+    def _store_audit_file(self, fileobj, values):
+        """Crée la pièce jointe en déplaçant le fichier dans le filestore (sans le charger en mémoire)"""
+        Attachment = self.env['ir.attachment']
+
+        if Attachment._storage() != 'file':
+            # Stockage en base : le contenu doit passer par l'ORM
+            fileobj.seek(0)
+            return Attachment.create(dict(values, raw=fileobj.read()))
+
+        fileobj.seek(0)
+        sha1, size = hashlib.sha1(), 0
+        while chunk := fileobj.read(AUDIT_EXPORT_CHUNK_SIZE):
+            sha1.update(chunk)
+            size += len(chunk)
+        checksum = sha1.hexdigest()
+
+        # Même arborescence que ir.attachment._get_path
+        store_fname = f'{checksum[:2]}/{checksum}'
+        full_path = Attachment._full_path(store_fname)
+        if not os.path.exists(full_path):
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            fileobj.seek(0)
+            with open(full_path, 'wb') as dest:
+                shutil.copyfileobj(fileobj, dest, AUDIT_EXPORT_CHUNK_SIZE)
+            # Supprimé par le GC du filestore si la transaction est annulée
+            Attachment._mark_for_gc(store_fname)
+
+        return Attachment.create(dict(values, store_fname=store_fname, checksum=checksum, file_size=size))
+
+    def _get_year_over_year_values(self):
+        """Valeur N-1 de chaque indicateur publié, lue dans la série en une requête : {kpi_id: valeur}"""
+        self.ensure_one()
+        kpis = self.kpi_version_ids.filtered(lambda k: k.state == 'published')
+        points = self.env['public.kpi.point'].sudo()._get_previous_points(kpis, year_over_year=True)
+        return {kpi_id: value for kpi_id, (value, _snapshot_id) in points.items()}
+
     def action_increment_view_count(self):
-        """Incrémenter le compteur de vues (appelé depuis controller)"""
+        """Enregistrer une vue (appelé depuis controller) : simple INSERT, aucune écriture ici"""
         self.ensure_one()
-        self.sudo().write({
-            'view_count': self.view_count + 1,
-            'last_view_date': fields.Datetime.now(),
-        })
+        self.env['public.kpi.view.event'].sudo()._record(self.id)
 
     def _send_publication_notification(self):
         """Envoyer notification email lors de la publication"""
@@ -927,6 +1269,7 @@ class PublicKPISnapshot(models.Model):
 
     def action_unarchive(self):
         """Désarchiver le snapshot"""
+        self.env['public.kpi.point'].sudo()._remove_snapshots(self)
         for snapshot in self:
             snapshot.write({
                 'state': 'draft',
@@ -971,8 +1314,6 @@ class PublicKPISnapshot(models.Model):
             'period_start': new_start,
             'period_end': new_end,
             'previous_snapshot_id': self.id,  # Lien vers snapshot source
-            'view_count': 0,
-            'last_view_date': False,
         })
 
         # Dupliquer les indicateurs avec historique
@@ -1013,18 +1354,17 @@ class PublicKPISnapshot(models.Model):
 
     def action_calculate_kpis(self):
         """Calculer automatiquement tous les indicateurs"""
+        # Tous les indicateurs des snapshots en une passe : une requête par modèle source
+        results, kpi_errors = self.kpi_version_ids._compute_kpi_values()
+        self.kpi_version_ids._apply_calculation_results(results)
+
         for snapshot in self:
-            calculated = 0
+            calculated = len(snapshot.kpi_version_ids.filtered(lambda k: k.id in results))
             errors = []
 
-            for kpi in snapshot.kpi_version_ids:
-                if kpi.calculation_method != 'manual':
-                    try:
-                        kpi.action_calculate()
-                        calculated += 1
-                    except Exception as e:
-                        errors.append(f"{kpi.name}: {str(e)}")
-                        _logger.error("❌ Erreur calcul KPI %s: %s", kpi.name, str(e))
+            for kpi in snapshot.kpi_version_ids.filtered(lambda k: k.id in kpi_errors):
+                errors.append(f"{kpi.name}: {kpi_errors[kpi.id]}")
+                _logger.error("❌ Erreur calcul KPI %s: %s", kpi.name, kpi_errors[kpi.id])
 
             # Message de résultat
             if calculated > 0:
@@ -2,6 +2,21 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
+from odoo.osv import expression
+from odoo.tools import SQL
+from odoo.tools.safe_eval import safe_eval
+from collections import defaultdict
+from datetime import timedelta
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Méthodes évaluées par le moteur de calcul
+AUTO_CALCULATION_METHODS = ('auto_average', 'auto_sum', 'auto_rate')
+NUMERIC_FIELD_TYPES = ('integer', 'float', 'monetary')
+# Champs qui modifient la série temporelle d'un indicateur publié
+SERIES_FIELDS = {'value', 'name', 'category_id'}
 
 
 class PublicKPIVersion(models.Model):
@@ -73,6 +88,25 @@ class PublicKPIVersion(models.Model):
         tracking=True
     )
 
+    data_source_field = fields.Char(
+        string='Champ mesuré',
+        help='Champ numérique stocké agrégé pour les moyennes et les sommes',
+        tracking=True
+    )
+
+    data_source_date_field = fields.Char(
+        string='Champ date',
+        default='create_date',
+        help='Champ date limitant les données à la période du snapshot (vide : toute la période)',
+        tracking=True
+    )
+
+    data_source_success_domain = fields.Char(
+        string='Domaine de réussite',
+        help='Taux : domaine ajouté au domaine source pour compter les enregistrements en réussite',
+        tracking=True
+    )
+
     # Statut
     state = fields.Selection([
         ('draft', 'Brouillon'),
@@ -138,6 +172,14 @@ class PublicKPIVersion(models.Model):
         tracking=True
     )
 
+    calculation_duration_ms = fields.Float(
+        string='Durée du calcul (ms)',
+        digits=(16, 1),
+        readonly=True,
+        copy=False,
+        help='Préparation de l\'indicateur + sa part de la requête groupée de son modèle source'
+    )
+
     @api.depends('value', 'previous_value')
     def _compute_evolution(self):
         for kpi in self:
@@ -162,46 +204,193 @@ class PublicKPIVersion(models.Model):
             if kpi.value < 0:
                 raise ValidationError(_("La valeur ne peut pas être négative"))
 
+    # Cache des réponses publiques
+    @api.model_create_multi
+    def create(self, vals_list):
+        kpis = super().create(vals_list)
+        if kpis._is_publicly_visible():
+            self.env['public.kpi.snapshot']._invalidate_public_cache()
+        return kpis
+
+    def write(self, vals):
+        visible_before = self._is_publicly_visible()
+        old_followers = self.browse()
+        if {'name', 'category_id'}.intersection(vals):
+            # Changement de série : les versions qui suivaient dans l'ancienne
+            # série sont à re-résoudre, à lire avant que le point ne la quitte
+            old_followers = self.env['public.kpi.point'].sudo()._get_next_versions(self._in_series())
+        res = super().write(vals)
+        if visible_before or self._is_publicly_visible():
+            self.env['public.kpi.snapshot']._invalidate_public_cache()
+            self.snapshot_id._reset_public_pdf()
+        if SERIES_FIELDS.intersection(vals):
+            self._in_series()._publish_series_points()
+            (old_followers - self)._refresh_previous_values()
+        return res
+
+    def unlink(self):
+        if self._is_publicly_visible():
+            self.env['public.kpi.snapshot']._invalidate_public_cache()
+            self.snapshot_id._reset_public_pdf()
+        self.env['public.kpi.point'].sudo()._remove_versions(self)
+        return super().unlink()
+
+    def _in_series(self):
+        """Versions dont la valeur figure dans la série (snapshot publié ou archivé)"""
+        return self.filtered(lambda k: k.snapshot_id.state in ('published', 'archived'))
+
+    def _is_publicly_visible(self):
+        """Indicateur affiché par les pages publiques (publié ou dans un snapshot publié)"""
+        return any(kpi.state == 'published' or kpi.snapshot_id.state == 'published' for kpi in self)
+
     # Actions
     def action_calculate(self):
         """Calculer la valeur automatiquement"""
-        for kpi in self:
-            if kpi.calculation_method != 'manual':
-                try:
-                    # Implémenter le calcul selon la méthode
-                    if kpi.calculation_method == 'auto_average':
-                        kpi.value = self._calculate_average(kpi)
-                    elif kpi.calculation_method == 'auto_sum':
-                        kpi.value = self._calculate_sum(kpi)
-                    elif kpi.calculation_method == 'auto_rate':
-                        kpi.value = self._calculate_rate(kpi)
-
-                    kpi.last_calculation_date = fields.Datetime.now()
-                    kpi.evidence_notes = _("Calculé automatiquement le %s") % kpi.last_calculation_date
-
-                except Exception as e:
-                    raise UserError(_("Erreur lors du calcul: %s") % str(e))
-
-    def _calculate_average(self, kpi):
-        """Calculer une moyenne - À IMPLÉMENTER selon besoins"""
-        # ✅ TODO: Implémenter calcul réel depuis survey ou eLearning
-        return 75.5
-
-    def _calculate_sum(self, kpi):
-        """Calculer une somme - À IMPLÉMENTER selon besoins"""
-        # ✅ TODO: Implémenter calcul réel
-        return 150
-
-    def _calculate_rate(self, kpi):
-        """Calculer un taux - À IMPLÉMENTER selon besoins"""
-        # ✅ TODO: Implémenter calcul réel
-        # Exemple: taux de réussite
-        # Model = self.env[kpi.data_source_model]
-        # domain = eval(kpi.data_source_domain)
-        # total = Model.search_count(domain)
-        # success = Model.search_count(domain + [('state', '=', 'done')])
-        # return (success / total * 100) if total > 0 else 0
-        return 85.2
+        results, errors = self._compute_kpi_values()
+        if errors:
+            raise UserError(_("Erreur lors du calcul: %s") % '\n'.join(
+                f"{self.browse(kpi_id).name}: {error}" for kpi_id, error in errors.items()
+            ))
+        self._apply_calculation_results(results)
+
+    # Série temporelle
+    def _publish_series_points(self):
+        """
+        Enregistre la valeur publiée dans la série puis met à jour la valeur
+        précédente (et donc l'évolution) de ces versions et de celles qui les
+        suivent directement : seuls les maillons touchés sont recalculés.
+        """
+        Point = self.env['public.kpi.point'].sudo()
+        Point._record_versions(self)
+        (self | Point._get_next_versions(self))._refresh_previous_values()
+
+    def _refresh_previous_values(self):
+        """
+        Valeur précédente lue dans la série (une requête pour toutes les
+        versions) ; remise à 0 si la série n'a plus de valeur antérieure
+        """
+        previous = self.env['public.kpi.point'].sudo()._get_previous_points(self)
+        for kpi in self.filtered(lambda k: k.snapshot_id.period_start and k.snapshot_id.period_end):
+            value = previous[kpi.id][0] if kpi.id in previous else 0.0
+            if kpi.previous_value != value:
+                kpi.previous_value = value
+
+    # Moteur de calcul
+    def _compute_kpi_values(self):
+        """
+        Évalue les indicateurs automatiques sur la période de leur snapshot.
+        Les indicateurs d'un même modèle source sont calculés par une seule
+        requête : chacun y est une agrégation filtrée (FILTER) sur son domaine.
+        Retourne ({kpi_id: (valeur, durée ms)}, {kpi_id: message d'erreur})
+        """
+        results, errors = {}, {}
+        batches = defaultdict(list)
+
+        for kpi in self.filtered(lambda k: k.calculation_method in AUTO_CALCULATION_METHODS):
+            started = time.perf_counter()
+            try:
+                aggregates = kpi._prepare_calculation()
+            except Exception as e:
+                errors[kpi.id] = str(e)
+                _logger.warning("❌ Configuration KPI %s invalide: %s", kpi.name, e)
+                continue
+            batches[kpi.data_source_model].append((kpi, aggregates, (time.perf_counter() - started) * 1000))
+
+        for model_name, items in batches.items():
+            Model = self.env[model_name].sudo()
+            Model.flush_model()
+            table = SQL.identifier(Model._table)
+            scope = Model._search(expression.OR([kpi._get_source_domain() for kpi, _aggs, _prep in items]))
+
+            started = time.perf_counter()
+            self.env.cr.execute(SQL(
+                "SELECT %s FROM %s WHERE %s IN (%s)",
+                SQL(", ").join(agg for _kpi, aggs, _prep in items for agg in aggs),
+                table,
+                SQL.identifier(Model._table, 'id'),
+                scope.subselect(),
+            ))
+            row = list(self.env.cr.fetchone())
+            batch_ms = (time.perf_counter() - started) * 1000
+            _logger.info("🔢 %s: %d indicateur(s) calculé(s) en une requête (%.1f ms)", model_name, len(items), batch_ms)
+
+            for kpi, aggs, prepare_ms in items:
+                values = [row.pop(0) for _agg in aggs]
+                if kpi.calculation_method == 'auto_rate':
+                    total, success = values
+                    value = (success / total * 100) if total else 0.0
+                else:
+                    value = values[0] or 0.0
+                duration = prepare_ms + batch_ms / len(items)
+                results[kpi.id] = (round(float(value), 2), duration)
+                _logger.debug("⏱️ KPI %s = %s (%.1f ms)", kpi.name, results[kpi.id][0], duration)
+
+        return results, errors
+
+    def _prepare_calculation(self):
+        """Vérifie la configuration et retourne les agrégations SQL de l'indicateur"""
+        self.ensure_one()
+        if not self.data_source_model or self.data_source_model not in self.env:
+            raise UserError(_("Modèle source inconnu : %s") % (self.data_source_model or '-'))
+        Model = self.env[self.data_source_model].sudo()
+
+        if self.data_source_date_field:
+            date_field = Model._fields.get(self.data_source_date_field)
+            if not date_field or date_field.type not in ('date', 'datetime'):
+                raise UserError(_("Champ date invalide : %s") % self.data_source_date_field)
+
+        record_id = SQL.identifier(Model._table, 'id')
+        in_domain = SQL("%s IN (%s)", record_id, Model._search(self._get_source_domain()).subselect())
+
+        if self.calculation_method == 'auto_rate':
+            success_domain = expression.AND([
+                self._get_source_domain(),
+                self._parse_domain(self.data_source_success_domain),
+            ])
+            in_success = SQL("%s IN (%s)", record_id, Model._search(success_domain).subselect())
+            return [
+                SQL("COUNT(*) FILTER (WHERE %s)", in_domain),
+                SQL("COUNT(*) FILTER (WHERE %s)", in_success),
+            ]
+
+        field = Model._fields.get(self.data_source_field or '')
+        if not field or not field.store or field.type not in NUMERIC_FIELD_TYPES:
+            raise UserError(_("Champ mesuré invalide (numérique stocké attendu) : %s") % (self.data_source_field or '-'))
+        aggregate = SQL('AVG') if self.calculation_method == 'auto_average' else SQL('SUM')
+        return [SQL("%s(%s) FILTER (WHERE %s)", aggregate, SQL.identifier(Model._table, field.name), in_domain)]
+
+    def _get_source_domain(self):
+        """Domaine source restreint à la période du snapshot"""
+        self.ensure_one()
+        domain = self._parse_domain(self.data_source_domain)
+        snapshot = self.snapshot_id
+        if self.data_source_date_field and snapshot.period_start and snapshot.period_end:
+            domain = expression.AND([domain, [
+                (self.data_source_date_field, '>=', snapshot.period_start),
+                (self.data_source_date_field, '<', snapshot.period_end + timedelta(days=1)),
+            ]])
+        return domain
+
+    @api.model
+    def _parse_domain(self, domain_str):
+        if not domain_str:
+            return []
+        domain = safe_eval(domain_str, {'context_today': fields.Date.context_today(self)})
+        if not isinstance(domain, (list, tuple)):
+            raise UserError(_("Domaine invalide : %s") % domain_str)
+        return list(domain)
+
+    def _apply_calculation_results(self, results):
+        """Enregistre les valeurs calculées par _compute_kpi_values"""
+        now = fields.Datetime.now()
+        for kpi in self.filtered(lambda k: k.id in results):
+            value, duration = results[kpi.id]
+            kpi.write({
+                'value': value,
+                'calculation_duration_ms': duration,
+                'last_calculation_date': now,
+                'evidence_notes': _("Calculé automatiquement le %s") % now,
+            })
 
     def action_publish(self):
         """Publier l'indicateur"""
@@ -0,0 +1,126 @@
+# custom_addons/lms_public_kpi/models/public_kpi_view.py
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, _
+from odoo.tools import sql
+import logging
+import threading
+
+_logger = logging.getLogger(__name__)
+
+
+class PublicKPIViewEvent(models.Model):
+    """
+    Consultations publiques des snapshots (journal en ajout seul)
+    Une ligne insérée en SQL par vue : la requête publique n'écrit jamais sur
+    le snapshot. Le cron replie les événements dans public.kpi.view.daily.
+    """
+    _name = 'public.kpi.view.event'
+    _description = 'Consultation publique d\'un snapshot KPI'
+    _order = 'id'
+    _log_access = False
+
+    snapshot_id = fields.Many2one(
+        'public.kpi.snapshot',
+        string='Snapshot',
+        required=True,
+        ondelete='cascade',
+        index=True
+    )
+
+    viewed_at = fields.Datetime(
+        string='Date de consultation',
+        required=True
+    )
+
+    @api.model
+    def _record(self, snapshot_id):
+        """Enregistre une vue avec un unique INSERT, sans passer par l'ORM"""
+        self.env.cr.execute("""
+            INSERT INTO public_kpi_view_event (snapshot_id, viewed_at)
+            VALUES (%s, NOW() AT TIME ZONE 'UTC')
+        """, (snapshot_id,))
+
+    @api.model
+    def _fold_batch(self, batch_size):
+        """
+        Consomme jusqu'à ``batch_size`` événements et les ajoute aux compteurs
+        journaliers en une requête. Retourne le nombre d'événements repliés.
+        """
+        self.env['public.kpi.view.daily'].flush_model()
+        self.env.cr.execute("""
+            WITH ev AS (
+                DELETE FROM public_kpi_view_event
+                 WHERE id IN (SELECT id FROM public_kpi_view_event
+                               ORDER BY id
+                               LIMIT %s
+                               FOR UPDATE SKIP LOCKED)
+             RETURNING snapshot_id, viewed_at
+            ), agg AS (
+                SELECT snapshot_id, viewed_at::date AS day,
+                       COUNT(*) AS nb, MAX(viewed_at) AS last_view_at
+                  FROM ev
+                 GROUP BY snapshot_id, viewed_at::date
+            ), ins AS (
+                INSERT INTO public_kpi_view_daily (snapshot_id, day, view_count, last_view_at)
+                SELECT snapshot_id, day, nb, last_view_at FROM agg
+                ON CONFLICT (snapshot_id, day) DO UPDATE
+                   SET view_count = public_kpi_view_daily.view_count + EXCLUDED.view_count,
+                       last_view_at = GREATEST(public_kpi_view_daily.last_view_at, EXCLUDED.last_view_at)
+            )
+            SELECT COALESCE(SUM(nb), 0) FROM agg
+        """, (batch_size,))
+        count = self.env.cr.fetchone()[0]
+        self.env['public.kpi.view.daily'].invalidate_model()
+        return int(count)
+
+    @api.model
+    def _cron_fold_events(self, batch_size=5000):
+        """Replie les vues par lots, avec un commit par lot"""
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        total = 0
+        while True:
+            count = self._fold_batch(batch_size)
+            total += count
+            if auto_commit and count:
+                self.env.cr.commit()
+            if count < batch_size:
+                break
+        if total:
+            _logger.info("📊 %s consultations KPI repliées", total)
+        return total
+
+
+class PublicKPIViewDaily(models.Model):
+    """Nombre de consultations publiques par snapshot et par jour"""
+    _name = 'public.kpi.view.daily'
+    _description = 'Consultations KPI par jour'
+    _order = 'day desc, snapshot_id'
+    _log_access = False
+
+    snapshot_id = fields.Many2one(
+        'public.kpi.snapshot',
+        string='Snapshot',
+        required=True,
+        ondelete='cascade',
+        index=True
+    )
+
+    day = fields.Date(string='Jour', required=True)
+    view_count = fields.Integer(string='Vues', default=0)
+    last_view_at = fields.Datetime(string='Dernière consultation')
+
+    _sql_constraints = [
+        ('snapshot_day_unique', 'UNIQUE(snapshot_id, day)',
+         'Un seul compteur par snapshot et par jour.'),
+    ]
+
+    def init(self):
+        # Reprise des compteurs de l'ancien champ stocké public_kpi_snapshot.view_count
+        if sql.column_exists(self.env.cr, 'public_kpi_snapshot', 'view_count'):
+            self.env.cr.execute("""
+                INSERT INTO public_kpi_view_daily (snapshot_id, day, view_count, last_view_at)
+                SELECT id, COALESCE(last_view_date, create_date)::date, view_count, last_view_date
+                  FROM public_kpi_snapshot
+                 WHERE view_count > 0
+                ON CONFLICT (snapshot_id, day) DO NOTHING
+            """)
@@ -1 +1,2 @@
-from . import kpi_rejection_wizard
\ No newline at end of file
+from . import kpi_rejection_wizard
+from . import kpi_audit_export_wizard
\ No newline at end of file
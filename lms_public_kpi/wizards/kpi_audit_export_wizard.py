@@ -0,0 +1,84 @@
+# custom_addons/lms_public_kpi/wizards/kpi_audit_export_wizard.py
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError, ValidationError
+
+
+class KPIAuditExportWizard(models.TransientModel):
+    _name = 'kpi.audit.export.wizard'
+    _description = 'Wizard d\'export audit multi-snapshots'
+
+    snapshot_ids = fields.Many2many(
+        'public.kpi.snapshot',
+        string='Snapshots',
+        help="Snapshots à exporter (vide : tous ceux de la période)"
+    )
+
+    date_from = fields.Date(
+        string='Période du',
+        help="Snapshots dont la période commence à partir de cette date"
+    )
+
+    date_to = fields.Date(
+        string='Au',
+        help="Snapshots dont la période se termine au plus tard à cette date"
+    )
+
+    include_drafts = fields.Boolean(
+        string='Inclure les brouillons',
+        default=False,
+        help="Par défaut seuls les snapshots publiés et archivés sont exportés"
+    )
+
+    export_format = fields.Selection([
+        ('zip', 'Archive ZIP (JSONL + pièces jointes + manifest)'),
+        ('jsonl', 'JSON Lines'),
+    ], string='Format', default='zip', required=True)
+
+    include_attachments = fields.Boolean(
+        string='Pièces jointes',
+        default=True,
+        help="ZIP : fichiers inclus dans l'archive. JSON Lines : référencés (nom, taille, sha1)"
+    )
+
+    @api.model
+    def default_get(self, fields_list):
+        res = super().default_get(fields_list)
+        if self.env.context.get('active_model') == 'public.kpi.snapshot' and self.env.context.get('active_ids'):
+            res['snapshot_ids'] = [(6, 0, self.env.context['active_ids'])]
+        return res
+
+    @api.constrains('date_from', 'date_to')
+    def _check_dates(self):
+        for wizard in self:
+            if wizard.date_from and wizard.date_to and wizard.date_from > wizard.date_to:
+                raise ValidationError(_("La date de début doit précéder la date de fin"))
+
+    def _get_snapshots(self):
+        self.ensure_one()
+        if self.snapshot_ids:
+            return self.snapshot_ids.sorted(lambda s: (s.period_start, s.id))
+
+        domain = []
+        if not self.include_drafts:
+            domain.append(('state', 'in', ('published', 'archived')))
+        if self.date_from:
+            domain.append(('period_start', '>=', self.date_from))
+        if self.date_to:
+            domain.append(('period_end', '<=', self.date_to))
+        return self.env['public.kpi.snapshot'].search(domain, order='period_start, id')
+
+    def action_export(self):
+        """Générer l'export audit et le télécharger"""
+        self.ensure_one()
+        snapshots = self._get_snapshots()
+        if not snapshots:
+            raise UserError(_("Aucun snapshot ne correspond aux critères"))
+
+        attachment = snapshots._export_audit_archive(self.export_format, self.include_attachments)
+
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/web/content/{attachment.id}?download=true',
+            'target': 'self',
+        }
@@ -10,6 +10,7 @@
     'data': [
         'security/security.xml',
         'security/ir.model.access.csv',
+        'data/ai_correction_cron.xml',
         'views/ai_config_views.xml',
         'views/ai_wizards_views.xml',
         'views/slide_question_wizard_views.xml',
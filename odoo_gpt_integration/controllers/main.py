@@ -93,11 +93,23 @@ class WebsiteSlidesExtended(WebsiteSlides):
                 'message': _("Réponse déjà enregistrée pour cette tentative.")
             }
 
+        # Correction IA des réponses ouvertes : tous les appels de la tentative
+        # partent en parallèle, la latence est celle de l'appel le plus lent
+        ai_answers = {}
+        for question in slide.question_ids:
+            if (question.x_question_type == 'text_box' and question.correction_mode == 'manual'
+                    and question.is_ai_corrected):
+                text = (kwargs.get(f'text_answer_{question.id}') or '').strip()
+                if len(text) >= 5:
+                    ai_answers[question] = text
+        gpt_results = request.env['slide.question']._call_gpt_corrections_parallel(ai_answers) if ai_answers else {}
+
         results = {}
         pending_count = 0
         graded_points_sum = 0.0
         graded_questions_count = 0
         rows_to_create = []
+        rows_to_enqueue = []
 
         for question in slide.question_ids:
             qid = str(question.id)
@@ -132,7 +144,8 @@ class WebsiteSlidesExtended(WebsiteSlides):
                 continue
 
             # --- correction ---
-            result = question._check_answer(user_answer, user_id=request.env.user.id)
+            result = question._check_answer(user_answer, user_id=request.env.user.id,
+                                            gpt_result=gpt_results.get(question.id))
 
             create_pending = bool(result.get('create_pending')) or (result.get('state') == 'pending')
             is_pending = create_pending
@@ -180,6 +193,8 @@ class WebsiteSlidesExtended(WebsiteSlides):
                     'validated_date': fields.Datetime.now(),
                 })
 
+            if result.get('enqueue_ai_correction'):
+                rows_to_enqueue.append(len(rows_to_create))
             rows_to_create.append(row)
 
             results[qid] = {
@@ -196,7 +211,10 @@ class WebsiteSlidesExtended(WebsiteSlides):
         try:
             with request.env.cr.savepoint():
                 if rows_to_create:
-                    Pending.create(rows_to_create)
+                    created = Pending.create(rows_to_create)
+                    if rows_to_enqueue:
+                        request.env['ai.correction.queue'].sudo()._enqueue_pending_answers(
+                            Pending.browse([created[i].id for i in rows_to_enqueue]))
         except IntegrityError:
             request.env.cr.rollback()
             return {
@@ -1,4 +1,5 @@
 from . import ai_provider_config
+from . import ai_response_cache
 from . import slide_channel
 from . import ai_wizards
 from . import slide_question_correction
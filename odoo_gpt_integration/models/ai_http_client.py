@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Client HTTP partagé vers les fournisseurs IA.
+
+Un client est maintenu par processus et par configuration ``ai.provider.config`` :
+  - pool de connexions keep-alive (plus de handshake TCP+TLS à chaque appel)
+  - nombre d'appels simultanés borné
+  - nouvelles tentatives avec délai exponentiel et gigue sur 429 / 5xx / erreurs réseau
+  - disjoncteur : après N échecs consécutifs, les appels échouent immédiatement
+    pendant la période de repos, ce qui renvoie vers les chemins ``_fallback_*``.
+Le client n'utilise pas l'ORM et peut être appelé depuis n'importe quel thread.
+"""
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_logger = logging.getLogger(__name__)
+
+# Codes HTTP pour lesquels une nouvelle tentative a un sens
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+class AiCircuitOpenError(requests.exceptions.ConnectionError):
+    """Levée sans appel réseau tant que le disjoncteur du fournisseur est ouvert"""
+
+
+class CircuitBreaker:
+    """Disjoncteur simple : fermé → ouvert (après N échecs) → semi-ouvert (un essai)"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._half_open_trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def before_call(self):
+        with self._lock:
+            state = self._state()
+            if state == 'open':
+                raise AiCircuitOpenError("Fournisseur IA indisponible (disjoncteur ouvert)")
+            if state == 'half_open':
+                # Un seul appel d'essai à la fois pendant la phase semi-ouverte
+                if self._half_open_trial:
+                    raise AiCircuitOpenError("Fournisseur IA indisponible (essai en cours)")
+                self._half_open_trial = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._half_open_trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._half_open_trial = False
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    _logger.warning("Disjoncteur IA ouvert après %s échecs consécutifs", self._failures)
+                self._opened_at = time.monotonic()
+
+
+class AiHttpClient:
+    """Session HTTP poolée avec retries et disjoncteur, propre à une configuration fournisseur"""
+
+    def __init__(self, pool_size=10, max_concurrency=8, max_retries=2,
+                 breaker_threshold=5, breaker_reset=30, backoff_base=0.5, backoff_max=10.0):
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        self._semaphore = threading.BoundedSemaphore(max(1, max_concurrency))
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size), max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _backoff_delay(self, attempt, response=None):
+        retry_after = response is not None and response.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        delay = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+        # "Full jitter" : évite que tous les workers relancent au même instant
+        return random.uniform(0, delay)
+
+    def request(self, method, url, **kwargs):
+        """
+        Exécute la requête. Retourne la ``Response`` (y compris 4xx : l'appelant
+        garde la main sur ``raise_for_status`` et les erreurs métier comme CONTEXT_NOT_FOUND).
+        """
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            response = None
+            try:
+                with self._semaphore:
+                    response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.breaker.record_failure()
+                # Un timeout de lecture n'est pas rejoué : l'appel a pu être traité
+                if isinstance(e, requests.exceptions.ReadTimeout) or attempt >= self.max_retries:
+                    raise
+            except Exception:
+                # Toute autre erreur (décodage, URL, SSL...) compte comme un échec :
+                # sinon l'essai semi-ouvert resterait marqué "en cours" indéfiniment
+                self.breaker.record_failure()
+                raise
+            else:
+                if response.status_code not in RETRY_STATUS_CODES:
+                    self.breaker.record_success()
+                    return response
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    return response
+
+            delay = self._backoff_delay(attempt, response)
+            _logger.info("Appel IA %s %s : nouvelle tentative %s dans %.1fs",
+                         method, url, attempt + 1, delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(key, settings):
+    """
+    Client du processus pour ``key`` (base, id fournisseur). Recréé si les
+    réglages (``settings``, dict des paramètres d'AiHttpClient) ont changé.
+    """
+    with _clients_lock:
+        entry = _clients.get(key)
+        signature = tuple(sorted(settings.items()))
+        if entry is None or entry[0] != signature:
+            if entry is not None:
+                entry[1].session.close()
+            entry = (signature, AiHttpClient(**settings))
+            _clients[key] = entry
+        return entry[1]
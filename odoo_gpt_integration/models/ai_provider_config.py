@@ -5,6 +5,8 @@ from odoo.exceptions import UserError
 import requests
 import logging
 
+from .ai_http_client import get_client
+
 _logger = logging.getLogger(__name__)
 
 class AiProviderConfig(models.Model):
@@ -60,6 +62,91 @@ class AiProviderConfig(models.Model):
         help="Délai d'attente maximum pour les appels API"
     )
 
+    parallel_corrections = fields.Integer(
+        string="Corrections Parallèles",
+        default=4,
+        help="Nombre maximum d'appels de correction simultanés lors de la soumission d'un quiz "
+             "(1 = correction séquentielle)"
+    )
+
+    correction_deadline = fields.Integer(
+        string="Échéance de Correction (secondes)",
+        default=45,
+        help="Délai global accordé aux corrections IA d'une soumission. Au-delà, "
+             "les réponses restantes passent en correction manuelle."
+    )
+
+    async_corrections = fields.Boolean(
+        string="Correction Différée",
+        default=False,
+        help="Si activé, la soumission d'un quiz met les réponses ouvertes en file d'attente : "
+             "la correction IA est faite en arrière-plan puis appliquée à la réponse en attente."
+    )
+
+    pool_size = fields.Integer(
+        string="Connexions Persistantes",
+        default=10,
+        help="Taille du pool de connexions keep-alive par processus Odoo"
+    )
+
+    max_concurrent_requests = fields.Integer(
+        string="Appels Simultanés Max",
+        default=8,
+        help="Nombre maximum d'appels en cours vers ce fournisseur, par processus Odoo"
+    )
+
+    max_retries = fields.Integer(
+        string="Nouvelles Tentatives",
+        default=2,
+        help="Nombre de nouvelles tentatives sur 429 / 5xx / erreur réseau (délai exponentiel avec gigue)"
+    )
+
+    breaker_threshold = fields.Integer(
+        string="Seuil du Disjoncteur",
+        default=5,
+        help="Nombre d'échecs consécutifs après lequel les appels échouent immédiatement"
+    )
+
+    breaker_reset_seconds = fields.Integer(
+        string="Repos du Disjoncteur (secondes)",
+        default=30,
+        help="Durée pendant laquelle le fournisseur n'est plus appelé après ouverture du disjoncteur"
+    )
+
+    cache_enabled = fields.Boolean(
+        string="Cache des Réponses",
+        default=True,
+        help="Réutilise les réponses déjà obtenues pour une demande identique (résumés, corrections)"
+    )
+
+    cache_ttl_hours = fields.Integer(
+        string="Durée du Cache (heures)",
+        default=24,
+        help="Durée de vie d'une entrée lorsque l'expiration du contexte RAG est inconnue"
+    )
+
+    cache_max_entries = fields.Integer(
+        string="Entrées Max en Cache",
+        default=10000,
+        help="Au-delà, les entrées les moins récemment utilisées sont supprimées (0 : sans limite)"
+    )
+
+    cache_entry_count = fields.Integer(string="Entrées en Cache", compute='_compute_cache_stats')
+    cache_hit_count = fields.Integer(string="Succès du Cache", compute='_compute_cache_stats')
+    cache_miss_count = fields.Integer(
+        string="Échecs du Cache",
+        default=0,
+        readonly=True,
+        copy=False,
+        help="Recherches sans réponse valide en cache (compteur cumulé, remis à zéro en vidant le cache)"
+    )
+    cache_hit_rate = fields.Float(string="Taux de Succès (%)", digits=(5, 1), compute='_compute_cache_stats')
+    cache_store_count = fields.Integer(
+        string="Réponses Enregistrées",
+        compute='_compute_cache_stats',
+        help="Réponses obtenues du fournisseur et mises en cache (les appels en erreur ne sont pas comptés)"
+    )
+
     notes = fields.Text(
         string="Notes",
         help="Notes internes sur cette configuration"
@@ -78,6 +165,40 @@ class AiProviderConfig(models.Model):
         help="Date et heure de la dernière utilisation de cette configuration"
     )
 
+    def _compute_cache_stats(self):
+        stats = {
+            provider.id: (count, hits, stores)
+            for provider, count, hits, stores in self.env['ai.response.cache'].sudo()._read_group(
+                [('provider_config_id', 'in', self.ids)],
+                ['provider_config_id'],
+                ['__count', 'hit_count:sum', 'store_count:sum'],
+            )
+        }
+        for provider in self:
+            count, hits, stores = stats.get(provider.id, (0, 0, 0))
+            provider.cache_entry_count = count
+            provider.cache_hit_count = hits
+            provider.cache_store_count = stores
+            lookups = hits + provider.cache_miss_count
+            provider.cache_hit_rate = hits * 100.0 / lookups if lookups else 0.0
+
+    def action_clear_cache(self):
+        self.env['ai.response.cache'].sudo().search([('provider_config_id', 'in', self.ids)]).unlink()
+        self.sudo().write({'cache_miss_count': 0})
+        return True
+
+    # ===== CLIENT HTTP PARTAGÉ =====
+    def _get_http_client(self):
+        """Client HTTP poolé (keep-alive, retries, disjoncteur) de ce fournisseur pour le processus courant"""
+        self.ensure_one()
+        return get_client((self.env.cr.dbname, self.id), {
+            'pool_size': self.pool_size or 10,
+            'max_concurrency': self.max_concurrent_requests or 8,
+            'max_retries': self.max_retries,
+            'breaker_threshold': self.breaker_threshold or 5,
+            'breaker_reset': self.breaker_reset_seconds or 30,
+        })
+
     # ===== MÉTHODE POUR TESTER LA CONNEXION =====
     def action_test_connection(self):
         """Teste la connexion avec le fournisseur IA (appelé depuis un bouton type=object)"""
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from datetime import timedelta
+import hashlib
+import json
+import logging
+import re
+
+_logger = logging.getLogger(__name__)
+
+
+class AiResponseCache(models.Model):
+    """
+    Cache persistant des réponses du fournisseur IA, adressé par contenu :
+    la clé est le hash SHA-256 de (fournisseur, modèle, endpoint, context_id, payload normalisé).
+    Une même demande (résumé d'un chapitre, correction d'une réponse déjà vue)
+    n'est donc facturée et attendue qu'une fois tant que le contexte RAG est valide.
+    """
+    _name = 'ai.response.cache'
+    _description = "Cache des réponses IA"
+    _order = 'last_hit_at desc'
+    _rec_name = 'cache_key'
+
+    cache_key = fields.Char(string="Clé", required=True, index=True, readonly=True)
+    provider_config_id = fields.Many2one(
+        'ai.provider.config',
+        string="Fournisseur IA",
+        required=True,
+        ondelete='cascade',
+        index=True
+    )
+    endpoint = fields.Char(string="Endpoint", required=True, readonly=True)
+    context_id = fields.Char(string="Context ID RAG", index=True, readonly=True)
+    response = fields.Text(string="Réponse (JSON)", required=True, readonly=True)
+    expires_at = fields.Datetime(string="Expiration", required=True, index=True, readonly=True)
+    last_hit_at = fields.Datetime(string="Dernier Accès", index=True, readonly=True)
+    hit_count = fields.Integer(string="Succès (hits)", default=0, readonly=True)
+    store_count = fields.Integer(
+        string="Enregistrements",
+        default=1,
+        readonly=True,
+        help="Nombre de fois où une réponse a été obtenue du fournisseur puis enregistrée pour cette clé"
+    )
+
+    _sql_constraints = [
+        ('cache_key_uniq', 'unique(cache_key)', "Une entrée de cache existe déjà pour cette clé."),
+    ]
+
+    # ============================================================================
+    # CLÉ DE CACHE
+    # ============================================================================
+
+    @api.model
+    def _normalize(self, value):
+        """Normalise le payload : blancs superflus supprimés, clés triées à la sérialisation"""
+        if isinstance(value, str):
+            return re.sub(r'\s+', ' ', value).strip()
+        if isinstance(value, dict):
+            return {k: self._normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._normalize(v) for v in value]
+        return value
+
+    @api.model
+    def _make_key(self, provider_config, endpoint, payload):
+        raw = json.dumps({
+            'provider': provider_config.id,
+            'model': provider_config.model_name or '',
+            'endpoint': endpoint.strip('/'),
+            'context_id': (payload or {}).get('context_id'),
+            'payload': self._normalize(payload or {}),
+        }, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    # ============================================================================
+    # LECTURE / ÉCRITURE
+    # ============================================================================
+
+    @api.model
+    def _lookup(self, provider_config, endpoint, payload):
+        """Réponse en cache (dict) ou None. Un hit rafraîchit l'entrée pour le LRU."""
+        if not provider_config.cache_enabled:
+            return None
+        key = self._make_key(provider_config, endpoint, payload)
+        self.env.cr.execute("""
+            SELECT id, response FROM ai_response_cache
+             WHERE cache_key = %s AND expires_at > NOW() AT TIME ZONE 'UTC'
+        """, (key,))
+        row = self.env.cr.fetchone()
+        if not row:
+            self._count_miss(provider_config.id)
+            return None
+        # Compteur "best effort" : une entrée très sollicitée n'est jamais un point de contention
+        self.env.cr.execute("""
+            UPDATE ai_response_cache
+               SET hit_count = hit_count + 1, last_hit_at = NOW() AT TIME ZONE 'UTC'
+             WHERE id = (SELECT id FROM ai_response_cache WHERE id = %s FOR UPDATE SKIP LOCKED)
+        """, (row[0],))
+        _logger.debug("Cache IA : hit %s (%s)", endpoint, key[:12])
+        return json.loads(row[1])
+
+    @api.model
+    def _count_miss(self, provider_id):
+        """
+        Compteur de misses du fournisseur, dans une transaction courte séparée :
+        la ligne du fournisseur, partagée par tous les appels, n'est pas
+        verrouillée jusqu'à la fin de la requête (ni source d'erreur de
+        sérialisation) ; une incrémentation concurrente est simplement ignorée
+        """
+        with self.env.registry.cursor() as cr:
+            cr.execute("""
+                UPDATE ai_provider_config
+                   SET cache_miss_count = cache_miss_count + 1
+                 WHERE id = (SELECT id FROM ai_provider_config WHERE id = %s FOR UPDATE SKIP LOCKED)
+            """, (provider_id,))
+
+    @api.model
+    def _store(self, provider_config, endpoint, payload, response, expires_at=None):
+        """Enregistre une réponse (jamais les réponses d'erreur)"""
+        if not provider_config.cache_enabled or not isinstance(response, dict) or response.get('error'):
+            return
+        key = self._make_key(provider_config, endpoint, payload)
+        context_id = (payload or {}).get('context_id')
+        if not expires_at and context_id:
+            # TTL aligné sur l'expiration du contexte RAG
+            slide = self.env['slide.slide'].sudo().search([('x_ai_context_id', '=', context_id)], limit=1)
+            expires_at = slide.x_ai_context_expires_at
+        if not expires_at:
+            expires_at = fields.Datetime.now() + timedelta(hours=provider_config.cache_ttl_hours or 24)
+
+        self.env.cr.execute("""
+            INSERT INTO ai_response_cache (
+                cache_key, provider_config_id, endpoint, context_id, response, expires_at,
+                last_hit_at, hit_count, store_count, create_uid, create_date, write_uid, write_date)
+            VALUES (%s, %s, %s, %s, %s, %s, NOW() AT TIME ZONE 'UTC', 0, 1,
+                    %s, NOW() AT TIME ZONE 'UTC', %s, NOW() AT TIME ZONE 'UTC')
+            ON CONFLICT (cache_key) DO UPDATE SET
+                response = EXCLUDED.response,
+                expires_at = EXCLUDED.expires_at,
+                last_hit_at = EXCLUDED.last_hit_at,
+                store_count = ai_response_cache.store_count + 1,
+                write_date = EXCLUDED.write_date
+        """, (key, provider_config.id, endpoint.strip('/'), context_id,
+              json.dumps(response, ensure_ascii=False), expires_at, self.env.uid, self.env.uid))
+
+    # ============================================================================
+    # ÉVICTION
+    # ============================================================================
+
+    @api.model
+    def _cron_evict(self):
+        """
+        Supprime les entrées expirées puis applique la taille maximale (LRU) par
+        fournisseur ; une taille maximale nulle ou négative signifie sans limite
+        """
+        self.env.cr.execute("DELETE FROM ai_response_cache WHERE expires_at <= NOW() AT TIME ZONE 'UTC'")
+        expired = self.env.cr.rowcount
+        evicted = 0
+        providers = self.env['ai.provider.config'].with_context(active_test=False).search([
+            ('cache_max_entries', '>', 0),
+        ])
+        for provider in providers:
+            self.env.cr.execute("""
+                DELETE FROM ai_response_cache
+                 WHERE id IN (
+                        SELECT id FROM ai_response_cache
+                         WHERE provider_config_id = %s
+                         ORDER BY last_hit_at DESC NULLS LAST, id DESC
+                        OFFSET %s)
+            """, (provider.id, provider.cache_max_entries))
+            evicted += self.env.cr.rowcount
+        self.invalidate_model()
+        if expired or evicted:
+            _logger.info("Cache IA : %s entrée(s) expirée(s), %s évincée(s) (LRU)", expired, evicted)
@@ -28,10 +28,11 @@ class AiBaseWizard(models.AbstractModel):
         required=True
     )
 
-    def _call_api(self, endpoint, payload, timeout=120):
+    def _call_api(self, endpoint, payload, timeout=120, cache=False):
         """
         Méthode centralisée pour appeler l'API
         CONFORME À LA SPEC : Gestion du CONTEXT_NOT_FOUND
+        `cache`: réutilise la réponse d'une demande identique (ai.response.cache)
         """
         if not self.provider_config_id:
             raise UserError(_("Aucun fournisseur d'IA configuré"))
@@ -49,15 +50,24 @@ class AiBaseWizard(models.AbstractModel):
         }
         url = f"{base_url.strip('/')}/{endpoint.strip('/')}"
 
+        Cache = self.env['ai.response.cache'].sudo()
+        if cache:
+            cached = Cache._lookup(config, endpoint, payload)
+            if cached is not None:
+                _logger.info(f"Réponse API servie depuis le cache : {url}")
+                return cached
+
         try:
             _logger.info(f"Appel API : {url}")
             _logger.debug(f"Payload : {json.dumps(payload, indent=2)}")
 
-            response = requests.post(url, headers=headers, json=payload, timeout=timeout)
+            response = config._get_http_client().post(url, headers=headers, json=payload, timeout=timeout)
             response.raise_for_status()
 
             data = response.json()
             _logger.info(f"Réponse API reçue avec succès")
+            if cache:
+                Cache._store(config, endpoint, payload, data)
             return data
 
         except requests.exceptions.HTTPError as e:
@@ -83,54 +93,26 @@ class AiBaseWizard(models.AbstractModel):
         Récupère ou crée un contexte pour un slide
         CONFORME À LA SPEC : Gestion automatique de l'expiration
         """
-        # Vérifier l'expiration
-        is_expired = (
-                not slide.x_ai_context_id or
-                (slide.x_ai_context_expires_at and
-                 slide.x_ai_context_expires_at < fields.Datetime.now())
-        )
-
-        # Si valide, on retourne
-        if not is_expired:
-            _logger.info(f"Réutilisation du contexte {slide.x_ai_context_id}")
-            return slide.x_ai_context_id
-
-        # Sinon, création/recréation
-        _logger.info(f"Création d'un nouveau contexte pour '{slide.name}'")
-
-        import base64
-
-        # Prépare le contenu
-        content = None
-        if slide.binary_content:
-            content = slide.binary_content.decode('utf-8')
-        elif slide.slide_category == 'article' and slide.html_content:
-            html_bytes = slide.html_content.encode('utf-8')
-            content = base64.b64encode(html_bytes).decode('utf-8')
-
-        if not content:
-            _logger.warning(f"Slide '{slide.name}' sans contenu exploitable")
-            return None
-
-        # Appel API conforme à la spec
-        payload = {
-            'file_id': f"ODOO_SLIDE_{slide.id}",
-            'file_content_base64': content,
-            'file_name': slide.name or f"slide_{slide.id}.pdf",
-        }
-
-        response_data = self._call_api('contexts', payload, timeout=180)
-
-        if response_data and not response_data.get('error'):
-            # Sauvegarde selon la spec
-            slide.sudo().write({
-                'x_ai_context_id': response_data.get('context_id'),
-                'x_ai_context_expires_at': response_data.get('metadata', {}).get('expires_at'),
-                'x_ai_context_file_id': f"ODOO_SLIDE_{slide.id}",
-            })
-            return response_data.get('context_id')
+        return self._get_or_create_contexts(slide).get(slide.id)
 
-        return None
+    def _get_or_create_contexts(self, slides, force=False):
+        """
+        Contextes de plusieurs slides en un appel : ``{slide.id: context_id}``.
+        Envoi en flux, sans envoi si le contenu n'a pas changé, slides traités en parallèle.
+        """
+        if not self.provider_config_id:
+            raise UserError(_("Aucun fournisseur d'IA configuré"))
+        try:
+            return slides._ensure_ai_contexts(self.provider_config_id, force=force, raise_errors=True)
+        except requests.exceptions.HTTPError as e:
+            _logger.error(f"Erreur HTTP {e.response.status_code} : {e.response.text}")
+            raise UserError(_(f"Erreur API : {e.response.status_code} - {e.response.text}"))
+        except requests.exceptions.Timeout:
+            _logger.error("Timeout lors de l'envoi des contextes")
+            raise UserError(_("L'API ne répond pas. Veuillez réessayer."))
+        except requests.exceptions.RequestException as e:
+            _logger.error(f"Erreur de connexion : {str(e)}")
+            raise UserError(_(f"Impossible de contacter l'API : {str(e)}"))
 
     def _handle_context_not_found(self, slides, original_call_func):
         """
@@ -139,16 +121,21 @@ class AiBaseWizard(models.AbstractModel):
         """
         _logger.warning("CONTEXT_NOT_FOUND détecté, régénération automatique...")
 
-        # Régénère tous les contextes
-        new_context_ids = []
-        for slide in slides:
-            slide.sudo().write({
-                'x_ai_context_id': False,
-                'x_ai_context_expires_at': False,
-            })
-            context_id = self._get_or_create_context_for_slide(slide)
-            if context_id:
-                new_context_ids.append(context_id)
+        slides = self.env['slide.slide'].union(*slides)
+
+        # Oublie les contextes perdus, y compris chez les slides qui les partagent
+        stale_ids = [context_id for context_id in slides.mapped('x_ai_context_id') if context_id]
+        holders = slides.search([('x_ai_context_id', 'in', stale_ids)]) if stale_ids else slides.browse()
+        (slides | holders).sudo().write({
+            'x_ai_context_id': False,
+            'x_ai_context_expires_at': False,
+        })
+
+        # Régénère tous les contextes en parallèle
+        context_map = self._get_or_create_contexts(slides, force=True)
+        new_context_ids = list(dict.fromkeys(
+            context_map[slide.id] for slide in slides if slide.id in context_map
+        ))
 
         if not new_context_ids:
             raise UserError(_("Impossible de régénérer les contextes"))
@@ -253,7 +240,7 @@ class AiSummaryWizard(models.TransientModel):
         }
 
         # Appel API
-        response_data = self._call_api('summaries', payload)
+        response_data = self._call_api('summaries', payload, cache=True)
 
         # Gestion du CONTEXT_NOT_FOUND
         if response_data.get('error') == 'CONTEXT_NOT_FOUND':
@@ -262,7 +249,7 @@ class AiSummaryWizard(models.TransientModel):
                 lambda ctx_ids: self._call_api('summaries', {
                     'context_id': ctx_ids[0],
                     'config': {'length': self.length, 'language': self.language}
-                })
+                }, cache=True)
             )
 
         if not response_data or not response_data.get('summary_text'):
@@ -342,11 +329,10 @@ class AiQuizBatchWizard(models.TransientModel):
             raise UserError(_("Définissez au moins un groupe de questions"))
 
         # Obtenir les context_ids
-        context_ids = []
-        for slide in self.slide_ids:
-            ctx_id = self._get_or_create_context_for_slide(slide)
-            if ctx_id:
-                context_ids.append(ctx_id)
+        context_map = self._get_or_create_contexts(self.slide_ids)
+        context_ids = list(dict.fromkeys(
+            context_map[slide.id] for slide in self.slide_ids if slide.id in context_map
+        ))
 
         if not context_ids:
             raise UserError(_("Impossible d'obtenir des contextes pour ces chapitres"))
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Moteur de correspondance des mots-clés pour la correction automatique.
+
+Les mots-clés d'une question sont compilés une fois en automate Aho-Corasick :
+une réponse est ensuite analysée en un seul passage linéaire, quel que soit
+le nombre de mots-clés, y compris lorsqu'ils se chevauchent ("cellule" et
+"membrane cellulaire").
+"""
+import unicodedata
+from collections import deque
+
+
+def normalize_text(text, ignore_accents=False):
+    """Normalise la casse (et les accents si demandé) d'un texte"""
+    text = (text or '').lower()
+    if ignore_accents:
+        text = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+    return text
+
+
+class KeywordMatcher:
+    """
+    Automate multi-motifs immuable, partageable entre requêtes (cache registre).
+    ``find(text)`` retourne l'ensemble des indices des mots-clés présents.
+    """
+
+    __slots__ = ('_goto', '_fail', '_out', '_lengths', 'whole_words', 'ignore_accents')
+
+    def __init__(self, keywords, whole_words=False, ignore_accents=False):
+        self.whole_words = whole_words
+        self.ignore_accents = ignore_accents
+        goto, fail, out = [{}], [0], [[]]
+        lengths = []
+
+        # 1) Trie des mots-clés normalisés
+        for index, keyword in enumerate(keywords):
+            pattern = normalize_text(keyword, ignore_accents).strip()
+            lengths.append(len(pattern))
+            if not pattern:
+                continue
+            node = 0
+            for char in pattern:
+                nxt = goto[node].get(char)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto.append({})
+                    fail.append(0)
+                    out.append([])
+                    goto[node][char] = nxt
+                node = nxt
+            out[node].append(index)
+
+        # 2) Liens d'échec (parcours en largeur)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, nxt in goto[node].items():
+                queue.append(nxt)
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                fail[nxt] = goto[state].get(char, 0) if node else 0
+                out[nxt].extend(out[fail[nxt]])
+
+        self._goto = goto
+        self._fail = fail
+        self._out = [tuple(indexes) for indexes in out]
+        self._lengths = tuple(lengths)
+
+    def _is_word_match(self, text, end, length):
+        start = end - length + 1
+        before_ok = start == 0 or not text[start - 1].isalnum()
+        after_ok = end + 1 >= len(text) or not text[end + 1].isalnum()
+        return before_ok and after_ok
+
+    def find(self, text):
+        """Indices des mots-clés trouvés dans ``text`` (un seul passage)"""
+        text = normalize_text(text, self.ignore_accents)
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for index in out[node]:
+                if index in found:
+                    continue
+                if self.whole_words and not self._is_word_match(text, position, self._lengths[index]):
+                    continue
+                found.add(index)
+        return found
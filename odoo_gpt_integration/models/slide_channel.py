@@ -1,12 +1,66 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+from odoo.osv import expression
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import base64
+import hashlib
+import json
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Blocs lus dans le filestore : multiple de 3 pour un base64 sans padding intermédiaire
+CONTEXT_UPLOAD_CHUNK = 3 * 64 * 1024
+# Envois de contextes simultanés (borné en plus par max_concurrent_requests du fournisseur)
+CONTEXT_UPLOAD_WORKERS = 4
+
+
+class ContextUploadBody:
+    """
+    Corps JSON de POST /contexts produit au fil de l'envoi : le fichier est lu
+    par blocs depuis le filestore et encodé en base64 bloc par bloc, sans jamais
+    être chargé en entier en mémoire. Ré-itérable, donc compatible avec les
+    relances du client HTTP ; la longueur est connue d'avance (Content-Length).
+    """
+
+    def __init__(self, file_id, file_name, size, path=None, data=None):
+        self.size = size
+        self.path = path
+        self.data = data
+        head = json.dumps({'file_id': file_id, 'file_name': file_name})[:-1]
+        self._head = (head + ', "file_content_base64": "').encode('utf-8')
+        self._tail = b'"}'
+
+    def __len__(self):
+        return len(self._head) + 4 * ((self.size + 2) // 3) + len(self._tail)
+
+    def _chunks(self):
+        if self.path:
+            with open(self.path, 'rb') as f:
+                yield from iter(lambda: f.read(CONTEXT_UPLOAD_CHUNK), b'')
+        else:
+            for start in range(0, len(self.data), CONTEXT_UPLOAD_CHUNK):
+                yield self.data[start:start + CONTEXT_UPLOAD_CHUNK]
+
+    def __iter__(self):
+        yield self._head
+        for chunk in self._chunks():
+            yield base64.b64encode(chunk)
+        yield self._tail
+
+
+def _post_context_upload(spec):
+    """
+    Envoie un contexte préparé par ``_prepare_ai_context_upload``.
+    N'accède pas à l'ORM : peut être exécuté depuis un thread.
+    """
+    response = spec['client'].post(spec['url'], headers=spec['headers'], data=spec['body'],
+                                   timeout=spec['timeout'])
+    response.raise_for_status()
+    return response.json()
+
 
 class SlideChannel(models.Model):
     """Extension du modèle cours pour la configuration IA"""
@@ -140,22 +194,12 @@ class Slide(models.Model):
         if not provider_config:
             raise UserError(_("Aucun fournisseur d'IA configuré pour ce cours."))
 
-        # Prépare le contenu
-        content = self._prepare_content_for_api()
-
-        if not content:
+        if not self._get_ai_context_sources():
             raise UserError(_("Ce chapitre ne contient pas de contenu exploitable pour l'IA."))
 
         # Appel API
         try:
-            context_data = self._call_context_api(provider_config, content)
-
-            # Sauvegarde
-            self.sudo().write({
-                'x_ai_context_id': context_data.get('context_id'),
-                'x_ai_context_expires_at': context_data.get('metadata', {}).get('expires_at'),
-                'x_ai_context_file_id': f"ODOO_SLIDE_{self.id}",
-            })
+            self._ensure_ai_contexts(provider_config, force=True, raise_errors=True)
 
             return {
                 'type': 'ir.actions.client',
@@ -193,66 +237,168 @@ class Slide(models.Model):
             raise UserError(_("Aucun fournisseur d'IA configuré"))
         return provider
 
-    def _prepare_content_for_api(self):
-        """Prépare le contenu du slide pour l'envoi à l'API"""
-        self.ensure_one()
-
-        content = None
-
-        if self.binary_content:
-            # Contenu PDF/document
-            content = self.binary_content.decode('utf-8')
-        elif self.slide_category == 'article' and self.html_content:
-            # Contenu HTML
-            html_bytes = self.html_content.encode('utf-8')
-            content = base64.b64encode(html_bytes).decode('utf-8')
-
-        return content
-
-    def _call_context_api(self, provider_config, content):
-        """Appelle l'API pour créer/régénérer le contexte"""
+    def regenerate_context_if_needed(self):
+        """Régénère le contexte si expiré - Utilisé par les wizards"""
         self.ensure_one()
 
-        url = f"{provider_config.api_base_url.strip('/')}/contexts"
-        headers = {
-            'Authorization': f'Bearer {provider_config.api_key}',
-            'Content-Type': 'application/json'
-        }
+        if not self.x_ai_context_id or self.x_ai_context_is_expired:
+            _logger.info(f"Contexte expiré pour slide {self.id}, régénération...")
 
-        payload = {
-            'file_id': f"ODOO_SLIDE_{self.id}",
-            'file_content_base64': content,
-            'file_name': self.name or f"slide_{self.id}.pdf",
-        }
+            if not self._get_ai_context_sources():
+                raise UserError(_("Impossible de régénérer le contexte : contenu manquant"))
 
-        _logger.info(f"Régénération du contexte pour slide '{self.name}'")
+            return self._ensure_ai_contexts(raise_errors=True).get(self.id)
 
-        response = requests.post(url, headers=headers, json=payload, timeout=180)
-        response.raise_for_status()
+        return self.x_ai_context_id
 
-        return response.json()
+    # ============================================================================
+    # ENVOI DES CONTEXTES (FLUX, DÉDUPLICATION, PARALLÉLISME)
+    # ============================================================================
 
-    def regenerate_context_if_needed(self):
-        """Régénère le contexte si expiré - Utilisé par les wizards"""
+    def _get_ai_context_sources(self):
+        """
+        Contenu à envoyer pour chaque slide : ``{slide.id: (checksum, taille, chemin, données)}``.
+        Les documents sont lus via leur attachment : le checksum sha1 et la taille sont
+        déjà connus et le fichier reste dans le filestore (``chemin``) ; ``données`` n'est
+        renseigné que pour les articles et les attachments stockés en base.
+        """
+        attachments = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', 'binary_content'),
+            ('res_id', 'in', self.ids),
+        ])
+        attachment_by_slide = {attachment.res_id: attachment for attachment in attachments}
+
+        sources = {}
+        for slide in self:
+            attachment = attachment_by_slide.get(slide.id)
+            if attachment and attachment.file_size:
+                if attachment.store_fname:
+                    path, data = attachment._full_path(attachment.store_fname), None
+                else:
+                    path, data = None, attachment.raw
+                checksum = attachment.checksum or hashlib.sha1(attachment.raw).hexdigest()
+                sources[slide.id] = (checksum, attachment.file_size, path, data)
+            elif slide.slide_category == 'article' and slide.html_content:
+                data = slide.html_content.encode('utf-8')
+                sources[slide.id] = (hashlib.sha1(data).hexdigest(), len(data), None, data)
+        return sources
+
+    def _has_valid_ai_context(self, now):
         self.ensure_one()
+        return bool(self.x_ai_context_id) and not (
+            self.x_ai_context_expires_at and self.x_ai_context_expires_at < now)
 
-        if not self.x_ai_context_id or self.x_ai_context_is_expired:
-            _logger.info(f"Contexte expiré pour slide {self.id}, régénération...")
-
-            provider_config = self._get_provider_config()
-            content = self._prepare_content_for_api()
-
-            if not content:
-                raise UserError(_("Impossible de régénérer le contexte : contenu manquant"))
+    def _prepare_ai_context_upload(self, provider_config, source):
+        """Prépare l'envoi du contenu ``source`` (voir ``_get_ai_context_sources``)"""
+        self.ensure_one()
+        checksum, size, path, data = source
+        # Le checksum fait partie du file_id : un contenu inchangé se reconnaît sans relecture
+        file_id = f"ODOO_SLIDE_{self.id}_{checksum}"
+        return {
+            'client': provider_config._get_http_client(),
+            'url': f"{provider_config.api_base_url.strip('/')}/contexts",
+            'headers': {
+                'Authorization': f'Bearer {provider_config.api_key}',
+                'Content-Type': 'application/json'
+            },
+            'body': ContextUploadBody(file_id, self.name or f"slide_{self.id}.pdf", size, path=path, data=data),
+            'file_id': file_id,
+            'timeout': 180,
+        }
 
-            context_data = self._call_context_api(provider_config, content)
+    def _ensure_ai_contexts(self, provider_config=None, force=False, raise_errors=False):
+        """
+        Garantit un contexte RAG valide pour chaque slide et retourne ``{slide.id: context_id}``.
+
+        - contexte valide et checksum identique à celui de x_ai_context_file_id : aucun envoi ;
+        - un autre slide du même fournisseur a un contexte valide pour le même contenu : réutilisé ;
+        - sinon le contenu est envoyé en flux, une seule fois par contenu identique,
+          plusieurs slides en parallèle.
+
+        ``force`` ignore les contextes existants (ex. après CONTEXT_NOT_FOUND).
+        Les slides en échec sont absents du résultat ; ``raise_errors`` relève la première erreur.
+        """
+        now = fields.Datetime.now()
+        sources = self._get_ai_context_sources()
+        context_ids = {}
+        # (fournisseur, checksum) -> slides à servir par un même envoi
+        pending = {}
+        providers = {}
 
-            self.sudo().write({
-                'x_ai_context_id': context_data.get('context_id'),
-                'x_ai_context_expires_at': context_data.get('metadata', {}).get('expires_at'),
-                'x_ai_context_file_id': f"ODOO_SLIDE_{self.id}",
+        for slide in self:
+            source = sources.get(slide.id)
+            if not source:
+                _logger.warning(f"Slide '{slide.name}' sans contenu exploitable")
+                continue
+            checksum = source[0]
+            if (not force and slide._has_valid_ai_context(now)
+                    and (slide.x_ai_context_file_id or '').endswith(f"_{checksum}")):
+                _logger.info(f"Réutilisation du contexte {slide.x_ai_context_id}")
+                context_ids[slide.id] = slide.x_ai_context_id
+                continue
+            provider = provider_config or slide._get_provider_config()
+            providers[provider.id] = provider
+            pending.setdefault((provider.id, checksum), self.browse())
+            pending[(provider.id, checksum)] |= slide
+
+        # Contenu identique déjà envoyé pour un autre slide
+        if pending and not force:
+            donors = self.sudo().search(expression.AND([
+                [('id', 'not in', self.ids), ('x_ai_context_id', '!=', False)],
+                ['|', ('x_ai_context_expires_at', '=', False), ('x_ai_context_expires_at', '>', now)],
+                # "_" échappé : sinon joker d'un caractère pour LIKE
+                expression.OR([
+                    [('x_ai_context_file_id', '=like', f"%\\_{checksum}")]
+                    for _provider_id, checksum in pending
+                ]),
+            ]))
+            for donor in donors:
+                checksum = donor.x_ai_context_file_id.rpartition('_')[2]
+                # Même résolution du fournisseur que pour les slides à servir
+                key = (donor._get_provider_config().id, checksum)
+                slides = pending.pop(key, None)
+                if slides:
+                    _logger.info(f"Contenu inchangé : contexte {donor.x_ai_context_id} partagé")
+                    slides.sudo().write({
+                        'x_ai_context_id': donor.x_ai_context_id,
+                        'x_ai_context_expires_at': donor.x_ai_context_expires_at,
+                        'x_ai_context_file_id': donor.x_ai_context_file_id,
+                    })
+                    context_ids.update(dict.fromkeys(slides.ids, donor.x_ai_context_id))
+
+        specs = {
+            key: slides[0]._prepare_ai_context_upload(providers[key[0]], sources[slides[0].id])
+            for key, slides in pending.items()
+        }
+        outcomes = {}
+        if specs:
+            _logger.info(f"Envoi de {len(specs)} contexte(s) à l'API")
+            workers = min(len(specs), CONTEXT_UPLOAD_WORKERS)
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ai_context_upload') as executor:
+                futures = {key: executor.submit(_post_context_upload, spec) for key, spec in specs.items()}
+                for key, future in futures.items():
+                    try:
+                        outcomes[key] = future.result()
+                    except Exception as e:
+                        outcomes[key] = e
+
+        first_error = None
+        for key, outcome in outcomes.items():
+            slides = pending[key]
+            if isinstance(outcome, Exception) or not outcome.get('context_id'):
+                _logger.error(f"Échec de création du contexte pour {slides.mapped('name')} : {outcome}")
+                first_error = first_error or outcome
+                continue
+            slides.sudo().write({
+                'x_ai_context_id': outcome['context_id'],
+                'x_ai_context_expires_at': outcome.get('metadata', {}).get('expires_at'),
+                'x_ai_context_file_id': specs[key]['file_id'],
             })
+            context_ids.update(dict.fromkeys(slides.ids, outcome['context_id']))
 
-            return context_data.get('context_id')
-
-        return self.x_ai_context_id
+        if raise_errors and isinstance(first_error, Exception):
+            raise first_error
+        if raise_errors and first_error is not None:
+            raise UserError(_("L'API n'a pas retourné de context_id"))
+        return context_ids
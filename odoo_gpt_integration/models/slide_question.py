@@ -1,12 +1,36 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import UserError
-import requests
+from concurrent.futures import ThreadPoolExecutor, wait
 import re
 import logging
 
+from .keyword_matcher import KeywordMatcher
+
 _logger = logging.getLogger(__name__)
 
+# Résultat GPT "mis en file" : la correction sera faite par ai.correction.queue
+AI_CORRECTION_QUEUED = 'queued'
+
+
+def _post_correction_request(spec):
+    """
+    Exécute l'appel HTTP de correction décrit par ``spec`` (client, url, headers, payload, timeout).
+    N'accède pas à l'ORM : peut être exécuté depuis un thread du pool de correction.
+    """
+    response = spec['client'].post(spec['url'], headers=spec['headers'], json=spec['payload'],
+                                   timeout=spec['timeout'])
+    response.raise_for_status()
+
+    result = response.json()
+
+    return {
+        'is_correct': result.get('is_correct', False),
+        'score': result.get('score', 0),
+        'feedback': result.get('feedback', ''),
+        'ideal_answer': result.get('ideal_answer', '')
+    }
+
 
 class SlideQuestion(models.Model):
     _inherit = 'slide.question'
@@ -76,6 +100,18 @@ class SlideQuestion(models.Model):
         string="Scoring des Mots-clés"
     )
 
+    keyword_whole_word = fields.Boolean(
+        string="Mots Entiers Uniquement",
+        default=False,
+        help="Un mot-clé n'est compté que s'il apparaît comme mot entier (\"cell\" ne correspond pas à \"cellule\")"
+    )
+
+    keyword_ignore_accents = fields.Boolean(
+        string="Ignorer les Accents",
+        default=False,
+        help="\"photosynthese\" correspond alors à \"photosynthèse\""
+    )
+
     pending_answers = fields.One2many(
         'slide.question.pending.answer',
         'question_id',
@@ -134,7 +170,7 @@ class SlideQuestion(models.Model):
     # MÉTHODE PRINCIPALE DE CORRECTION
     # ============================================================================
 
-    def _check_answer(self, answer, user_id=None):
+    def _check_answer(self, answer, user_id=None, gpt_result=None):
         """
         API interne utilisée par ton contrôleur.
         `answer`:
@@ -147,6 +183,8 @@ class SlideQuestion(models.Model):
             'answer_feedback': str,
             'state': 'graded'|'pending' (optionnel)
           }
+        `gpt_result`: résultat GPT déjà obtenu (voir _call_gpt_corrections_parallel),
+          ou l'exception levée par l'appel ; None = appel GPT inline.
         """
         self.ensure_one()
 
@@ -170,7 +208,7 @@ class SlideQuestion(models.Model):
 
         if qtype == 'text_box':
             text = (answer or '').strip()
-            return self._check_text_answer(text, user)
+            return self._check_text_answer(text, user, gpt_result=gpt_result)
 
         # fallback
         return {
@@ -237,7 +275,7 @@ class SlideQuestion(models.Model):
     # CORRECTION DES QUESTIONS OUVERTES (TEXT BOX)
     # ============================================================================
 
-    def _check_text_answer(self, user_answer, user_id):
+    def _check_text_answer(self, user_answer, user_id, gpt_result=None):
         """
         Correction des questions ouvertes selon le mode
         """
@@ -254,7 +292,7 @@ class SlideQuestion(models.Model):
 
         # === MODE MANUEL : Appel GPT + Validation Enseignant ===
         if self.correction_mode == 'manual':
-            return self._check_text_manual_mode(user_answer, user_id)
+            return self._check_text_manual_mode(user_answer, user_id, gpt_result=gpt_result)
 
         # === MODE AUTOMATIQUE : Score Mots-clés (sans GPT) ===
         else:
@@ -264,7 +302,7 @@ class SlideQuestion(models.Model):
     # MODE MANUEL : APPEL GPT + VALIDATION
     # ============================================================================
 
-    def _check_text_manual_mode(self, user_answer, user_id):
+    def _check_text_manual_mode(self, user_answer, user_id, gpt_result=None):
         """
         Mode manuel : Utilise GPT puis envoie à l'enseignant pour validation
         """
@@ -291,8 +329,30 @@ class SlideQuestion(models.Model):
 
         # Sinon, appel GPT pour pré-correction
         try:
-            # Appel à l'API GPT pour correction sémantique
-            gpt_result = self._call_gpt_correction(user_answer)
+            # Appel à l'API GPT pour correction sémantique (sauf si déjà fait en parallèle)
+            if gpt_result == AI_CORRECTION_QUEUED:
+                return {
+                    'answer_is_correct': False,
+                    'answer_score': 0,
+                    'answer_feedback': _(
+                        "<div class='alert alert-warning'>"
+                        "<i class='fa fa-hourglass-half me-2'></i>"
+                        "<strong>Correction en cours</strong><br/>"
+                        "Votre réponse va être analysée par l'IA puis validée "
+                        "par votre enseignant. Vous recevrez une notification avec le résultat."
+                        "</div>"
+                    ),
+                    'state': 'pending',
+                    'create_pending': True,
+                    'enqueue_ai_correction': True,
+                    'suggested_score': 0,
+                    'suggested_feedback': _("Correction IA en file d'attente"),
+                    'gpt_ideal_answer': False,
+                }
+            if gpt_result is None:
+                gpt_result = self._call_gpt_correction(user_answer)
+            elif isinstance(gpt_result, Exception):
+                raise gpt_result
 
             return {
                 'answer_is_correct': False,
@@ -337,12 +397,52 @@ class SlideQuestion(models.Model):
     # MODE AUTOMATIQUE : SCORE MOTS-CLÉS
     # ============================================================================
 
+    def _get_keyword_matcher_version(self):
+        """
+        Version des mots-clés de la question, clé du cache de l'automate :
+        toute modification de la question ou de ses lignes de scoring (ajout,
+        modification, suppression) la change, l'ancienne entrée n'est plus lue
+        """
+        self.ensure_one()
+        [(count, last_write)] = self.env['slide.question.keyword.score'].sudo()._read_group(
+            [('question_id', '=', self.id)], [], ['__count', 'write_date:max'])
+        return (self.write_date, count, last_write)
+
+    @api.model
+    @tools.ormcache('question_id', 'version')
+    def _get_keyword_matcher(self, question_id, version):
+        """
+        Compile (une fois par version des mots-clés, en cache registre) les
+        mots-clés de scoring et legacy en un automate unique.
+        ``version`` : voir _get_keyword_matcher_version.
+        Retourne (entrées, automate) ; chaque entrée est (mot-clé, points, catégorie)
+        avec catégorie 'scoring' ou 'include'/'exclude' (legacy).
+        """
+        question = self.browse(question_id)
+        entries = []
+        for ks in question.keyword_scoring:
+            kw = (ks.keyword or "").strip()
+            val = int(ks.score_value or 0)
+            if kw and val:
+                entries.append((kw, val, 'scoring'))
+        for kw in re.split(r'[,;\n]+', question.ai_include_keywords or ''):
+            if kw.strip():
+                entries.append((kw.strip(), 10, 'include'))
+        for kw in re.split(r'[,;\n]+', question.ai_exclude_keywords or ''):
+            if kw.strip():
+                entries.append((kw.strip(), -15, 'exclude'))
+
+        matcher = KeywordMatcher(
+            [entry[0] for entry in entries],
+            whole_words=question.keyword_whole_word,
+            ignore_accents=question.keyword_ignore_accents,
+        )
+        return tuple(entries), matcher
+
     def _check_text_automatic_mode(self, user_answer, user_id):
 
         self.ensure_one()
 
-        user_answer_lower = (user_answer or "").lower()
-
         feedback_parts = []
         found_keywords = []
         missing_keywords = []
@@ -353,50 +453,21 @@ class SlideQuestion(models.Model):
         positive_found = 0  # somme des scores positifs trouvés
         penalty_abs = 0  # somme des pénalités (valeurs absolues) trouvées
 
-        # 1) Scoring personnalisé (One2many)
-        for ks in self.keyword_scoring:
-            kw = (ks.keyword or "").strip()
-            if not kw:
-                continue
-
-            kw_lower = kw.lower()
-            val = int(ks.score_value or 0)
+        # Un seul passage sur la réponse pour tous les mots-clés (scoring + legacy)
+        entries, matcher = self._get_keyword_matcher(self.id, self._get_keyword_matcher_version())
+        found = matcher.find(user_answer)
 
+        for index, (kw, val, _kind) in enumerate(entries):
             if val > 0:
                 positive_max += val
-                if kw_lower in user_answer_lower:
+                if index in found:
                     positive_found += val
                     found_keywords.append({'keyword': kw, 'score': val})
                 else:
                     missing_keywords.append({'keyword': kw, 'score': val})
-
-            elif val < 0:
-                if kw_lower in user_answer_lower:
-                    penalty_abs += abs(val)
-                    forbidden_found.append({'keyword': kw, 'penalty': val})  # val est déjà négatif
-
-        # 2) Legacy include/exclude (compat)
-        if self.ai_include_keywords:
-            include_list = [
-                kw.strip() for kw in re.split(r'[,;\n]+', self.ai_include_keywords or '') if kw.strip()
-            ]
-            for kw in include_list:
-                kwl = kw.lower()
-                positive_max += 10
-                if kwl in user_answer_lower:
-                    positive_found += 10
-                    found_keywords.append({'keyword': kw, 'score': 10})
-                else:
-                    missing_keywords.append({'keyword': kw, 'score': 10})
-
-        if self.ai_exclude_keywords:
-            exclude_list = [
-                kw.strip() for kw in re.split(r'[,;\n]+', self.ai_exclude_keywords or '') if kw.strip()
-            ]
-            for kw in exclude_list:
-                if kw.lower() in user_answer_lower:
-                    penalty_abs += 15
-                    forbidden_found.append({'keyword': kw, 'penalty': -15})
+            elif index in found:
+                penalty_abs += abs(val)
+                forbidden_found.append({'keyword': kw, 'penalty': val})  # val est déjà négatif
 
         # --- Normalisation ---
         if positive_max > 0:
@@ -475,14 +546,39 @@ class SlideQuestion(models.Model):
         POST /corrections/open
         """
         self.ensure_one()
+        spec = self._prepare_gpt_correction(user_answer)
+        result = self._get_cached_correction(spec)
+        if result is None:
+            result = _post_correction_request(spec)
+            self._cache_correction(spec, result)
+        return result
+
+    @api.model
+    def _get_cached_correction(self, spec):
+        """Correction déjà obtenue pour une demande identique (ai.response.cache), ou None"""
+        return self.env['ai.response.cache'].sudo()._lookup(
+            spec['provider_config'], spec['endpoint'], spec['payload'])
+
+    @api.model
+    def _cache_correction(self, spec, result):
+        self.env['ai.response.cache'].sudo()._store(
+            spec['provider_config'], spec['endpoint'], spec['payload'], result)
+
+    def _prepare_gpt_correction(self, user_answer):
+        """
+        Prépare l'appel de correction (client, url, headers, payload, timeout).
+        Toutes les lectures ORM (fournisseur, contexte RAG, mots-clés) sont faites ici,
+        dans le thread de la requête.
+        """
+        self.ensure_one()
 
         # Récupérer la configuration du fournisseur IA
-        provider_config = self.env['ai.provider.config'].get_default_provider()
-        if not provider_config:
-            raise UserError(_("Aucun fournisseur IA configuré"))
+        if not self.slide_id:
+            raise UserError(_("Contexte RAG manquant"))
+        provider_config = self.slide_id._get_provider_config()
 
         # Vérifier le context_id
-        if not self.slide_id or not self.slide_id.x_ai_context_id:
+        if not self.slide_id.x_ai_context_id:
             raise UserError(_("Contexte RAG manquant"))
         context_id = self.slide_id.x_ai_context_id
 
@@ -511,35 +607,85 @@ class SlideQuestion(models.Model):
                 if kw.strip()
             ])
 
-        # Appel API
-        url = f"{provider_config.api_base_url.strip('/')}/corrections/open"
-        headers = {
-            'Authorization': f'Bearer {provider_config.api_key}',
-            'Content-Type': 'application/json'
-        }
-
-        payload = {
-            'context_id': context_id,
-            'question_text': self.question,
-            'user_answer': user_answer,
-            'include': include,
-            'exclude': exclude
-        }
-
         _logger.info(f"Appel GPT correction pour Q{self.id}")
 
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-
-        result = response.json()
-
         return {
-            'is_correct': result.get('is_correct', False),
-            'score': result.get('score', 0),
-            'feedback': result.get('feedback', ''),
-            'ideal_answer': result.get('ideal_answer', '')
+            'provider_config': provider_config,
+            'endpoint': 'corrections/open',
+            'client': provider_config._get_http_client(),
+            'url': f"{provider_config.api_base_url.strip('/')}/corrections/open",
+            'headers': {
+                'Authorization': f'Bearer {provider_config.api_key}',
+                'Content-Type': 'application/json'
+            },
+            'payload': {
+                'context_id': context_id,
+                'question_text': self.question,
+                'user_answer': user_answer,
+                'include': include,
+                'exclude': exclude
+            },
+            'timeout': 30,
         }
 
+    @api.model
+    def _call_gpt_corrections_parallel(self, answers):
+        """
+        Corrige en parallèle toutes les réponses ouvertes d'une tentative.
+        `answers`: {slide.question: texte de la réponse}
+        Retourne {question_id: résultat GPT | exception}. Les appels qui dépassent
+        l'échéance globale du fournisseur sont rendus sous forme de TimeoutError,
+        ce qui fait basculer la question en correction manuelle (ligne pending).
+        Si le fournisseur est en correction différée, toutes les réponses sont
+        rendues comme AI_CORRECTION_QUEUED, sans aucun appel HTTP.
+        """
+        results = {}
+        try:
+            provider_config = next(iter(answers)).slide_id._get_provider_config()
+        except Exception as e:
+            return {question.id: e for question in answers}
+        if provider_config.async_corrections:
+            return {question.id: AI_CORRECTION_QUEUED for question in answers}
+
+        specs = {}
+        for question, user_answer in answers.items():
+            try:
+                spec = question._prepare_gpt_correction(user_answer)
+            except Exception as e:
+                results[question.id] = e
+                continue
+            cached = self._get_cached_correction(spec)
+            if cached is not None:
+                results[question.id] = cached
+            else:
+                specs[question.id] = spec
+        if not specs:
+            return results
+
+        max_workers = max(1, min(len(specs), provider_config.parallel_corrections or 1))
+        deadline = provider_config.correction_deadline or 45
+
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ai_correction')
+        try:
+            futures = {executor.submit(_post_correction_request, spec): qid for qid, spec in specs.items()}
+            done, not_done = wait(futures, timeout=deadline)
+            for future in done:
+                try:
+                    results[futures[future]] = future.result()
+                    self._cache_correction(specs[futures[future]], results[futures[future]])
+                except Exception as e:
+                    _logger.warning("Correction GPT Q%s en échec : %s", futures[future], e)
+                    results[futures[future]] = e
+            for future in not_done:
+                _logger.warning("Correction GPT Q%s hors délai (%ss)", futures[future], deadline)
+                results[futures[future]] = TimeoutError(
+                    _("Correction IA hors délai (%s s)") % deadline)
+        finally:
+            # On ne bloque pas la requête sur les appels hors délai
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return results
+
     # ============================================================================
     # GESTION DES RÉPONSES EN ATTENTE (MODE MANUEL)
     # ============================================================================
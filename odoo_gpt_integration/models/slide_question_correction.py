@@ -1,10 +1,17 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+from concurrent.futures import ThreadPoolExecutor
 import requests
+import json
 import logging
+import random
+import threading
+import time
 from datetime import datetime, timedelta
 
+from .slide_question import _post_correction_request
+
 _logger = logging.getLogger(__name__)
 
 
@@ -142,9 +149,14 @@ class SlideQuestion(models.Model):
             'request_detailed_feedback': True,  # Demande un feedback détaillé
         }
 
+        Cache = self.env['ai.response.cache'].sudo()
+        cached = Cache._lookup(provider_config, 'corrections/open', payload)
+        if cached is not None:
+            return self._build_correction_result(cached)
+
         _logger.info(f"Appel API de correction pour question {self.id}")
 
-        response = requests.post(
+        response = provider_config._get_http_client().post(
             url,
             headers=headers,
             json=payload,
@@ -152,6 +164,7 @@ class SlideQuestion(models.Model):
         )
         response.raise_for_status()
         response_data = response.json()
+        Cache._store(provider_config, 'corrections/open', payload, response_data)
 
         # Parse et enrichit la réponse
         return self._build_correction_result(response_data)
@@ -379,9 +392,24 @@ class AiCorrectionQueue(models.Model):
     _description = "File d'attente pour corrections IA différées"
     _order = 'create_date'
 
+    # Nombre maximum de tentatives avant abandon
+    MAX_RETRIES = 3
+    # Délai de base (secondes) de la reprise exponentielle : 60s, 120s, 240s...
+    RETRY_BASE_DELAY = 60
+    # Au-delà, un job resté "En Cours" est considéré comme orphelin (worker tué)
+    STALE_PROCESSING_MINUTES = 15
+
     question_id = fields.Many2one('slide.question', required=True, ondelete='cascade')
+    pending_answer_id = fields.Many2one(
+        'slide.question.pending.answer',
+        string="Réponse en Attente",
+        ondelete='cascade',
+        index=True,
+        help="Réponse à laquelle le résultat de la correction est appliqué"
+    )
     user_answer = fields.Text(required=True)
     error_type = fields.Selection([
+        ('ASYNC', 'Correction Différée'),
         ('CONTEXT_MISSING', 'Contexte Manquant'),
         ('TIMEOUT', 'Délai Dépassé'),
         ('API_ERROR', 'Erreur API'),
@@ -393,30 +421,169 @@ class AiCorrectionQueue(models.Model):
         ('processing', 'En Cours'),
         ('done', 'Traité'),
         ('failed', 'Échec'),
-    ], default='pending', required=True)
+    ], default='pending', required=True, index=True)
     result = fields.Text(string="Résultat de la Correction")
 
+    # Planification et métriques
+    next_attempt_at = fields.Datetime(
+        string="Prochaine Tentative",
+        default=fields.Datetime.now,
+        index=True
+    )
+    started_at = fields.Datetime(string="Début du Traitement", readonly=True)
+    finished_at = fields.Datetime(string="Fin du Traitement", readonly=True)
+    duration_ms = fields.Integer(string="Durée de l'Appel (ms)", readonly=True)
+    last_error = fields.Text(string="Dernière Erreur", readonly=True)
+
     @api.model
-    def cron_process_queue(self):
-        """Cron job pour traiter la file d'attente"""
-        pending = self.search([
-            ('state', '=', 'pending'),
-            ('retry_count', '<', 3),
-        ], limit=50)
+    def _enqueue_pending_answers(self, pending_answers):
+        """Met en file la correction IA de réponses ouvertes déjà enregistrées (soumission instantanée)"""
+        return self.create([{
+            'question_id': pending.question_id.id,
+            'pending_answer_id': pending.id,
+            'user_answer': pending.text_answer,
+            'error_type': 'ASYNC',
+        } for pending in pending_answers if pending.text_answer])
+
+    @api.model
+    def _claim_jobs(self, limit):
+        """
+        Réserve jusqu'à ``limit`` jobs échus. FOR UPDATE SKIP LOCKED garantit
+        que deux workers concurrents ne prennent jamais le même job.
+        """
+        self.flush_model()
+        self.env.cr.execute("""
+            UPDATE ai_correction_queue
+               SET state = 'processing',
+                   started_at = NOW() AT TIME ZONE 'UTC',
+                   write_date = NOW() AT TIME ZONE 'UTC'
+             WHERE id IN (
+                    SELECT id FROM ai_correction_queue
+                     WHERE state = 'pending'
+                       AND (next_attempt_at IS NULL OR next_attempt_at <= NOW() AT TIME ZONE 'UTC')
+                     ORDER BY next_attempt_at, id
+                     LIMIT %s
+                       FOR UPDATE SKIP LOCKED)
+         RETURNING id
+        """, (limit,))
+        ids = [row[0] for row in self.env.cr.fetchall()]
+        self.invalidate_model(['state', 'started_at'])
+        return self.browse(ids)
+
+    @api.model
+    def _release_stale_jobs(self):
+        """Remet en file les jobs bloqués "En Cours" par un worker interrompu"""
+        stale = self.search([
+            ('state', '=', 'processing'),
+            ('started_at', '<', fields.Datetime.now() - timedelta(minutes=self.STALE_PROCESSING_MINUTES)),
+        ])
+        if stale:
+            stale.write({'state': 'pending'})
+
+    def _run_http_calls(self, specs, max_workers):
+        """
+        Exécute les appels préparés ``{job_id: spec}`` avec au plus ``max_workers``
+        appels HTTP simultanés. Retourne ``{job_id: (résultat | exception, durée_ms)}``.
+        Les threads ne touchent pas à l'ORM.
+        """
+        def timed_call(spec):
+            start = time.monotonic()
+            try:
+                outcome = _post_correction_request(spec)
+            except Exception as e:
+                outcome = e
+            return outcome, int((time.monotonic() - start) * 1000)
+
+        if not specs:
+            return {}
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ai_correction_queue') as executor:
+            futures = {job_id: executor.submit(timed_call, spec) for job_id, spec in specs.items()}
+            return {job_id: future.result() for job_id, future in futures.items()}
+
+    def _mark_done(self, gpt_result, duration_ms):
+        self.ensure_one()
+        self.write({
+            'state': 'done',
+            'result': json.dumps(gpt_result, ensure_ascii=False),
+            'finished_at': fields.Datetime.now(),
+            'duration_ms': duration_ms,
+            'last_error': False,
+        })
+        pending = self.pending_answer_id
+        if pending and pending.state == 'pending':
+            pending.write({
+                'score': int(gpt_result.get('score', 0) or 0),
+                'feedback': gpt_result.get('feedback', '') or '',
+                'gpt_ideal_answer': gpt_result.get('ideal_answer', '') or False,
+            })
+        self.question_id.sudo().write({
+            'ai_correction_attempts': self.question_id.ai_correction_attempts + 1,
+            'ai_last_correction_error': False,
+        })
+
+    def _mark_failed(self, error, duration_ms=0):
+        """Planifie une nouvelle tentative avec un délai exponentiel (et un peu de gigue)"""
+        self.ensure_one()
+        retry_count = self.retry_count + 1
+        vals = {
+            'retry_count': retry_count,
+            'finished_at': fields.Datetime.now(),
+            'duration_ms': duration_ms,
+            'last_error': str(error),
+        }
+        if retry_count >= self.MAX_RETRIES:
+            vals['state'] = 'failed'
+        else:
+            delay = self.RETRY_BASE_DELAY * (2 ** (retry_count - 1))
+            vals.update({
+                'state': 'pending',
+                'next_attempt_at': fields.Datetime.now() + timedelta(seconds=delay + random.uniform(0, delay / 4)),
+            })
+        self.write(vals)
+        _logger.error(f"Échec du retry pour {self.id} ({retry_count}/{self.MAX_RETRIES}): {error}")
 
-        for item in pending:
+    @api.model
+    def cron_process_queue(self, limit=50):
+        """Cron job pour traiter la file d'attente"""
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        self._release_stale_jobs()
+
+        jobs = self._claim_jobs(limit)
+        if not jobs:
+            return 0
+        if auto_commit:
+            # Rend la réservation visible : les jobs ne sont pas verrouillés pendant les appels HTTP
+            self.env.cr.commit()
+
+        # 1) Préparation dans le thread du cron (lectures ORM, contexte RAG)
+        specs = {}
+        max_workers = 1
+        for job in jobs:
             try:
-                item.state = 'processing'
-                result = item.question_id._check_answer_ouverte_robust(
-                    item.user_answer
-                )
-                item.write({
-                    'state': 'done',
-                    'result': str(result),
-                })
+                spec = job.question_id._prepare_gpt_correction(job.user_answer)
             except Exception as e:
-                item.write({
-                    'retry_count': item.retry_count + 1,
-                    'state': 'failed' if item.retry_count >= 3 else 'pending',
-                })
-                _logger.error(f"Échec du retry pour {item.id}: {str(e)}")
\ No newline at end of file
+                job._mark_failed(e)
+                continue
+            cached = job.question_id._get_cached_correction(spec)
+            if cached is not None:
+                job._mark_done(cached, 0)
+                continue
+            specs[job.id] = spec
+            max_workers = max(max_workers, spec['provider_config'].parallel_corrections or 1)
+
+        # 2) Appels HTTP concurrents
+        outcomes = self._run_http_calls(specs, max_workers)
+
+        # 3) Application des résultats
+        for job in jobs.filtered(lambda j: j.id in outcomes):
+            outcome, duration_ms = outcomes[job.id]
+            if isinstance(outcome, Exception):
+                job._mark_failed(outcome, duration_ms)
+            else:
+                job.question_id._cache_correction(specs[job.id], outcome)
+                job._mark_done(outcome, duration_ms)
+
+        if auto_commit:
+            self.env.cr.commit()
+        _logger.info("File de correction IA : %s job(s) traité(s)", len(jobs))
+        return len(jobs)
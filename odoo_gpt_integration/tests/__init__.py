@@ -0,0 +1 @@
+from . import test_ai_http_client
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Client HTTP IA contre un serveur HTTP local (bouchon) : réutilisation des
+connexions, nouvelles tentatives et transitions du disjoncteur.
+Pas d'ORM : BaseCase, sans base de données.
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import requests
+
+from odoo.tests.common import BaseCase, tagged
+
+from ..models import ai_http_client
+from ..models.ai_http_client import AiCircuitOpenError, AiHttpClient, CircuitBreaker
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 : connexions keep-alive, comme un fournisseur réel
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        with server.lock:
+            server.requests.append(self.client_address)
+            status, headers, delay = server.script.pop(0) if server.script else (200, {}, 0)
+        if delay:
+            # Pas de time.sleep : il peut être remplacé par les tests
+            threading.Event().wait(delay)
+        body = b'{"ok": true}'
+        try:
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client parti sur timeout de lecture
+            self.close_connection = True
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+@tagged('post_install', '-at_install')
+class TestAiHttpClient(BaseCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.script = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = 'http://127.0.0.1:%s/v1/chat' % self.server.server_address[1]
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _client(self, **settings):
+        settings.setdefault('backoff_base', 0.01)
+        client = AiHttpClient(**settings)
+        self.clients.append(client)
+        return client
+
+    def _script(self, *responses):
+        """Réponses successives du bouchon : statut ou (statut, en-têtes[, délai])"""
+        defaults = (200, {}, 0)
+        for response in responses:
+            if isinstance(response, int):
+                response = (response,)
+            self.server.script.append(response + defaults[len(response):])
+
+    def test_connection_reused(self):
+        client = self._client()
+        for _i in range(3):
+            self.assertEqual(client.post(self.url, json={}, timeout=5).status_code, 200)
+        self.assertEqual(len(self.server.requests), 3)
+        # Même port source : une seule connexion TCP pour les trois appels
+        self.assertEqual(len(set(self.server.requests)), 1)
+
+    def test_retry_on_server_error(self):
+        self._script(503, 502)
+        response = self._client(max_retries=2).post(self.url, json={}, timeout=5)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_retries_exhausted_returns_last_response(self):
+        self._script(500, 500, 500, 500)
+        response = self._client(max_retries=2).post(self.url, json={}, timeout=5)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_retry_after_honoured(self):
+        self._script((429, {'Retry-After': '3'}))
+        with mock.patch.object(ai_http_client.time, 'sleep') as sleep:
+            response = self._client(max_retries=1).post(self.url, json={}, timeout=5)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.server.requests), 2)
+        sleep.assert_called_once_with(3.0)
+
+    def test_read_timeout_not_retried(self):
+        self._script((200, {}, 1.0))
+        client = self._client(max_retries=3)
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            client.post(self.url, json={}, timeout=0.2)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_circuit_breaker_transitions(self):
+        self._script(500, 500, 500)
+        client = self._client(max_retries=0, breaker_threshold=2, breaker_reset=0.3)
+
+        # Fermé : les échecs passent jusqu'au seuil
+        for _i in range(2):
+            self.assertEqual(client.post(self.url, json={}, timeout=5).status_code, 500)
+        self.assertEqual(client.breaker.state, 'open')
+
+        # Ouvert : échec immédiat, sans appel réseau
+        with self.assertRaises(AiCircuitOpenError):
+            client.post(self.url, json={}, timeout=5)
+        self.assertEqual(len(self.server.requests), 2)
+
+        # Semi-ouvert : l'essai échoue, le disjoncteur se rouvre
+        time.sleep(0.35)
+        self.assertEqual(client.breaker.state, 'half_open')
+        self.assertEqual(client.post(self.url, json={}, timeout=5).status_code, 500)
+        self.assertEqual(client.breaker.state, 'open')
+
+        # Semi-ouvert : l'essai réussit, le disjoncteur se referme
+        time.sleep(0.35)
+        self.assertEqual(client.breaker.state, 'half_open')
+        self.assertEqual(client.post(self.url, json={}, timeout=5).status_code, 200)
+        self.assertEqual(client.breaker.state, 'closed')
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_unexpected_error_ends_half_open_trial(self):
+        self._script(500)
+        client = self._client(max_retries=0, breaker_threshold=1, breaker_reset=0.3)
+        client.post(self.url, json={}, timeout=5)
+        time.sleep(0.35)
+        self.assertEqual(client.breaker.state, 'half_open')
+
+        # Erreur hors ConnectionError/Timeout pendant l'essai : échec enregistré,
+        # le disjoncteur se rouvre au lieu de rester bloqué sur "essai en cours"
+        with mock.patch.object(client.session, 'request',
+                               side_effect=requests.exceptions.ChunkedEncodingError()):
+            with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+                client.post(self.url, json={}, timeout=5)
+        self.assertEqual(client.breaker.state, 'open')
+
+        time.sleep(0.35)
+        self.assertEqual(client.post(self.url, json={}, timeout=5).status_code, 200)
+        self.assertEqual(client.breaker.state, 'closed')
+
+
+@tagged('post_install', '-at_install')
+class TestCircuitBreaker(BaseCase):
+
+    def test_single_trial_when_half_open(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'half_open')
+        breaker.before_call()
+        with self.assertRaises(AiCircuitOpenError):
+            breaker.before_call()
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')